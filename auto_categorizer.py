@@ -7,126 +7,81 @@ Analyzes your files and suggests optimal collection structure
 import os
 from pathlib import Path
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
+import random
 import re
 import json
+import sqlite3
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.categorization import CATEGORY_RULES, CategoryScorer
+
+# Below this many files the pool's startup/pickling costs more than it saves
+POOL_MIN_FILES = 5000
+
+
+_worker_scorer = None
+
+
+def _init_worker(category_rules):
+    global _worker_scorer
+    _worker_scorer = CategoryScorer(category_rules)
+
+
+def _score_paths(paths):
+    return [_worker_scorer.score(p) for p in paths]
+
 
 class DocumentCategorizer:
-    def __init__(self, base_path="/home/starlord/raycastfiles/Life"):
+    def __init__(self, base_path="/home/starlord/raycastfiles/Life", workers=None):
         self.base_path = Path(base_path)
+        self.workers = workers or os.cpu_count() or 1
         self.categories = defaultdict(list)
         self.stats = defaultdict(int)
+        self.directories = None  # directory names seen by scan_directory, reused by the report
         
-        # Smart patterns for categorization
-        self.category_rules = {
-            'finance': {
-                'keywords': ['401k', '401', 'tax', 'irs', 'w2', 'w-2', '1099', 'investment', 
-                            'retirement', 'pension', 'income', 'expense', 'budget', 'bank',
-                            'financial', 'money', 'salary', 'payroll', 'invoice'],
-                'paths': ['401k', 'taxes', 'finance', 'investments'],
-                'extensions': ['.xlsx', '.xls', '.csv']  # Financial docs often spreadsheets
-            },
-            'legal': {
-                'keywords': ['lawsuit', 'legal', 'attorney', 'lawyer', 'court', 'case',
-                            'contract', 'agreement', 'settlement', 'claim', 'dispute',
-                            'litigation', 'plaintiff', 'defendant', 'evidence'],
-                'paths': ['lawsuit', 'legal', 'contracts', 'malpractice'],
-                'extensions': ['.docx', '.doc']
-            },
-            'medical': {
-                'keywords': ['medical', 'health', 'doctor', 'hospital', 'diagnosis',
-                            'treatment', 'prescription', 'lab', 'test', 'insurance',
-                            'medicare', 'medicaid', 'patient', 'clinic', 'surgery',
-                            'malpractice', 'tb', 'disease'],
-                'paths': ['medical', 'health', 'malpractice'],
-                'extensions': ['.pdf']
-            },
-            'estate': {
-                'keywords': ['estate', 'will', 'trust', 'beneficiary', 'inheritance',
-                            'power of attorney', 'executor', 'probate', 'asset'],
-                'paths': ['estate', 'will', 'trust'],
-                'extensions': ['.pdf', '.docx']
-            },
-            'business': {
-                'keywords': ['business', 'company', 'client', 'project', 'proposal',
-                            'meeting', 'presentation', 'strategy', 'plan', 'report',
-                            'export', 'import', 'shipment', 'order'],
-                'paths': ['business', 'work', 'projects', 'clients', 'export'],
-                'extensions': ['.pptx', '.xlsx']
-            },
-            'personal': {
-                'keywords': ['personal', 'family', 'photo', 'note', 'diary', 'journal',
-                            'password', 'credential', 'license', 'passport'],
-                'paths': ['personal', 'family', 'documents'],
-                'extensions': ['.txt', '.md', '.jpg', '.png']
-            },
-            'correspondence': {
-                'keywords': ['email', 'letter', 'memo', 'message', 'communication'],
-                'paths': ['email', 'letters', 'correspondence'],
-                'extensions': ['.eml', '.msg', '.txt']
-            }
-        }
+        # Smart patterns for categorization (shared with routed ingestion)
+        self.category_rules = CATEGORY_RULES
+        self.scorer = CategoryScorer(self.category_rules)
     
     def analyze_file(self, filepath: Path) -> dict:
         """Analyze a single file and determine its category"""
-        # Convert to lowercase for matching
-        path_str = str(filepath).lower()
-        filename = filepath.name.lower()
-        extension = filepath.suffix.lower()
-        
-        # Score each category
-        scores = defaultdict(int)
-        
-        for category, rules in self.category_rules.items():
-            # Check keywords in path and filename
-            for keyword in rules['keywords']:
-                if keyword in path_str:
-                    scores[category] += 3  # Path match is strong signal
-                if keyword in filename:
-                    scores[category] += 2  # Filename match
-            
-            # Check path patterns
-            for pattern in rules['paths']:
-                if pattern in path_str:
-                    scores[category] += 5  # Direct path match is very strong
-            
-            # Check extensions
-            if extension in rules['extensions']:
-                scores[category] += 1
-        
-        # Determine best category
-        if scores:
-            best_category = max(scores, key=scores.get)
-            confidence = scores[best_category]
-        else:
-            best_category = 'uncategorized'
-            confidence = 0
-        
-        return {
-            'path': str(filepath),
-            'name': filepath.name,
-            'category': best_category,
-            'confidence': confidence,
-            'all_scores': dict(scores)
-        }
-    
+        return self.scorer.score(str(filepath))
+
+    def walk(self):
+        """One pass over the tree: (file paths, directory names)."""
+        files, dirs = [], []
+        for root, dirnames, filenames in os.walk(self.base_path):
+            dirs.extend(dirnames)
+            files.extend(os.path.join(root, name) for name in filenames if '.' in name)
+        return files, dirs
+
+    def analyze_paths(self, paths):
+        """Score paths, across a process pool for large trees (results keep input order)."""
+        if self.workers <= 1 or len(paths) < POOL_MIN_FILES:
+            return [self.scorer.score(p) for p in paths]
+        chunk = max(1000, len(paths) // (self.workers * 8))
+        parts = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.category_rules,)) as pool:
+            return [r for part in pool.map(_score_paths, parts) for r in part]
+
     def scan_directory(self):
         """Scan entire directory structure"""
         print(f"🔍 Scanning {self.base_path}...")
         
-        all_files = []
-        for ext in ['*.*']:  # Get everything
-            all_files.extend(self.base_path.rglob(ext))
+        all_files, self.directories = self.walk()
         
         print(f"Found {len(all_files)} files to analyze")
         
         # Analyze each file
-        results = []
-        for filepath in all_files:
-            if filepath.is_file():
-                analysis = self.analyze_file(filepath)
-                results.append(analysis)
-                self.categories[analysis['category']].append(filepath)
-                self.stats[analysis['category']] += 1
+        results = self.analyze_paths(all_files)
+        for analysis in results:
+            self.categories[analysis['category']].append(Path(analysis['path']))
+            self.stats[analysis['category']] += 1
         
         return results
     
@@ -173,14 +128,10 @@ class DocumentCategorizer:
         # Directory patterns
         print("\n📂 Directory Pattern Analysis:")
         dir_patterns = Counter()
-        for filepath in self.base_path.rglob("*"):
-            if filepath.is_dir():
-                dir_name = filepath.name.lower()
-                for category, rules in self.category_rules.items():
-                    for keyword in rules['keywords']:
-                        if keyword in dir_name:
-                            dir_patterns[category] += 1
-                            break
+        if self.directories is None:
+            _, self.directories = self.walk()
+        for dir_name in self.directories:
+            dir_patterns.update(self.scorer.dir_categories(dir_name))
         
         for category, count in dir_patterns.most_common(5):
             print(f"  {category}: {count} matching directories")
@@ -197,11 +148,14 @@ class DocumentCategorizer:
         mapping = defaultdict(list)
         
         for r in results:
-            mapping[r['category']].append({
+            entry = {
                 'file': r['name'],
                 'path': r['path'],
                 'confidence': r['confidence']
-            })
+            }
+            if r.get('method') == 'content':
+                entry.update(method='content', similarity=r['similarity'], keyword_category=r['keyword_category'])
+            mapping[r['category']].append(entry)
         
         with open(output_file, 'w') as f:
             json.dump(mapping, f, indent=2)
@@ -209,9 +163,188 @@ class DocumentCategorizer:
         print(f"\n💾 Exported mapping to {output_file}")
         print("   Review and adjust before ingestion")
 
+    def apply_content_stage(self, results, classifier):
+        """Re-categorize low-confidence files by content; keeps stats/categories in sync."""
+        changed = classifier.classify(results)
+        if changed:
+            self.categories = defaultdict(list)
+            self.stats = defaultdict(int)
+            for r in results:
+                self.categories[r['category']].append(Path(r['path']))
+                self.stats[r['category']] += 1
+        return changed
+
+
+TEXT_SAMPLE_EXTS = {'.txt', '.log', '.md', '.csv', '.tsv', '.json', '.xml', '.html', '.htm',
+                    '.eml', '.rtf', '.ini', '.cfg', '.yaml', '.yml'}
+
+
+def sample_text(path: str, max_chars: int = 4000) -> str:
+    """First ~max_chars of a file's text ('' for formats we can't read cheaply)."""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in TEXT_SAMPLE_EXTS:
+            with open(path, 'rb') as f:
+                return f.read(max_chars * 2).decode('utf-8', 'ignore')[:max_chars]
+        if ext == '.pdf':
+            from pypdf import PdfReader
+            text = ''
+            for page in PdfReader(path).pages[:5]:
+                text += (page.extract_text() or '') + '\n'
+                if len(text) >= max_chars:
+                    break
+            return text[:max_chars]
+        if ext in ('.docx', '.pptx', '.xlsx'):
+            # Office XML: text of the first parts, tags stripped
+            with zipfile.ZipFile(path) as z:
+                names = [n for n in z.namelist() if n.endswith('.xml') and
+                         n.startswith(('word/document', 'ppt/slides/slide', 'xl/sharedStrings'))]
+                xml = ''.join(z.read(n)[:max_chars * 8].decode('utf-8', 'ignore') for n in sorted(names)[:5])
+            return ' '.join(re.sub(r'<[^>]+>', ' ', xml).split())[:max_chars]
+    except Exception:
+        return ''
+    return ''
+
+
+class ContentClassifier:
+    """Optional second stage: nearest-centroid categories from embedded file prefixes.
+
+    Centroids are the mean embeddings of a sample of high-confidence keyword matches per
+    category; low-confidence files are then assigned to the closest centroid if it is
+    similar enough and clearly ahead of the runner-up. Vectors are cached in SQLite keyed
+    by (model, path, size, mtime), so reruns only embed new or changed files.
+    """
+
+    def __init__(self, client=None, cache_path='data/categorizer_cache.sqlite', sample_chars=4000,
+                 batch_size=64, min_examples=5, max_examples=200, min_confidence=10,
+                 max_confidence=4, min_similarity=0.6, min_margin=0.02, readers=8, seed=13):
+        if client is None:
+            from src.embeddings.providers import build_client
+            client = build_client()
+        self.client = client
+        self.model = getattr(client, 'model', 'default')
+        self.sample_chars = sample_chars
+        self.batch_size = batch_size
+        self.min_examples = min_examples
+        self.max_examples = max_examples
+        self.min_confidence = min_confidence  # keyword score that counts as a centroid example
+        self.max_confidence = max_confidence  # keyword score at or below which content decides
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.readers = readers
+        self.seed = seed
+        self.centroids = {}
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(cache_path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vec BLOB)')
+        self.embedded = 0
+        self.cached = 0
+
+    def _key(self, path):
+        st = os.stat(path)
+        return f"{self.model}|{path}|{st.st_size}|{st.st_mtime_ns}"
+
+    def embed_files(self, paths):
+        """path -> unit vector for every path with readable text (batched, cached)."""
+        import numpy as np
+
+        out = {}
+        for i in range(0, len(paths), self.batch_size):
+            batch = paths[i:i + self.batch_size]
+            keys = {}
+            for p in batch:
+                try:
+                    keys[p] = self._key(p)
+                except OSError:
+                    continue
+            rows = dict(self.db.execute(
+                f"SELECT key, vec FROM vectors WHERE key IN ({','.join('?' * len(keys))})", list(keys.values())
+            )) if keys else {}
+            todo = []
+            for p, k in keys.items():
+                if k in rows:
+                    out[p] = np.frombuffer(rows[k], dtype=np.float32)
+                    self.cached += 1
+                else:
+                    todo.append(p)
+            with ThreadPoolExecutor(self.readers) as pool:
+                texts = list(pool.map(lambda p: sample_text(p, self.sample_chars), todo))
+            todo = [(p, t) for p, t in zip(todo, texts) if t.strip()]
+            if not todo:
+                continue
+            vectors, _ = self.client.embed_texts([t for _, t in todo])
+            for (p, _), v in zip(todo, vectors):
+                v = np.asarray(v, dtype=np.float32)
+                v = v / (np.linalg.norm(v) or 1.0)
+                out[p] = v
+                self.db.execute('INSERT OR REPLACE INTO vectors VALUES (?, ?)', (keys[p], v.tobytes()))
+            self.db.commit()
+            self.embedded += len(todo)
+        return out
+
+    def build_centroids(self, results):
+        import numpy as np
+
+        rnd = random.Random(self.seed)
+        examples = defaultdict(list)
+        for r in results:
+            if r['category'] != 'uncategorized' and r['confidence'] >= self.min_confidence:
+                examples[r['category']].append(r['path'])
+        for category, paths in examples.items():
+            rnd.shuffle(paths)
+            vectors = list(self.embed_files(paths[:self.max_examples]).values())
+            if len(vectors) < self.min_examples:
+                continue
+            centroid = np.mean(vectors, axis=0)
+            self.centroids[category] = centroid / (np.linalg.norm(centroid) or 1.0)
+        return self.centroids
+
+    def classify(self, results):
+        """Reassign low-confidence results in place; returns how many changed category."""
+        import numpy as np
+
+        if not self.centroids:
+            self.build_centroids(results)
+        if len(self.centroids) < 2:
+            print("⚠️  Not enough high-confidence examples to build content centroids")
+            return 0
+        names = list(self.centroids)
+        matrix = np.stack([self.centroids[n] for n in names])
+        candidates = [r for r in results if r['confidence'] <= self.max_confidence]
+        vectors = self.embed_files([r['path'] for r in candidates])
+        changed = 0
+        for r in candidates:
+            v = vectors.get(r['path'])
+            if v is None:
+                continue
+            sims = matrix @ v
+            order = np.argsort(sims)[::-1]
+            best, second = sims[order[0]], sims[order[1]]
+            if best < self.min_similarity or best - second < self.min_margin:
+                continue
+            category = names[order[0]]
+            if category != r['category']:
+                changed += 1
+            r.update(keyword_category=r['category'], category=category,
+                     method='content', similarity=round(float(best), 4))
+        print(f"🧠 Content stage: {len(candidates)} low-confidence files, {len(vectors)} with text, "
+              f"{changed} re-categorized ({self.embedded} embedded, {self.cached} from cache)")
+        return changed
+
+
 if __name__ == "__main__":
-    categorizer = DocumentCategorizer()
+    ap = argparse.ArgumentParser(description="Suggest work-buddy-* collections for a document tree")
+    ap.add_argument("base_path", nargs="?", default="/home/starlord/raycastfiles/Life")
+    ap.add_argument("--workers", type=int, default=None, help="Processes for path scoring")
+    ap.add_argument("--content", action="store_true",
+                    help="Re-categorize low-confidence files by embedding their first text against category centroids")
+    ap.add_argument("--min-similarity", type=float, default=0.6)
+    args = ap.parse_args()
+
+    categorizer = DocumentCategorizer(args.base_path, workers=args.workers)
     results = categorizer.scan_directory()
+    if args.content:
+        categorizer.apply_content_stage(results, ContentClassifier(min_similarity=args.min_similarity))
     report = categorizer.generate_report(results)
     categorizer.export_mapping(results)
     
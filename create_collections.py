@@ -1,5 +1,12 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+from src.config import settings
+from src.embeddings.models import get_model_meta
+from src.qdrant_provisioning import ensure_collection
 
 client = QdrantClient(host='localhost', port=6333)
 
@@ -10,6 +17,7 @@ COLLECTIONS = {
     'work-buddy-finance-tax': 'Financial records (11,470 docs)',
     'work-buddy-legal-estate': 'Legal matters (1,573 docs)',
     'work-buddy-correspondence': 'Communications (42 docs)',
+    'work-buddy-medical': 'Medical records and malpractice',
     'work-buddy-general': 'Miscellaneous (113 docs)'
 }
 
@@ -17,22 +25,15 @@ print('🚀 Creating YOUR business collections...')
 created = 0
 existing = 0
 
+dim = get_model_meta(settings.TOGETHER_EMBEDDING_MODEL).dim
 for name, desc in COLLECTIONS.items():
-    try:
-        client.get_collection(name)
-        print(f'  ✓ {name} already exists')
-        existing += 1
-    except:
-        client.create_collection(
-            collection_name=name,
-            vectors_config=VectorParams(size=768, distance=Distance.COSINE),
-            optimizers_config={
-                "default_segment_number": 2,
-                "indexing_threshold": 20000,
-            }
-        )
+    # Creates missing collections and backfills payload indexes on existing ones
+    if ensure_collection(client, name, dim, profile="work-buddy"):
         print(f'  ✅ Created {name} - {desc}')
         created += 1
+    else:
+        print(f'  ✓ {name} already exists')
+        existing += 1
 
 print(f'\n✨ Status: {created} new, {existing} existing')
 print('\n📊 Your complete RAG architecture:')
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Unified concurrent ingestion for Work Buddy / MAS collections.
+
+read (thread pool) -> chunk (pool) -> embed (cross-file batches) -> upsert (writers),
+connected by bounded queues. Prints per-stage throughput while it runs.
+
+    python ingest.py /home/starlord/raycastfiles/Life --collection work-buddy-rag --backend local
+    python ingest.py /home/starlord/raycastfiles/Life --route categorization_map.json   # per-category collections
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from qdrant_client import QdrantClient
+from src.categorization import CollectionRouter
+from src.config import settings
+from src.embeddings.client import EmbeddingClient
+from src.embeddings.models import get_model_meta
+from src.ingest_pipeline import IngestPipeline, scan_files
+from src.qdrant_provisioning import ensure_collection as provision_collection
+
+DEFAULT_EXTS = ["pdf", "txt", "md", "csv", "doc", "docx"]
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Staged concurrent ingestion into Qdrant")
+    ap.add_argument("source", help="Directory to ingest")
+    ap.add_argument("--collection", default="work-buddy-rag")
+    ap.add_argument(
+        "--route",
+        nargs="?",
+        const="inline",
+        help="Write each file to its category's collection, from auto_categorizer.py's map "
+        "(path) or by categorizing inline (no value)",
+    )
+    ap.add_argument("--backend", default=settings.EMBEDDINGS_BACKEND, choices=["together", "local", "onnx"])
+    ap.add_argument("--model", default=settings.TOGETHER_EMBEDDING_MODEL)
+    ap.add_argument("--ext", default=",".join(DEFAULT_EXTS), help="Comma-separated extensions")
+    ap.add_argument("--readers", type=int, default=4, help="Reader threads (default: 4)")
+    ap.add_argument("--chunkers", type=int, default=2, help="Chunker threads (default: 2)")
+    ap.add_argument("--writers", type=int, default=2, help="Concurrent Qdrant upserts (default: 2)")
+    ap.add_argument("--upsert-batch", type=int, default=256, help="Points per upsert per collection (default: 256)")
+    ap.add_argument("--batch", type=int, default=64, help="Max chunks per embedding call (default: 64)")
+    ap.add_argument("--max-wait-ms", type=float, default=50, help="Max wait to fill a batch (default: 50)")
+    ap.add_argument("--max-tokens", type=int, default=250, help="Chunk size in tokens (~4 chars each)")
+    ap.add_argument("--overlap-tokens", type=int, default=50)
+    ap.add_argument("--stats-every", type=float, default=10, help="Seconds between throughput lines")
+    return ap.parse_args(argv)
+
+
+def ensure_collection(qdrant: QdrantClient, name: str, dim: int):
+    if provision_collection(qdrant, name, dim, profile="work-buddy"):
+        print(f"✓ Created collection: {name}")
+    else:
+        print(f"✓ Using existing collection {name} ({qdrant.get_collection(name).points_count} vectors)")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("🚀 MAS ingestion")
+    print("=" * 40)
+    print(f"Source:  {args.source}")
+    print(f"Target:  {f'per category ({args.route})' if args.route else args.collection}")
+    print(f"Backend: {args.backend} ({args.model})")
+
+    qdrant = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+    embedding_client = EmbeddingClient(
+        api_key=settings.TOGETHER_API_KEY,
+        base_url=settings.TOGETHER_BASE_URL,
+        model=args.model,
+        backend=args.backend,
+        l2_normalize=settings.EMBEDDINGS_L2_NORMALIZE,
+        max_batch=args.batch,
+    )
+    dim = get_model_meta(args.model).dim
+
+    files = scan_files(args.source, args.ext.split(","))
+    print(f"📁 Found {len(files)} files\n")
+
+    router = None
+    if args.route:
+        router = CollectionRouter() if args.route == "inline" else CollectionRouter.from_map_file(args.route)
+        # Routing every file up front warms the router's cache and names every target collection
+        targets = Counter(router.collection_for(path)[0] for path in files)
+        for name, n in sorted(targets.items()):
+            print(f"🗂  {name}: {n} files")
+            ensure_collection(qdrant, name, dim)
+        print()
+    else:
+        ensure_collection(qdrant, args.collection, dim)
+
+    pipeline = IngestPipeline(
+        embedding_client,
+        qdrant,
+        args.collection,
+        router=router,
+        readers=args.readers,
+        chunkers=args.chunkers,
+        writers=args.writers,
+        embed_batch=args.batch,
+        upsert_batch=args.upsert_batch,
+        max_wait_s=args.max_wait_ms / 1000,
+        max_tokens=args.max_tokens,
+        overlap_tokens=args.overlap_tokens,
+        stats_every_s=args.stats_every,
+    )
+    summary = pipeline.run(files)
+
+    print("\n" + "=" * 40)
+    print("✅ INGESTION COMPLETE")
+    print(json.dumps(summary, indent=2))
+    if pipeline.failed:
+        print(f"\n⚠ Failed files ({len(pipeline.failed)}):")
+        for path, err in list(pipeline.failed.items())[:5]:
+            print(f"   - {path}: {err}")
+        if len(pipeline.failed) > 5:
+            print(f"   ... and {len(pipeline.failed) - 5} more")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""auto_categorizer scoring: original per-keyword loop vs. the compiled matcher (and its
+process pool), with a parity check on every path.
+
+    python scripts/bench_categorizer.py --root /home/starlord/raycastfiles/Life
+    python scripts/bench_categorizer.py --synthetic 200000 --workers 8
+"""
+import os, sys; sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import argparse, json, random, time
+from collections import defaultdict
+from pathlib import Path
+from auto_categorizer import DocumentCategorizer
+
+
+def legacy_analyze(rules, filepath: Path) -> dict:
+    """The pre-matcher DocumentCategorizer.analyze_file."""
+    path_str = str(filepath).lower()
+    filename = filepath.name.lower()
+    extension = filepath.suffix.lower()
+    scores = defaultdict(int)
+    for category, r in rules.items():
+        for keyword in r['keywords']:
+            if keyword in path_str:
+                scores[category] += 3
+            if keyword in filename:
+                scores[category] += 2
+        for pattern in r['paths']:
+            if pattern in path_str:
+                scores[category] += 5
+        if extension in r['extensions']:
+            scores[category] += 1
+    if scores:
+        best = max(scores, key=scores.get)
+        return {'category': best, 'confidence': scores[best], 'all_scores': dict(scores)}
+    return {'category': 'uncategorized', 'confidence': 0, 'all_scores': {}}
+
+
+def synthetic_paths(rules, n, seed):
+    rnd = random.Random(seed)
+    words = [w for r in rules.values() for w in r['keywords'] + r['paths']]
+    filler = ['scan', 'IMG', 'Downloads', 'misc', 'old', 'Copy of', 'final', '2019', 'v2', 'backup']
+    exts = [e for r in rules.values() for e in r['extensions']] + ['.bin', '.zip', '.html']
+    # ~15 files per directory, like a real document tree
+    dirs = [
+        '/home/user/' + '/'.join(rnd.choice(words + filler * 3) for _ in range(rnd.randint(2, 6)))
+        for _ in range(max(1, n // 15))
+    ]
+    paths = []
+    for _ in range(n):
+        name = '_'.join(rnd.choice(words + filler * 4) for _ in range(rnd.randint(1, 3)))
+        paths.append(rnd.choice(dirs) + '/' + name + rnd.choice(exts))
+    return paths
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark auto_categorizer path scoring")
+    ap.add_argument("--root", help="Directory tree to scan")
+    ap.add_argument("--synthetic", type=int, default=100000, help="Random paths to score when no --root")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--seed", type=int, default=13)
+    args = ap.parse_args()
+
+    cat = DocumentCategorizer(args.root or "/nonexistent", workers=args.workers)
+    if args.root:
+        (paths, dirs), walk_s = timed(cat.walk)
+        print(f"Walked {len(paths)} files / {len(dirs)} dirs in {walk_s:.2f}s", file=sys.stderr)
+    else:
+        paths = synthetic_paths(cat.category_rules, args.synthetic, args.seed)
+
+    legacy, legacy_s = timed(lambda: [legacy_analyze(cat.category_rules, Path(p)) for p in paths])
+    # Fresh categorizers so neither run starts with warm directory caches
+    single, single_s = timed(lambda: DocumentCategorizer(workers=1).analyze_paths(paths))
+    pooled, pooled_s = timed(lambda: DocumentCategorizer(workers=args.workers).analyze_paths(paths))
+
+    keys = ('category', 'confidence', 'all_scores')
+    mismatches = [
+        p for p, a, b, c in zip(paths, legacy, single, pooled)
+        if any(a[k] != b[k] or a[k] != c[k] for k in keys)
+    ]
+    report = {
+        "paths": len(paths),
+        "legacy_s": round(legacy_s, 3),
+        "matcher_s": round(single_s, 3),
+        "matcher_pool_s": round(pooled_s, 3),
+        "workers": args.workers,
+        "speedup": round(legacy_s / single_s, 1),
+        "speedup_pool": round(legacy_s / pooled_s, 1),
+        "mismatches": len(mismatches),
+        "mismatch_examples": mismatches[:5],
+    }
+    print(json.dumps(report, indent=2))
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import os, sys; sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import argparse, json, time, tracemalloc
+from src.chunking import iter_chunks
+
+SAMPLE_PARAGRAPH = (
+    "2024-03-11 09:14:02 OUTLOOK.EXE opened attachment invoice_0311.pdf from "
+    "Content.Outlook\\X1Y2Z3 on behalf of user jdoe; sync state=3 retries=0.\n"
+)
+
+
+def synthetic_text(target_bytes: int) -> str:
+    lines, size, i = [], 0, 0
+    while size < target_bytes:
+        line = SAMPLE_PARAGRAPH if i % 12 else "\n"
+        lines.append(line)
+        size += len(line)
+        i += 1
+    return "".join(lines)
+
+
+def timed(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n = fn()
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"chunks": n, "seconds": round(dt, 3), "peak_mb": round(peak / 1e6, 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark src.chunking against unstructured chunk_by_title")
+    ap.add_argument("path", nargs="?", help="Text file to chunk (default: synthetic log text)")
+    ap.add_argument("--mb", type=float, default=20, help="Synthetic input size in MB (default: 20)")
+    ap.add_argument("--max-tokens", type=int, default=375)
+    ap.add_argument("--overlap-tokens", type=int, default=50)
+    args = ap.parse_args()
+
+    if args.path:
+        with open(args.path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        text = synthetic_text(int(args.mb * 1e6))
+    mb = len(text.encode("utf-8", "ignore")) / 1e6
+
+    def streaming():
+        return sum(1 for _ in iter_chunks(text, args.max_tokens, args.overlap_tokens))
+
+    results = {"input_mb": round(mb, 2), "streaming": timed(streaming)}
+
+    try:
+        from unstructured.chunking.title import chunk_by_title
+        from unstructured.partition.text import partition_text
+
+        def unstructured():
+            elements = partition_text(text=text)
+            return len(chunk_by_title(elements, max_characters=args.max_tokens * 4))
+
+        results["chunk_by_title"] = timed(unstructured)
+        results["speedup"] = round(
+            results["chunk_by_title"]["seconds"] / max(results["streaming"]["seconds"], 1e-9), 1
+        )
+    except ImportError:
+        results["chunk_by_title"] = "unstructured not installed"
+
+    results["streaming"]["mb_per_sec"] = round(mb / max(results["streaming"]["seconds"], 1e-9), 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
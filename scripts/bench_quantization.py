@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""recall@k and latency of a quantized collection vs. its unquantized baseline.
+
+Ground truth is an exact (brute-force, full-precision) search on the baseline. Queries are
+either real query texts (--queries, embedded with the configured backend) or points
+sampled from the baseline and held out of their own results.
+
+    # copy mas_embeddings into an int8 collection, then compare
+    python scripts/bench_quantization.py --baseline mas_embeddings --collection mas_embeddings_int8 \\
+        --copy --profile forensic-int8 --sample 200 --k 10
+
+    # once the numbers look right, move an existing collection onto the profile in place
+    python scripts/bench_quantization.py --collection mas_embeddings_int8 --profile forensic-int8 --apply
+"""
+import os, sys; sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import argparse, json, time
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import PointStruct, QuantizationSearchParams, Sample, SampleQuery, SearchParams
+from src.config import settings
+from src.qdrant_provisioning import apply_profile, ensure_collection, get_profile, search_params
+
+
+def copy_collection(client, src, dst, profile, batch=256, timeout_s=3600):
+    dim = client.get_collection(src).config.params.vectors.size
+    ensure_collection(client, dst, dim, profile)
+    offset, n = None, 0
+    while True:
+        points, offset = client.scroll(src, limit=batch, offset=offset, with_payload=True, with_vectors=True)
+        if points:
+            client.upsert(dst, points=[PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points])
+            n += len(points)
+        if offset is None:
+            break
+    wait_green(client, dst, timeout_s)
+    print(f"Copied {n} points {src} -> {dst} (profile {profile})", file=sys.stderr)
+
+
+def wait_green(client, collection, timeout_s=3600):
+    # Wait for indexing/quantization to finish so latency isn't measured mid-optimization
+    deadline = time.time() + timeout_s
+    while str(client.get_collection(collection).status).lower().endswith("yellow") and time.time() < deadline:
+        time.sleep(2)
+
+
+def sample_queries(client, collection, n):
+    """n points drawn uniformly from the whole collection (Qdrant random sampling)."""
+    res = client.query_points(
+        collection, query=SampleQuery(sample=Sample.RANDOM), limit=n, with_payload=False, with_vectors=True
+    )
+    return [(p.id, p.vector) for p in res.points]
+
+
+def embed_queries(path, n):
+    from src.embeddings.providers import build_client
+
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()][:n]
+    vectors, _ = build_client().embed_texts(texts)
+    return [(None, v) for v in vectors]
+
+
+def run(client, collection, queries, k, params):
+    ids, latencies = [], []
+    for qid, vec in queries:
+        t0 = time.perf_counter()
+        res = client.query_points(collection, query=vec, limit=k + 1, search_params=params, with_payload=False)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        ids.append([p.id for p in res.points if p.id != qid][:k])
+    return ids, latencies
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / max(len(t), 1) for f, t in zip(found, truth)]))
+
+
+def latency(ms):
+    p50, p99 = np.percentile(ms, [50, 99])
+    return {"p50_ms": round(float(p50), 2), "p99_ms": round(float(p99), 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Quantized vs. unquantized recall@k / latency")
+    ap.add_argument("--baseline", default=settings.QDRANT_COLLECTION, help="Unquantized collection")
+    ap.add_argument("--collection", help="Quantized collection (default: the baseline, quantization ignored for the baseline run)")
+    ap.add_argument("--copy", action="store_true", help="Create --collection from --baseline with --profile first")
+    ap.add_argument("--apply", action="store_true", help="Move --collection onto --profile in place (apply_profile), then exit")
+    ap.add_argument("--profile", default="forensic-int8")
+    ap.add_argument("--queries", help="File of query texts, one per line")
+    ap.add_argument("--sample", type=int, default=200, help="Held-out points / queries to use")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--hnsw-ef", type=int, default=128)
+    ap.add_argument("--oversampling", type=float, default=None, help="Default: the profile's")
+    args = ap.parse_args()
+
+    client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT, timeout=120)
+    quantized = args.collection or args.baseline
+    if args.apply:
+        apply_profile(client, quantized, args.profile)
+        wait_green(client, quantized)
+        print(f"Applied profile {args.profile} to {quantized}: {client.get_collection(quantized).config.quantization_config}")
+        return
+    if args.copy:
+        if quantized == args.baseline:
+            ap.error("--copy needs a --collection different from --baseline")
+        copy_collection(client, args.baseline, quantized, args.profile)
+
+    if args.queries:
+        queries = embed_queries(args.queries, args.sample)
+    else:
+        queries = sample_queries(client, args.baseline, args.sample)
+    oversampling = args.oversampling or get_profile(args.profile).oversampling
+
+    truth, _ = run(client, args.baseline, queries, args.k, SearchParams(exact=True))
+    modes = {
+        "baseline_hnsw": (
+            args.baseline,
+            SearchParams(hnsw_ef=args.hnsw_ef, quantization=QuantizationSearchParams(ignore=True)),
+        ),
+        # What /search sends with "profile": the profile's oversampling, rescoring on
+        "quantized_rescore": (quantized, search_params(args.profile, args.hnsw_ef, rescore=True, oversampling=oversampling)),
+        "quantized_no_rescore": (
+            quantized,
+            SearchParams(hnsw_ef=args.hnsw_ef, quantization=QuantizationSearchParams(rescore=False)),
+        ),
+    }
+    report = {
+        "baseline": args.baseline,
+        "quantized": quantized,
+        "quantization": str(client.get_collection(quantized).config.quantization_config),
+        "queries": len(queries),
+        "k": args.k,
+        "hnsw_ef": args.hnsw_ef,
+        "oversampling": oversampling,
+    }
+    for name, (collection, params) in modes.items():
+        run(client, collection, queries[:10], args.k, params)  # warm caches / page in mmaps
+        found, ms = run(client, collection, queries, args.k, params)
+        report[name] = {f"recall@{args.k}": round(recall(found, truth), 4), **latency(ms)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
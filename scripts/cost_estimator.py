@@ -1,22 +1,39 @@
 import os, sys; sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 #!/usr/bin/env python3
+import json
 import sys
 from src.embeddings.models import get_model_meta
+from src.pricing import LLM_PRICE_PER_MILLION, PRICE_PER_MILLION, llm_cost
+
+def load_estimate(path: str) -> dict:
+    """Token total and interval from scripts/estimate_tokens.py output."""
+    with open(path) as f:
+        est = json.load(f)
+    print(f"Estimate: {est['root']} ({est['files']:,} files, {est['sampled']:,} sampled, {est['tokenizer']})")
+    return est
 
-PRICE_PER_MILLION = {
-    "BAAI/bge-base-en-v1.5-vllm": 0.008,
-    "togethercomputer/m2-bert-80M-32k-retrieval": 0.008,
-    "BAAI/bge-large-en-v1.5": 0.016,
-    "intfloat/multilingual-e5-large-instruct": 0.020,
-    "Alibaba-NLP/gte-modernbert-base": 0.080,
-}
 
 def main():
-    if len(sys.argv) != 2 and len(sys.argv) != 3:
-        print("Usage: python scripts/cost_estimator.py <model_name> <num_tokens>")
+    if len(sys.argv) not in (2, 3, 4):
+        print("Usage: python scripts/cost_estimator.py <model_name> <num_tokens|token_estimate.json> [completion_tokens]")
         raise SystemExit(1)
     model = sys.argv[1]
-    tokens = int(sys.argv[2]) if len(sys.argv) == 3 else 0
+    est = load_estimate(sys.argv[2]) if len(sys.argv) >= 3 and sys.argv[2].endswith(".json") else None
+    if est:
+        tokens = est["tokens"]
+    else:
+        tokens = int(sys.argv[2]) if len(sys.argv) >= 3 else 0
+    if model in LLM_PRICE_PER_MILLION:
+        completion = int(sys.argv[3]) if len(sys.argv) == 4 else 0
+        print(f"Model: {model}\nPrompt tokens: {tokens:,}\nCompletion tokens: {completion:,}")
+        print(f"Est. cost (batch): ${llm_cost(model, tokens, completion):0.6f}")
+        print(f"Est. cost (serverless): ${llm_cost(model, tokens, completion, batch=False):0.6f}")
+        if est and est["ci_low"] is not None:
+            low, high = (llm_cost(model, est[k], completion) for k in ("ci_low", "ci_high"))
+            print(f"{est['confidence']:.0%} interval (batch): ${low:0.6f} - ${high:0.6f}")
+        elif est:
+            print(f"No interval: {est.get('ci', 'insufficient samples')}")
+        return
     meta = get_model_meta(model)
     price = PRICE_PER_MILLION.get(meta.name)
     if price is None:
@@ -24,6 +41,11 @@ def main():
         raise SystemExit(2)
     cost = (tokens / 1_000_000) * price
     print(f"Model: {meta.name}\nTokens: {tokens:,}\nEst. cost: ${cost:0.6f}")
+    if est and est["ci_low"] is None:
+        print(f"No interval: {est.get('ci', 'insufficient samples')}")
+    elif est:
+        low, high = (est[k] / 1_000_000 * price for k in ("ci_low", "ci_high"))
+        print(f"{est['confidence']:.0%} interval: {est['ci_low']:,} - {est['ci_high']:,} tokens (${low:0.6f} - ${high:0.6f})")
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,20 @@
 #!/usr/bin/env python3
-import os, sys, json, time, subprocess, mimetypes, math, hashlib
+"""Catalog a case folder: file counts, bytes, PDF pages, audio/video seconds and a rough
+token/cost estimate.
+
+PDF page counts and media durations are probed in a thread pool (pypdf in-process,
+pdfinfo/ffprobe as fallback) and cached in SQLite by (path, size, mtime), so re-runs only
+probe new or changed files. Failed probes are cached too, and the cache is committed as
+the walk goes, so an interrupted run keeps what it probed.
+
+    python scripts/discover_catalog.py /home/starlord/mas-v2-crewai/cases_to_process catalog-summary.json
+"""
+import os, sys; sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import argparse, heapq, json, sqlite3, subprocess, time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from collections import defaultdict, Counter
-
-ROOT = Path(sys.argv[1] if len(sys.argv) > 1 else "/home/starlord/mas-v2-crewai/cases_to_process")
-OUT  = Path(sys.argv[2] if len(sys.argv) > 2 else "catalog-summary.json")
+from src.pricing import PRICE_PER_MILLION
 
 TEXT_EXT  = {".txt", ".md", ".log", ".csv", ".json", ".xml", ".html", ".htm", ".yml", ".yaml"}
 PDF_EXT   = {".pdf"}
@@ -12,106 +22,193 @@ IMG_EXT   = {".png",".jpg",".jpeg",".tif",".tiff",".bmp",".gif",".webp"}
 AUDIO_EXT = {".mp3",".wav",".m4a",".aac",".flac",".ogg",".opus"}
 VIDEO_EXT = {".mp4",".mov",".mkv",".avi",".m4v",".webm"}
 
-def ffprobe_duration(path: Path) -> float:
+LARGEST_N = 50
+PRICING_MODEL = "BAAI/bge-base-en-v1.5-vllm"
+
+def ffprobe_duration(path: str) -> float | None:
     try:
         p = subprocess.run(
-            ["ffprobe","-v","error","-show_entries","format=duration","-of","default=nw=1:nk=1", str(path)],
+            ["ffprobe","-v","error","-show_entries","format=duration","-of","default=nw=1:nk=1", path],
             capture_output=True, text=True, timeout=30
         )
         return float(p.stdout.strip())
     except Exception:
-        return 0.0
+        return None
 
-def pdf_page_count(path: Path) -> int:
-    # Use 'pdfinfo' if available for speed; fallback rough guess
+def pdf_page_count(path: str) -> int | None:
+    # pypdf only reads the xref/page tree, no subprocess; pdfinfo copes with more broken files
+    try:
+        from pypdf import PdfReader
+        return len(PdfReader(path, strict=False).pages)
+    except Exception:
+        pass
     try:
-        p = subprocess.run(["pdfinfo", str(path)], capture_output=True, text=True, timeout=20)
+        p = subprocess.run(["pdfinfo", path], capture_output=True, text=True, timeout=20)
         for line in p.stdout.splitlines():
             if line.lower().startswith("pages:"):
                 return int(line.split(":")[1].strip())
     except Exception:
         pass
-    return 0
+    return None
+
+PROBES = {"pdf": pdf_page_count, "audio": ffprobe_duration, "video": ffprobe_duration}
+
+MISS = object()  # ProbeCache.get() for files not probed yet; None means the probe failed
+
+class ProbeCache:
+    """Probe results by path; a row only counts while the file's size and mtime match.
+
+    A failed probe is stored as NULL so the same broken file isn't probed again.
+    """
+
+    def __init__(self, path: str, commit_every: int = 500):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS probes (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, kind TEXT, value REAL)"
+        )
+        self.commit_every = commit_every
+        self.uncommitted = 0
+
+    def get(self, path: str, st, kind: str):
+        row = self.db.execute("SELECT size, mtime_ns, kind, value FROM probes WHERE path = ?", (path,)).fetchone()
+        if row and row[:3] == (st.st_size, st.st_mtime_ns, kind):
+            return row[3]
+        return MISS
+
+    def put(self, path: str, st, kind: str, value: float | None):
+        self.db.execute(
+            "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?)", (path, st.st_size, st.st_mtime_ns, kind, value)
+        )
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.db.commit()
+            self.uncommitted = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
 
 def approx_tokens_from_bytes(nbytes: int) -> int:
     # Very rough: 1 token ~ 4 chars; assume UTF-8 1 byte/char avg for plain text
     return max(1, nbytes // 4)
 
-def main():
+def file_kind(ext: str) -> str:
+    for kind, exts in (("text", TEXT_EXT), ("pdf", PDF_EXT), ("image", IMG_EXT), ("audio", AUDIO_EXT), ("video", VIDEO_EXT)):
+        if ext in exts:
+            return kind
+    return "other"
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Catalog a folder and estimate ingestion tokens/cost")
+    ap.add_argument("root", nargs="?", default="/home/starlord/mas-v2-crewai/cases_to_process")
+    ap.add_argument("out", nargs="?", default="catalog-summary.json")
+    ap.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) * 4),
+                    help="Concurrent PDF/media probes")
+    ap.add_argument("--cache", default="data/catalog_probe_cache.sqlite", help="Probe cache ('' disables)")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    root, out = Path(args.root), Path(args.out)
     t0 = time.time()
-    if not ROOT.exists():
-        print(f"Directory not found: {ROOT}", file=sys.stderr)
+    if not root.exists():
+        print(f"Directory not found: {root}", file=sys.stderr)
         sys.exit(2)
 
     totals = dict(files=0, bytes=0, tokens_est=0, pdf_pages=0, audio_sec=0.0, video_sec=0.0, images=0)
     by_type = Counter()
     by_ext  = Counter()
-    largest = []
-
-    for dirpath, _, files in os.walk(ROOT):
-        for name in files:
-            p = Path(dirpath) / name
-            try:
-                st = p.stat()
-            except Exception:
+    probes = Counter()
+    largest = []  # min-heap of the LARGEST_N biggest (size, path)
+    cache = ProbeCache(args.cache) if args.cache else None
+
+    def add_probe(kind: str, value: float):
+        if kind == "pdf":
+            pages = int(value)
+            totals["pdf_pages"] += pages
+            # token estimate ~ 600 tokens per PDF page (typical OCR/page)
+            totals["tokens_est"] += pages * 600
+        else:
+            totals[f"{kind}_sec"] += value
+            # transcription tokens ~ 3.2 tokens/sec average English speech
+            totals["tokens_est"] += int(value * 3.2)
+
+    def collect(done):
+        for fut in done:
+            path, st, kind = pending.pop(fut)
+            value = fut.result()
+            if cache:
+                cache.put(path, st, kind, value)
+            if value is None:
+                probes["failed"] += 1
                 continue
-            ext = p.suffix.lower()
-            size = st.st_size
-            totals["files"] += 1
-            totals["bytes"] += size
-            by_ext[ext] += 1
-
-            if ext in TEXT_EXT:
-                by_type["text"] += 1
-                totals["tokens_est"] += approx_tokens_from_bytes(size)
-
-            elif ext in PDF_EXT:
-                by_type["pdf"] += 1
-                pages = pdf_page_count(p)
-                totals["pdf_pages"] += pages
-                # token estimate ~ 600 tokens per PDF page (typical OCR/page)
-                totals["tokens_est"] += pages * 600
-
-            elif ext in IMG_EXT:
-                by_type["image"] += 1
-                totals["images"] += 1
-                # token estimate for OCR ~ 150 words ~ 200 tokens/image (very rough)
-                totals["tokens_est"] += 200
-
-            elif ext in AUDIO_EXT:
-                by_type["audio"] += 1
-                dur = ffprobe_duration(p)
-                totals["audio_sec"] += dur
-                # transcription tokens ~ 3.2 tokens/sec average English speech
-                totals["tokens_est"] += int(dur * 3.2)
-
-            elif ext in VIDEO_EXT:
-                by_type["video"] += 1
-                dur = ffprobe_duration(p)
-                totals["video_sec"] += dur
-                totals["tokens_est"] += int(dur * 3.2)
-
-            else:
-                by_type["other"] += 1
-                # conservative minimal bump
-                totals["tokens_est"] += approx_tokens_from_bytes(min(size, 5_000))
-
-            largest.append((size, str(p)))
-            if len(largest) > 50:
-                largest = sorted(largest, reverse=True)[:50]
+            probes["probed"] += 1
+            add_probe(kind, value)
+
+    pending = {}
+    try:
+        with ThreadPoolExecutor(args.workers) as pool:
+            for dirpath, _, files in os.walk(root):
+                for name in files:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except Exception:
+                        continue
+                    ext = os.path.splitext(name)[1].lower()
+                    size = st.st_size
+                    kind = file_kind(ext)
+                    totals["files"] += 1
+                    totals["bytes"] += size
+                    by_ext[ext] += 1
+                    by_type[kind] += 1
+
+                    if kind == "text":
+                        totals["tokens_est"] += approx_tokens_from_bytes(size)
+                    elif kind == "image":
+                        totals["images"] += 1
+                        # token estimate for OCR ~ 150 words ~ 200 tokens/image (very rough)
+                        totals["tokens_est"] += 200
+                    elif kind in PROBES:
+                        value = cache.get(path, st, kind) if cache else MISS
+                        if value is None:
+                            probes["cached_failed"] += 1
+                        elif value is not MISS:
+                            probes["cached"] += 1
+                            add_probe(kind, value)
+                        else:
+                            pending[pool.submit(PROBES[kind], path)] = (path, st, kind)
+                            # Bound in-flight probes so huge trees don't queue millions of futures
+                            if len(pending) >= args.workers * 16:
+                                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                    else:
+                        # conservative minimal bump
+                        totals["tokens_est"] += approx_tokens_from_bytes(min(size, 5_000))
+
+                    if len(largest) < LARGEST_N:
+                        heapq.heappush(largest, (size, path))
+                    elif size > largest[0][0]:
+                        heapq.heapreplace(largest, (size, path))
+            collect(wait(pending).done)
+    finally:
+        # Commits whatever was probed, also on Ctrl-C
+        if cache:
+            cache.close()
 
     # cost estimate with our model price (BAAI/bge-base-en-v1.5-vllm @ $0.008/M)
-    price_per_million = 0.008
+    price_per_million = PRICE_PER_MILLION[PRICING_MODEL]
     tokens = totals["tokens_est"]
     cost = (tokens/1_000_000.0)*price_per_million
 
     summary = {
-        "root": str(ROOT),
+        "root": str(root),
         "totals": totals,
         "by_type": dict(by_type),
         "by_ext": dict(by_ext.most_common(50)),
         "largest_files": [{"bytes":b,"path":p} for b,p in sorted(largest, reverse=True)],
-        "pricing": {"model":"BAAI/bge-base-en-v1.5-vllm","price_per_million_tokens":price_per_million,"est_cost_usd": round(cost,6)},
+        "pricing": {"model":PRICING_MODEL,"price_per_million_tokens":price_per_million,"est_cost_usd": round(cost,6)},
+        "probes": {k: probes[k] for k in ("cached", "cached_failed", "probed", "failed")},
         "elapsed_sec": round(time.time()-t0,2),
         "notes": [
             "Token estimates are rough; actual bill is Together input tokens only.",
@@ -119,9 +216,9 @@ def main():
             "PDF page tokens ~600/page; images ~200 tokens/image if OCR text.",
         ],
     }
-    with open(OUT, "w") as f:
+    with open(out, "w") as f:
         json.dump(summary, f, indent=2)
     print(json.dumps(summary, indent=2))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
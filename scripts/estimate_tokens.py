@@ -1,45 +1,256 @@
 import os, sys; sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 #!/usr/bin/env python3
-import argparse, os, random, glob, json
-from transformers import AutoTokenizer
-
-def main():
-    ap = argparse.ArgumentParser(description="Estimate tokens for a corpus using a model tokenizer")
-    ap.add_argument("path", help="Directory to scan for text-like files")
-    ap.add_argument("--glob", default="**/*.txt", help="Glob pattern (default: **/*.txt)")
-    ap.add_argument("--sample", type=int, default=1000, help="Sample size (default: 1000 files)")
-    ap.add_argument("--model", default="BAAI/bge-base-en-v1.5", help="HF tokenizer model name")
-    args = ap.parse_args()
-
-    tok = AutoTokenizer.from_pretrained(args.model)
-    files = glob.glob(os.path.join(args.path, args.glob), recursive=True)
-    if not files:
-        print("No files matched.")
-        return
-    random.shuffle(files)
-    files = files[: args.sample]
+"""Corpus token estimate with confidence intervals, from a stratified sample.
+
+Files are stratified by extension and size bucket. Each stratum is sampled in proportion
+to its bytes (at least --min-per-stratum files), and each sampled file's text is capped
+at --max-bytes. The capped text is tokenized in batches across processes and scaled up
+by the share of the file it covers. Per stratum, tokens = (sampled tokens / sampled
+bytes) * stratum bytes, a ratio estimate with the usual finite-population variance. The
+output JSON feeds scripts/cost_estimator.py:
+
+    python scripts/estimate_tokens.py /home/starlord/raycastfiles/Life --out token_estimate.json
+    python scripts/cost_estimator.py BAAI/bge-base-en-v1.5-vllm token_estimate.json
+"""
+import argparse, bisect, fnmatch, json, math, random, re, time, zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from src.chunking import approx_tokens
+
+TEXT_EXTS = {".txt", ".log", ".md", ".csv", ".tsv", ".json", ".jsonl", ".ndjson", ".xml", ".html", ".htm",
+             ".eml", ".rtf", ".ini", ".cfg", ".yaml", ".yml"}
+OFFICE_EXTS = {".docx", ".pptx", ".xlsx"}
+OFFICE_PARTS = ("word/document", "ppt/slides/slide", "xl/sharedStrings")
+
+SIZE_EDGES = [4 << 10, 64 << 10, 1 << 20, 16 << 20]
+SIZE_LABELS = ["<4K", "4K-64K", "64K-1M", "1M-16M", ">=16M"]
+
+
+def size_bucket(size: int) -> str:
+    return SIZE_LABELS[bisect.bisect_right(SIZE_EDGES, size)]
+
 
-    total_tokens = 0
-    total_bytes = 0
-    counted = 0
-    for fp in files:
+def capped_text(path: str, ext: str, size: int, max_bytes: int) -> tuple[str, float]:
+    """(text, share of the file it covers); the text is at most ~max_bytes."""
+    if ext == ".pdf":
+        from pypdf import PdfReader
+        pages = PdfReader(path, strict=False).pages
+        parts, n, read = [], 0, 0
+        for page in pages:
+            parts.append(page.extract_text() or "")
+            n += len(parts[-1])
+            read += 1
+            if n >= max_bytes:
+                break
+        return "\n".join(parts), (read / len(pages) if len(pages) else 1.0)
+    if ext in OFFICE_EXTS:
+        # Coverage by uncompressed XML consumed, tags stripped afterwards
+        with zipfile.ZipFile(path) as z:
+            infos = sorted((i for i in z.infolist() if i.filename.endswith(".xml") and i.filename.startswith(OFFICE_PARTS)),
+                           key=lambda i: i.filename)
+            total = sum(i.file_size for i in infos)
+            xml, used = [], 0
+            for info in infos:
+                with z.open(info) as f:
+                    data = f.read(max(0, max_bytes * 4 - used))
+                xml.append(data.decode("utf-8", "ignore"))
+                used += len(data)
+                if used >= max_bytes * 4:
+                    break
+        return " ".join(re.sub(r"<[^>]+>", " ", "".join(xml)).split()), (used / total if total else 1.0)
+    with open(path, "rb") as f:
+        data = f.read(max_bytes)
+    return data.decode("utf-8", "ignore"), (len(data) / size if size else 1.0)
+
+
+_tokenizer = None
+
+
+def _init_worker(tokenizer_name: str):
+    global _tokenizer
+    if tokenizer_name != "approx":
+        from transformers import AutoTokenizer
+        _tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, use_fast=True)
+
+
+def _count_tokens(texts: list[str]) -> list[int]:
+    if _tokenizer is None:
+        return [approx_tokens(t) for t in texts]
+    ids = _tokenizer(texts, add_special_tokens=False, return_attention_mask=False, verbose=False)["input_ids"]
+    return [len(i) for i in ids]
+
+
+def measure(batch: list[tuple[str, str, int]], max_bytes: int) -> list[float | None]:
+    """Estimated whole-file tokens for (path, ext, size) items; None where the file can't be read."""
+    texts, coverage, out = [], [], [None] * len(batch)
+    for path, ext, size in batch:
         try:
-            with open(fp, "r", encoding="utf-8", errors="ignore") as f:
-                txt = f.read()
-            total_bytes += len(txt.encode("utf-8", "ignore"))
-            total_tokens += len(tok.encode(txt, add_special_tokens=False))
-            counted += 1
+            text, share = capped_text(path, ext, size, max_bytes)
         except Exception:
-            continue
-
-    avg_tokens = total_tokens / max(1, counted)
-    avg_bytes = total_bytes / max(1, counted)
-    print(json.dumps({
-        "files_counted": counted,
-        "avg_tokens_per_file": avg_tokens,
-        "avg_bytes_per_file": avg_bytes,
-        "est_tokens_total_for_dir": avg_tokens * len(files),
-    }, indent=2))
+            text, share = None, 0.0
+        texts.append(text)
+        coverage.append(share)
+    ok = [i for i, t in enumerate(texts) if t is not None]
+    for i, n in zip(ok, _count_tokens([texts[i] for i in ok])):
+        out[i] = n / coverage[i] if coverage[i] > 0 else 0.0
+    return out
+
+
+def allocate(strata: dict, sample: int, min_per: int) -> dict:
+    """Sample size per stratum, proportional to bytes with a floor."""
+    total = sum(s["bytes"] for s in strata.values()) or 1
+    return {
+        key: min(len(s["files"]), max(min_per, round(sample * s["bytes"] / total)))
+        for key, s in strata.items()
+    }
+
+
+def ratio_estimate(files: list, sampled: list, pooled: tuple[float, float] | None) -> dict:
+    """Ratio estimate of a stratum's tokens and its variance.
+
+    `files` are (path, size), `sampled` are (size, tokens). Strata with fewer than two
+    readable samples fall back to the run's pooled (ratio, residual variance per byte²).
+    """
+    N, X, n = len(files), sum(size for _, size in files), len(sampled)
+    if n:
+        r = sum(y for _, y in sampled) / (sum(x for x, _ in sampled) or 1)
+    elif pooled:
+        r = pooled[0]
+    else:
+        return {"tokens": 0.0, "var": math.inf, "tokens_per_byte": 0.0}
+    if n >= 2:
+        s2 = sum((y - r * x) ** 2 for x, y in sampled) / (n - 1)
+    elif n == N:
+        s2 = 0.0
+    elif pooled:
+        s2 = pooled[1] * (X / N) ** 2
+    else:
+        s2 = math.inf
+    var = N * N * (1 - n / N) * s2 / max(n, 1) if s2 else 0.0
+    return {"tokens": r * X, "var": var, "tokens_per_byte": r}
+
+
+def interval(tokens: float, var: float, z: float) -> dict:
+    """ci_low/ci_high, or nulls flagged when the variance can't be estimated."""
+    if not math.isfinite(var):
+        return {"ci_low": None, "ci_high": None, "ci": "insufficient samples"}
+    half = z * math.sqrt(var)
+    return {"ci_low": max(0, round(tokens - half)), "ci_high": round(tokens + half)}
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Stratified token estimate with confidence intervals")
+    ap.add_argument("path", help="Directory to scan")
+    ap.add_argument("--glob", default=None, help="Only files whose path matches this glob, e.g. '*.pdf'")
+    ap.add_argument("--sample", type=int, default=1000, help="Total files to sample (default: 1000)")
+    ap.add_argument("--min-per-stratum", type=int, default=3)
+    ap.add_argument("--max-bytes", type=int, default=256 << 10, help="Text tokenized per sampled file")
+    ap.add_argument("--model", default="BAAI/bge-base-en-v1.5",
+                    help="HF tokenizer model name, or 'approx' for ~4 chars/token")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--batch", type=int, default=32, help="Files tokenized per call")
+    ap.add_argument("--confidence", type=float, default=0.95)
+    ap.add_argument("--seed", type=int, default=13)
+    ap.add_argument("--out", default="token_estimate.json")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    t0 = time.time()
+    rnd = random.Random(args.seed)
+    strata = defaultdict(lambda: {"files": [], "bytes": 0})
+    skipped = defaultdict(lambda: {"files": 0, "bytes": 0})
+    for dirpath, _, names in os.walk(args.path):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if args.glob and not fnmatch.fnmatch(path, args.glob):
+                continue
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in TEXT_EXTS and ext not in OFFICE_EXTS and ext != ".pdf":
+                # Images, media, binaries: no text layer to count here
+                skipped[ext]["files"] += 1
+                skipped[ext]["bytes"] += size
+                continue
+            s = strata[(ext, size_bucket(size))]
+            s["files"].append((path, size))
+            s["bytes"] += size
+    if not strata:
+        print("No files matched.")
+        return
+
+    plan = allocate(strata, args.sample, args.min_per_stratum)
+    work = []
+    for key, n in plan.items():
+        for path, size in rnd.sample(strata[key]["files"], n):
+            work.append((key, path, size))
+    batches = [work[i:i + args.batch] for i in range(0, len(work), args.batch)]
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.model,)) as pool:
+        results = pool.map(measure, [[(p, k[0], sz) for k, p, sz in b] for b in batches],
+                           [args.max_bytes] * len(batches))
+        measured = [y for ys in results for y in ys]
+
+    sampled = defaultdict(list)
+    failed = 0
+    for (key, _, size), y in zip(work, measured):
+        if y is None:
+            failed += 1
+        else:
+            sampled[key].append((size, y))
+
+    all_pairs = [p for pairs in sampled.values() for p in pairs]
+    pooled = None
+    if len(all_pairs) >= 2:
+        r = sum(y for _, y in all_pairs) / (sum(x for x, _ in all_pairs) or 1)
+        # Residual variance relative to size², so it scales to strata of other sizes
+        rel = [((y - r * x) / x) ** 2 for x, y in all_pairs if x]
+        pooled = (r, sum(rel) / max(1, len(rel) - 1))
+
+    z = NormalDist().inv_cdf(0.5 + args.confidence / 2)
+    rows, total, total_var = [], 0.0, 0.0
+    for key in sorted(strata, key=lambda k: -strata[k]["bytes"]):
+        est = ratio_estimate(strata[key]["files"], sampled[key], pooled)
+        total += est["tokens"]
+        total_var += est["var"]
+        rows.append({
+            "ext": key[0],
+            "size_bucket": key[1],
+            "files": len(strata[key]["files"]),
+            "bytes": strata[key]["bytes"],
+            "sampled": len(sampled[key]),
+            "tokens": round(est["tokens"]),
+            **interval(est["tokens"], est["var"], z),
+            "tokens_per_byte": round(est["tokens_per_byte"], 4),
+        })
+    summary = {
+        "root": args.path,
+        "tokenizer": args.model,
+        "confidence": args.confidence,
+        "tokens": round(total),
+        **interval(total, total_var, z),
+        "files": sum(len(s["files"]) for s in strata.values()),
+        "bytes": sum(s["bytes"] for s in strata.values()),
+        "sampled": len(all_pairs),
+        "sample_failed": failed,
+        "strata": rows,
+        "not_estimated": dict(sorted(skipped.items(), key=lambda kv: -kv[1]["bytes"])[:20]),
+        "elapsed_sec": round(time.time() - t0, 2),
+        "notes": [
+            "PDF tokens are text-layer only; scanned pages need OCR and count as 0 here.",
+            "Intervals use the normal approximation; strata with < 2 readable samples borrow the pooled variance.",
+            "ci_low/ci_high are null where a stratum's variance can't be estimated (too few readable samples).",
+        ],
+    }
+    with open(args.out, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps({k: v for k, v in summary.items() if k not in ("strata", "not_estimated")}, indent=2))
+    print(f"Wrote {args.out} ({len(rows)} strata)", file=sys.stderr)
+
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import os, sys, re, json, pathlib, shutil, zipfile
 from pathlib import Path
+from src.chunking import iter_decoded_blocks
 
 ROOT=Path(sys.argv[1])
 OUT =Path(sys.argv[2] if len(sys.argv)>2 else "artifact_dump")
@@ -25,10 +26,13 @@ def keep(p:Path):
     s=str(p).replace('/', '\\')
     return any(re.search(t, s, flags=re.IGNORECASE) for t in targets)
 
-def write_text(path:Path, rel:Path, text:str):
+def write_text(path:Path, rel:Path):
     out=(OUT/rel).with_suffix((rel.suffix or "") + ".txt")
     out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_text(text, encoding='utf-8', errors='ignore')
+    # naive text recovery, streamed block by block (mmap) so multi-GB caches don't OOM
+    with open(out, "w", encoding='utf-8', errors='ignore') as f:
+        for block in iter_decoded_blocks(str(path)):
+            f.write(block)
 
 def harvest():
     report=[]
@@ -48,10 +52,7 @@ def harvest():
                 low=fn.lower()
                 if low.endswith((".lnk",".txt",".log",".json",".csv",".xml",".html",".htm",".dat",".asd",".wbk",".odl",".odlgz",".ini",".etl",".mrulist",".officeui")):
                     try:
-                        data=p.read_bytes()
-                        # naive text recovery
-                        text=data.decode('utf-8','ignore')
-                        write_text(p, rel, text)
+                        write_text(p, rel)
                     except Exception:
                         pass
                 report.append(str(rel))
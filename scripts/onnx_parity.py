@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Check int8 ONNX embeddings against the fp32 sentence-transformers model and time both on CPU.
+
+Exits non-zero when any vector's cosine to its fp32 counterpart falls under --min-cosine.
+"""
+import os, sys; sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import argparse, json, time
+import numpy as np
+from src.embeddings.client import LOCAL_SUPPORTED
+from src.embeddings.models import get_model_meta
+from src.embeddings.onnx_backend import OnnxEncoder, default_threads
+
+SAMPLES = [
+    "Deposition transcript of the treating physician regarding post-operative care.",
+    "401K rollover statement showing employer match and vesting schedule for 2023.",
+    "OUTLOOK.EXE opened attachment invoice_0311.pdf from the Content.Outlook cache.",
+    "Estate planning memo: revocable trust funding checklist and beneficiary designations.",
+    "The hospital failed to document informed consent prior to the second procedure.",
+    "Prefetch entry for POWERSHELL.EXE last run 2024-03-11 09:14:02 with 7 prior runs.",
+    "Quarterly summary of medical bills, insurance adjustments and outstanding balances.",
+    "short",
+]
+
+
+def load_texts(path: str | None, n: int) -> list[str]:
+    if path:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = SAMPLES
+    return [texts[i % len(texts)] for i in range(n)]
+
+
+def throughput(fn, texts, repeats: int) -> float:
+    fn(texts[:8])  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn(texts)
+    return round(len(texts) * repeats / (time.perf_counter() - t0), 1)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ONNX int8 vs fp32 parity and CPU throughput")
+    ap.add_argument("--model", default="BAAI/bge-base-en-v1.5-vllm", choices=sorted(LOCAL_SUPPORTED))
+    ap.add_argument("--texts", help="File with one text per line (default: built-in samples)")
+    ap.add_argument("-n", type=int, default=256, help="Texts to embed (default: 256)")
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--threads", type=int, default=default_threads())
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--min-cosine", type=float, default=0.98)
+    args = ap.parse_args()
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(args.threads)
+    hf_name = LOCAL_SUPPORTED[args.model]
+    texts = load_texts(args.texts, args.n)
+
+    reference = SentenceTransformer(hf_name, device="cpu")
+    quantized = OnnxEncoder(hf_name, max_tokens=get_model_meta(args.model).max_tokens, threads=args.threads)
+
+    def ref_encode(xs):
+        return reference.encode(xs, batch_size=args.batch, convert_to_numpy=True, normalize_embeddings=True)
+
+    def onnx_encode(xs):
+        return quantized.encode(xs, batch_size=args.batch, normalize=True)
+
+    cos = np.sum(ref_encode(texts) * onnx_encode(texts), axis=1)
+    report = {
+        "model": hf_name,
+        "threads": args.threads,
+        "texts": len(texts),
+        "cosine": {"min": round(float(cos.min()), 4), "mean": round(float(cos.mean()), 4)},
+        "texts_per_sec": {
+            "fp32_sentence_transformers": throughput(ref_encode, texts, args.repeats),
+            "int8_onnx": throughput(onnx_encode, texts, args.repeats),
+        },
+    }
+    tps = report["texts_per_sec"]
+    report["speedup"] = round(tps["int8_onnx"] / max(tps["fp32_sentence_transformers"], 1e-9), 2)
+    report["pass"] = bool(cos.min() >= args.min_cosine)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["pass"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,34 @@
 # src/api_v2.py
+import asyncio
+import base64
+import io
 import logging
 import os
+import time
+from collections import deque
 from contextlib import asynccontextmanager
+from typing import List, Literal, Optional, Union
 from uuid import uuid4
 
+import numpy as np
 import redis
 from fastapi import FastAPI, HTTPException, Response
-from prometheus_client import Counter, generate_latest
+from prometheus_client import Counter, Histogram, generate_latest
 from pydantic import BaseModel
 from qdrant_client import QdrantClient
-from qdrant_client.http.exceptions import UnexpectedResponse
-from qdrant_client.http.models import Distance, VectorParams
-from rq import Queue
+from rq import Queue, Retry
+from rq.job import Dependency
+from src import bulk_load
+from src.categorization import route_query
 from src.config import settings
+from src.embeddings.batcher import DynamicBatcher
 from src.embeddings.models import get_model_meta
-from src.forensic_worker import process_forensic_file
+from src.embeddings.providers import build_client
+from src.forensic_worker import finalize_split_pdf, process_forensic_file, process_pdf_page_range
+from src.pdf_pages import plan_page_ranges, should_split
+from src.qdrant_provisioning import ensure_collection, get_profile
+from src.search import QueryEmbeddingCache, build_filter, resolve_collections, search_collections
+from src.triage import SKIP, TriageDecision, TriageReport, triage_file, triage_report_path
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,40 +38,61 @@ VECTOR_DIMENSIONS = get_model_meta(settings.TOGETHER_EMBEDDING_MODEL).dim
 
 
 def initialize_qdrant():
-    """Ensures the Qdrant collection exists with the correct dimensions."""
+    """Ensures the Qdrant collection exists with the correct dimensions, profile and payload indexes."""
     client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
     try:
-        # Check if collection exists
-        collection_info = client.get_collection(
-            collection_name=settings.QDRANT_COLLECTION
-        )
-        # Verify dimensions
-        if collection_info.config.params.vectors.size != VECTOR_DIMENSIONS:
-            logger.error(
-                f"CRITICAL: Collection exists but dimensions are incorrect ({collection_info.config.params.vectors.size} != {VECTOR_DIMENSIONS}). You must delete the collection or change the collection name and restart."
-            )
-            exit(1)  # Exit to prevent ingestion failure
-        logger.info(f"Collection '{settings.QDRANT_COLLECTION}' verified.")
-    except (UnexpectedResponse, ValueError):
-        # Collection does not exist, create it
-        logger.info(
-            f"Creating collection '{settings.QDRANT_COLLECTION}' with {VECTOR_DIMENSIONS} dimensions (BGE-M3)."
-        )
-        client.create_collection(
-            collection_name=settings.QDRANT_COLLECTION,
-            vectors_config=VectorParams(
-                size=VECTOR_DIMENSIONS, distance=Distance.COSINE
-            ),
+        created = ensure_collection(client, settings.QDRANT_COLLECTION, VECTOR_DIMENSIONS, settings.QDRANT_PROFILE)
+    except ValueError as e:
+        logger.error(f"CRITICAL: {e} You must delete the collection or change the collection name and restart.")
+        exit(1)  # Exit to prevent ingestion failure
+    logger.info(f"Collection '{settings.QDRANT_COLLECTION}' {'created' if created else 'verified'}.")
+
+
+class LatencyWindow:
+    """Recent request latencies for p50/p99 reporting."""
+
+    def __init__(self, size: int = 2048):
+        self.samples: deque = deque(maxlen=size)
+
+    def add(self, ms: float):
+        self.samples.append(ms)
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"count": 0, "p50_ms": None, "p99_ms": None}
+        p50, p99 = np.percentile(np.fromiter(self.samples, dtype=np.float64), [50, 99])
+        return {"count": len(self.samples), "p50_ms": round(float(p50), 1), "p99_ms": round(float(p99), 1)}
+
+
+# One long-lived client + cross-request batcher per served model, built at startup
+embedders: dict[str, DynamicBatcher] = {}
+embed_latency: dict[str, LatencyWindow] = {}
+query_cache = QueryEmbeddingCache(settings.SEARCH_CACHE_SIZE)
+search_qdrant = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+
+
+def start_embedders():
+    for name in settings.EMBED_API_MODELS:
+        model = get_model_meta(name).name
+        embedders[model] = DynamicBatcher(
+            build_client(model),
+            max_batch=settings.EMBEDDINGS_MAX_BATCH,
+            max_wait_s=settings.EMBED_API_MAX_WAIT_MS / 1000,
         )
+        embed_latency[model] = LatencyWindow()
+        logger.info(f"Embedding model '{model}' ready for /embed")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
     initialize_qdrant()
+    start_embedders()
     # (Ensure Redis connection logic is also initialized here or globally)
     yield
-    # Shutdown logic (if any)
+    # Shutdown logic
+    for batcher in embedders.values():
+        batcher.close(timeout=5)
 
 
 app = FastAPI(title="MAS V2 Forensic Ingestion Engine (Phase 1)", lifespan=lifespan)
@@ -79,12 +114,93 @@ except redis.exceptions.ConnectionError as e:
 FILES_QUEUED = Counter(
     "ingestion_files_queued_total", "Total files queued for processing"
 )
+FILES_TRIAGED = Counter(
+    "ingestion_files_triaged_total", "Files routed by the pre-OCR triage", ["route"]
+)
+BYTES_AVOIDED = Counter(
+    "ingestion_triage_bytes_avoided_total", "Bytes skipped by the pre-OCR triage"
+)
+EMBED_LATENCY = Histogram(
+    "embed_request_seconds",
+    "End-to-end /embed latency",
+    ["model"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+EMBED_TEXTS = Counter("embed_texts_total", "Texts embedded via /embed", ["model"])
+SEARCH_LATENCY = Histogram(
+    "search_request_seconds",
+    "End-to-end /search latency",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+SEARCH_CACHE = Counter("search_query_cache_total", "Query embedding cache lookups", ["result"])
+
+
+def enqueue_split_pdf(file_path: str, collection: str, batch_id: str, strategy: str, n_pages: int):
+    """Fan a large PDF out into page-range jobs plus one finalize job that depends on all of them.
+
+    Finalize runs even if a range fails for good, so the document is reported as failed
+    (and a bulk-load session's pending count still reaches zero).
+    """
+    file_key = f"{batch_id}_{abs(hash(file_path))}"
+    ranges = plan_page_ranges(n_pages, settings.PDF_PAGES_PER_RANGE)
+    range_jobs = [
+        ingestion_queue.enqueue(
+            process_pdf_page_range,
+            args=(file_path, start, end, batch_id, strategy),
+            job_id=f"{file_key}_p{start + 1}-{end}",
+            retry=Retry(max=2, interval=[30, 120]),
+        )
+        for start, end in ranges
+    ]
+    ingestion_queue.enqueue(
+        finalize_split_pdf,
+        args=(file_path, collection, batch_id, ranges),
+        job_id=file_key,
+        depends_on=Dependency(jobs=range_jobs, allow_failure=True),
+    )
+    logger.info(f"Split {file_path} ({n_pages} pages) into {len(ranges)} page-range jobs")
+    return len(ranges)
+
+
+class EmbedRequest(BaseModel):
+    texts: Optional[Union[List[str], str]] = None
+    text: Optional[str] = None  # single-text form used by older Work Buddy callers
+    model: Optional[str] = None
+    # json: nested lists; base64: little-endian float32 row-major; npy: raw .npy body
+    format: Literal["json", "base64", "npy"] = "json"
+
+
+class SearchRequest(BaseModel):
+    query: str
+    # Names or glob patterns, e.g. ["work-buddy-*"]; defaults to the forensic collection
+    collections: Optional[List[str]] = None
+    # Only search the category collections whose keywords occur in the query (see
+    # src/categorization.py); without `collections` the candidates are work-buddy-*
+    route: bool = False
+    limit: int = 10
+    case: Optional[Union[str, List[str]]] = None
+    modality: Optional[Union[str, List[str]]] = None
+    ts_month: Optional[Union[str, List[str]]] = None
+    batch_id: Optional[Union[str, List[str]]] = None
+    # "document" = only the per-file summaries written by hierarchical enrichment
+    summary_level: Optional[Union[str, List[str]]] = None
+    hnsw_ef: Optional[int] = None  # higher = better recall, slower; None uses the collection default
+    score_threshold: Optional[float] = None
+    # Quantized collections: candidates fetched = limit * oversampling, rescored on originals
+    oversampling: Optional[float] = None
+    rescore: Optional[bool] = None
+    # Collection profile (src/qdrant_provisioning.py) whose oversampling/rescore defaults apply
+    profile: Optional[str] = None
+    with_payload: Union[bool, List[str]] = True
+    model: Optional[str] = None
 
 
 class IngestRequest(BaseModel):
     remote_folder_path: str
     collection: str
     batch_id: str = None
+    # Disable HNSW building until every file of the batch is in, then index once
+    bulk_load: bool = False
 
 
 @app.get("/metrics")
@@ -92,13 +208,14 @@ async def metrics():
     return Response(generate_latest(), media_type="text/plain")
 
 
-@app.post("/ingest_folder", status_code=202)
-async def ingest_folder(request: IngestRequest):
-    if not os.path.exists(request.remote_folder_path):
-        raise HTTPException(status_code=400, detail="Remote path does not exist.")
-
-    batch_id = request.batch_id or f"batch_{uuid4()}".replace("-", "_")
+def queue_folder(request: IngestRequest, batch_id: str) -> tuple[int, TriageReport]:
+    """Walk the folder, triage each file and enqueue the ones worth processing."""
     total_files_queued = 0
+    report = TriageReport()
+    if request.bulk_load:
+        qdrant = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+        ensure_collection(qdrant, request.collection, VECTOR_DIMENSIONS, settings.QDRANT_PROFILE)
+        bulk_load.begin(qdrant, request.collection, batch_id)
 
     # Walk the directory and queue files
     # This process requires a high client-side timeout for massive drives
@@ -106,66 +223,215 @@ async def ingest_folder(request: IngestRequest):
         for file in files:
             file_path = os.path.join(root, file)
 
-            # Optional: Add filtering logic here to skip system binaries (.dll, .exe) if desired
+            # Skip system binaries / low-value files and pick the OCR strategy up front
+            if settings.TRIAGE_ENABLED:
+                decision = triage_file(file_path)
+            else:
+                decision = TriageDecision(file_path, settings.OCR_STRATEGY, "triage_disabled", 0)
+            report.add(decision)
+            FILES_TRIAGED.labels(decision.route).inc()
+            if decision.route == SKIP:
+                BYTES_AVOIDED.inc(decision.size)
+                continue
 
-            job = ingestion_queue.enqueue(
-                process_forensic_file,
-                args=(file_path, request.collection, batch_id),
-                job_id=f"{batch_id}_{abs(hash(file_path))}",
-            )
+            if request.bulk_load:
+                bulk_load.add_jobs(batch_id)  # before enqueueing so a fast worker can't underflow
+            is_pdf = os.path.splitext(file_path)[1].lower() == ".pdf"
+            n_pages = should_split(file_path) if is_pdf else 0
+            if n_pages:
+                enqueue_split_pdf(file_path, request.collection, batch_id, decision.strategy, n_pages)
+            else:
+                ingestion_queue.enqueue(
+                    process_forensic_file,
+                    args=(file_path, request.collection, batch_id, decision.strategy),
+                    job_id=f"{batch_id}_{abs(hash(file_path))}",
+                )
             total_files_queued += 1
+    return total_files_queued, report
+
+
+@app.post("/ingest_folder", status_code=202)
+async def ingest_folder(request: IngestRequest):
+    if not os.path.exists(request.remote_folder_path):
+        raise HTTPException(status_code=400, detail="Remote path does not exist.")
+
+    batch_id = request.batch_id or f"batch_{uuid4()}".replace("-", "_")
+    # The walk reads and triages every file (entropy, PDF page counts); keep it off the event loop
+    total_files_queued, report = await asyncio.to_thread(queue_folder, request, batch_id)
 
     FILES_QUEUED.inc(total_files_queued)
+    if request.bulk_load:
+        bulk_load.enqueue_done(batch_id)
+    triage = report.to_dict()
+    report.write(triage_report_path(batch_id))
+    logger.info(
+        f"Batch {batch_id}: queued {total_files_queued} files, skipped {triage['files_skipped']} "
+        f"({triage['bytes_avoided'] / 1e9:.2f} GB avoided)"
+    )
     return {
         "status": "queued",
         "batch_id": batch_id,
         "total_files_queued": total_files_queued,
+        "triage": triage,
+        "bulk_load": request.bulk_load,
     }
 
 
-if __name__ == "__main__":
-    import uvicorn
+@app.get("/batch/{batch_id}/bulk_load")
+async def bulk_load_status(batch_id: str):
+    """loading -> indexing -> searchable, with load time and time-to-searchable."""
+    info = bulk_load.status(batch_id)
+    if not info:
+        raise HTTPException(status_code=404, detail=f"No bulk load for batch '{batch_id}'")
+    return info
+
+
+@app.get("/batch/{batch_id}/failures")
+async def batch_failures(batch_id: str):
+    """Files of the batch that could not be ingested (e.g. a split PDF with failed page ranges)."""
+    failed = bulk_load.failures(batch_id)
+    return {"batch_id": batch_id, "failed_files": len(failed), "files": failed}
+
+
+@app.post("/batch/{batch_id}/bulk_load/finish", status_code=202)
+async def bulk_load_finish(batch_id: str):
+    """Force index restore, e.g. when a job died without reporting back."""
+    if not bulk_load.status(batch_id):
+        raise HTTPException(status_code=404, detail=f"No bulk load for batch '{batch_id}'")
+    job = ingestion_queue.enqueue(bulk_load.finish_bulk_load, batch_id, job_timeout=settings.BULK_LOAD_INDEX_TIMEOUT_S + 300)
+    return {"status": "queued", "job_id": job.id}
 
-    uvicorn.run(app, host="0.0.0.0", port=8002)
-    uvicorn.run(app, host="0.0.0.0", port=8002)
 
 # ===== Work Buddy Integration Endpoint =====
 @app.post("/embed")
-async def create_embeddings(request: dict):
+async def create_embeddings(request: EmbedRequest):
     """
     Embedding endpoint for Work Buddy RAG integration.
-    Uses existing EmbeddingClient with GPU acceleration.
+    Texts from concurrent requests are coalesced into shared batches by the model's
+    DynamicBatcher; the handler only awaits its future.
     """
-    from src.embeddings.client import EmbeddingClient
-    import os
-    
-    texts = request.get("texts", [request.get("text", "")])
+    texts = request.texts if request.texts is not None else [request.text or ""]
     if isinstance(texts, str):
         texts = [texts]
-    
+    if not texts or len(texts) > settings.EMBED_API_MAX_TEXTS:
+        raise HTTPException(status_code=400, detail=f"Send 1..{settings.EMBED_API_MAX_TEXTS} texts.")
     try:
-        # Use your existing embedding infrastructure
-        client = EmbeddingClient(
-            api_key=os.getenv("TOGETHER_API_KEY", ""),
-            base_url=os.getenv("TOGETHER_BASE_URL", "https://api.together.xyz"),
-            model=request.get("model", "BAAI/bge-base-en-v1.5-vllm"),
-            backend=os.getenv("EMBEDDINGS_BACKEND", "together"),
-            l2_normalize=False,
-            max_batch=32
-        )
-        
-        # Get embeddings
-        embeddings = []
-        for text in texts:
-            embedding = client.embed([text])[0]
-            embeddings.append(embedding.tolist() if hasattr(embedding, "tolist") else embedding)
-        
-        return {
-            "embeddings": embeddings,
-            "model": request.get("model", "BAAI/bge-base-en-v1.5-vllm"),
-            "dimensions": len(embeddings[0]) if embeddings else 768
-        }
-        
+        model = get_model_meta(request.model or settings.EMBED_API_MODELS[0]).name
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if model not in embedders:
+        raise HTTPException(status_code=400, detail=f"Model '{model}' is not served; available: {sorted(embedders)}")
+
+    t0 = time.perf_counter()
+    try:
+        vectors = await asyncio.wrap_future(embedders[model].submit(texts))
     except Exception as e:
         logger.error(f"Embedding failed: {e}")
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        raise HTTPException(status_code=502, detail=f"Embedding failed: {e}")
+    elapsed = time.perf_counter() - t0
+    EMBED_LATENCY.labels(model).observe(elapsed)
+    EMBED_TEXTS.labels(model).inc(len(texts))
+    embed_latency[model].add(elapsed * 1000)
+
+    arr = np.asarray(vectors, dtype="<f4")
+    meta = {"model": model, "dimensions": int(arr.shape[1]), "count": int(arr.shape[0]), "latency_ms": round(elapsed * 1000, 1)}
+    if request.format == "npy":
+        buf = io.BytesIO()
+        np.save(buf, arr, allow_pickle=False)
+        headers = {f"X-Embed-{k.replace('_', '-').title()}": str(v) for k, v in meta.items()}
+        return Response(buf.getvalue(), media_type="application/x-npy", headers=headers)
+    if request.format == "base64":
+        return {**meta, "dtype": "float32", "shape": list(arr.shape), "embeddings_b64": base64.b64encode(arr.tobytes()).decode()}
+    return {**meta, "embeddings": arr.tolist()}
+
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    """Embed the query (LRU-cached) and run a filtered ANN search over one or more collections."""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Empty query.")
+    if request.profile:
+        try:
+            get_profile(request.profile)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        model = get_model_meta(request.model or settings.EMBED_API_MODELS[0]).name
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if model not in embedders:
+        raise HTTPException(status_code=400, detail=f"Model '{model}' is not served; available: {sorted(embedders)}")
+
+    t0 = time.perf_counter()
+
+    async def embed_query(q: str) -> list:
+        return (await asyncio.wrap_future(embedders[model].submit([q])))[0]
+
+    try:
+        vector, cache_hit = await query_cache.get_or_embed(model, request.query, embed_query)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Query embedding failed: {e}")
+    SEARCH_CACHE.labels("hit" if cache_hit else "miss").inc()
+
+    if request.route:
+        requested = request.collections or ["work-buddy-*"]
+    else:
+        requested = request.collections or [settings.QDRANT_COLLECTION]
+    collections = await asyncio.to_thread(resolve_collections, search_qdrant, requested)
+    routed = route_query(request.query, available=set(collections)) if request.route else None
+    if routed:
+        # Keep the router's order; a query whose categories aren't among the candidates
+        # (nor the default collection) falls back to searching all of them
+        collections = routed
+    if not collections:
+        raise HTTPException(status_code=404, detail=f"No collections match {requested}")
+    query_filter = build_filter(
+        case=request.case,
+        modality=request.modality,
+        ts_month=request.ts_month,
+        batch_id=request.batch_id,
+        summary_level=request.summary_level,
+    )
+    hits, errors = await search_collections(
+        search_qdrant,
+        collections,
+        vector,
+        query_filter=query_filter,
+        limit=request.limit,
+        hnsw_ef=request.hnsw_ef,
+        score_threshold=request.score_threshold,
+        with_payload=request.with_payload,
+        oversampling=request.oversampling,
+        rescore=request.rescore,
+        profile=request.profile,
+    )
+    if errors and len(errors) == len(collections):
+        raise HTTPException(status_code=502, detail={"errors": errors})
+
+    elapsed = time.perf_counter() - t0
+    SEARCH_LATENCY.observe(elapsed)
+    return {
+        "results": hits,
+        "collections": collections,
+        "errors": errors,
+        "cache_hit": cache_hit,
+        "took_ms": round(elapsed * 1000, 1),
+    }
+
+
+@app.get("/embed/stats")
+async def embed_stats():
+    """p50/p99 request latency and batcher utilization per served model, plus /search cache hits."""
+    return {
+        **{
+            model: {"latency": embed_latency[model].summary(), "batching": batcher.stats()}
+            for model, batcher in embedders.items()
+        },
+        "query_cache": query_cache.stats(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8002)
@@ -0,0 +1,190 @@
+# src/bulk_load.py
+"""Bulk-load sessions: no HNSW building while a batch is being ingested.
+
+begin() switches the collection to indexing_threshold=0 / m=0 with large segments and
+stores the previous settings in Redis. Every file job of the batch calls job_done() when
+it ends; the last one enqueues finish_bulk_load(), which restores the index settings
+(only once no other bulk batch is loading into the same collection), waits for the
+optimizer to build the index and records time-to-searchable under bulk_load:{batch_id}
+for that batch and every batch that finished loading while it was still running.
+
+Pending jobs start at 1 (the enqueue loop itself) so workers can't finish the session
+before the API has queued everything; enqueue_done() releases that slot.
+"""
+import logging
+import time
+
+import redis
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import HnswConfigDiff, OptimizersConfigDiff
+from rq import Queue
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_redis = None
+
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+    return _redis
+
+
+def _batch_key(batch_id: str) -> str:
+    return f"bulk_load:{batch_id}"
+
+
+def _collection_key(collection: str) -> str:
+    return f"bulk_load:collection:{collection}"
+
+
+def begin(qdrant: QdrantClient, collection: str, batch_id: str):
+    r = get_redis()
+    r.hset(_batch_key(batch_id), mapping={"collection": collection, "status": "loading", "started": time.time()})
+    r.set(f"{_batch_key(batch_id)}:pending", 1)
+    if r.incr(f"{_collection_key(collection)}:active") > 1:
+        logger.info(f"Bulk load {batch_id}: '{collection}' already in bulk mode")
+        return
+    cfg = qdrant.get_collection(collection).config
+    r.hset(
+        _collection_key(collection),
+        mapping={
+            "indexing_threshold": cfg.optimizer_config.indexing_threshold or 20000,
+            "m": cfg.hnsw_config.m if cfg.hnsw_config.m is not None else 16,
+            "max_segment_size": cfg.optimizer_config.max_segment_size or "",
+        },
+    )
+    qdrant.update_collection(
+        collection_name=collection,
+        optimizers_config=OptimizersConfigDiff(
+            indexing_threshold=0, max_segment_size=settings.BULK_LOAD_MAX_SEGMENT_KB
+        ),
+        hnsw_config=HnswConfigDiff(m=0),
+    )
+    logger.info(f"Bulk load {batch_id}: indexing disabled on '{collection}'")
+
+
+def add_jobs(batch_id: str, n: int = 1):
+    get_redis().incrby(f"{_batch_key(batch_id)}:pending", n)
+
+
+def enqueue_done(batch_id: str):
+    """The API finished queueing the batch."""
+    job_done(batch_id)
+
+
+def job_done(batch_id: str):
+    """Called when one file of the batch is finished (successfully or not)."""
+    r = get_redis()
+    if not r.exists(_batch_key(batch_id)):
+        return  # not a bulk-load batch
+    if r.decr(f"{_batch_key(batch_id)}:pending") == 0:
+        r.hset(_batch_key(batch_id), mapping={"status": "indexing", "loaded": time.time()})
+        Queue("high_throughput", connection=redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)).enqueue(
+            finish_bulk_load, batch_id, job_timeout=settings.BULK_LOAD_INDEX_TIMEOUT_S + 300
+        )
+
+
+def finish_bulk_load(batch_id: str):
+    """Restore index settings, trigger optimization and wait until the collection is green.
+
+    Safe to run more than once per batch (job_done plus a forced finish, RQ retries): only
+    the first run releases the batch's slot in the collection. The run that releases the
+    last slot also reports time-to-searchable for the batches that were waiting on it.
+    """
+    r = get_redis()
+    info = r.hgetall(_batch_key(batch_id))
+    if not info or info.get("status") == "searchable":
+        return info
+    collection = info["collection"]
+    waiting_key = f"{_collection_key(collection)}:waiting"
+    qdrant = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT, timeout=120)
+
+    if r.hsetnx(_batch_key(batch_id), "finished", time.time()):
+        # Join the waiting set before releasing the slot so the last finisher can't miss us
+        r.sadd(waiting_key, batch_id)
+        if r.decr(f"{_collection_key(collection)}:active") > 0:
+            # Another batch is still loading; its finish restores the index
+            r.hset(_batch_key(batch_id), mapping={"status": "loaded_pending_other_batch"})
+            logger.info(f"Bulk load {batch_id}: '{collection}' stays in bulk mode for another batch")
+            return r.hgetall(_batch_key(batch_id))
+    elif info.get("status") == "loaded_pending_other_batch":
+        return info
+    elif int(r.get(f"{_collection_key(collection)}:active") or 0) > 0:
+        # A re-run after a new batch started loading into the collection; that batch restores it
+        return info
+
+    saved = r.hgetall(_collection_key(collection))
+    if saved:
+        qdrant.update_collection(
+            collection_name=collection,
+            optimizers_config=OptimizersConfigDiff(
+                indexing_threshold=int(saved.get("indexing_threshold") or 20000),
+                # An unset (auto) segment size can't be restored through a diff; keep the bulk value
+                max_segment_size=int(saved["max_segment_size"]) if saved.get("max_segment_size") else None,
+            ),
+            hnsw_config=HnswConfigDiff(m=int(saved.get("m") or 16)),
+        )
+        r.delete(_collection_key(collection))
+
+    # Qdrant can still report green before the optimizer has picked up the restored
+    # settings, so green only counts once the vectors are indexed or after a yellow phase
+    deadline = time.time() + settings.BULK_LOAD_INDEX_TIMEOUT_S
+    status = "timeout"
+    optimizing = False
+    while time.time() < deadline:
+        col = qdrant.get_collection(collection)
+        state = str(col.status).lower()
+        if state.endswith("yellow"):
+            optimizing = True
+        elif state.endswith("green") and (
+            optimizing or (col.indexed_vectors_count or 0) >= (col.points_count or 0)
+        ):
+            status = "searchable"
+            break
+        time.sleep(5)
+    done = time.time()
+    points = qdrant.get_collection(collection).points_count or 0
+    batches = r.smembers(waiting_key) | {batch_id}
+    for b in batches:
+        b_info = info if b == batch_id else r.hgetall(_batch_key(b))
+        if not b_info:
+            continue
+        loaded = float(b_info.get("loaded") or b_info.get("finished") or done)
+        r.hset(
+            _batch_key(b),
+            mapping={
+                "status": status,
+                "searchable_at": done,
+                "load_seconds": round(loaded - float(b_info["started"]), 1),
+                "time_to_searchable_seconds": round(done - loaded, 1),
+                "points": points,
+            },
+        )
+    r.srem(waiting_key, *batches)
+    report = r.hgetall(_batch_key(batch_id))
+    logger.info(
+        f"Bulk load {batch_id}: '{collection}' {status} {report['time_to_searchable_seconds']}s after the "
+        f"last upsert (load took {report['load_seconds']}s, {len(batches)} batch(es) reported)"
+    )
+    return report
+
+
+def record_failure(batch_id: str, file_path: str, error: str):
+    """Remember a file of the batch that could not be ingested (any batch, bulk or not)."""
+    get_redis().hset(f"batch:{batch_id}:failed", file_path, error[:500])
+
+
+def failures(batch_id: str) -> dict:
+    return get_redis().hgetall(f"batch:{batch_id}:failed")
+
+
+def status(batch_id: str) -> dict:
+    r = get_redis()
+    info = r.hgetall(_batch_key(batch_id))
+    if info:
+        info["pending_jobs"] = int(r.get(f"{_batch_key(batch_id)}:pending") or 0)
+        info["failed_files"] = r.hlen(f"batch:{batch_id}:failed")
+    return info
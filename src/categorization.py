@@ -0,0 +1,285 @@
+# src/categorization.py
+"""Keyword categories shared by auto_categorizer.py, routed ingestion and /search.
+
+CategoryScorer scores a path (or any text) against CATEGORY_RULES with one compiled
+matcher; CollectionRouter maps files to their category's work-buddy-* collection, from
+categorization_map.json or by scoring inline; route_query picks collections for a query.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Smart patterns for categorization
+CATEGORY_RULES = {
+    'finance': {
+        'keywords': ['401k', '401', 'tax', 'irs', 'w2', 'w-2', '1099', 'investment', 
+                    'retirement', 'pension', 'income', 'expense', 'budget', 'bank',
+                    'financial', 'money', 'salary', 'payroll', 'invoice'],
+        'paths': ['401k', 'taxes', 'finance', 'investments'],
+        'extensions': ['.xlsx', '.xls', '.csv']  # Financial docs often spreadsheets
+    },
+    'legal': {
+        'keywords': ['lawsuit', 'legal', 'attorney', 'lawyer', 'court', 'case',
+                    'contract', 'agreement', 'settlement', 'claim', 'dispute',
+                    'litigation', 'plaintiff', 'defendant', 'evidence'],
+        'paths': ['lawsuit', 'legal', 'contracts', 'malpractice'],
+        'extensions': ['.docx', '.doc']
+    },
+    'medical': {
+        'keywords': ['medical', 'health', 'doctor', 'hospital', 'diagnosis',
+                    'treatment', 'prescription', 'lab', 'test', 'insurance',
+                    'medicare', 'medicaid', 'patient', 'clinic', 'surgery',
+                    'malpractice', 'tb', 'disease'],
+        'paths': ['medical', 'health', 'malpractice'],
+        'extensions': ['.pdf']
+    },
+    'estate': {
+        'keywords': ['estate', 'will', 'trust', 'beneficiary', 'inheritance',
+                    'power of attorney', 'executor', 'probate', 'asset'],
+        'paths': ['estate', 'will', 'trust'],
+        'extensions': ['.pdf', '.docx']
+    },
+    'business': {
+        'keywords': ['business', 'company', 'client', 'project', 'proposal',
+                    'meeting', 'presentation', 'strategy', 'plan', 'report', 'order'],
+        'paths': ['business', 'work', 'projects', 'clients'],
+        'extensions': ['.pptx', '.xlsx']
+    },
+    'import_export': {
+        'keywords': ['export', 'import', 'shipment', 'shipping', 'freight', 'customs',
+                    'tariff', 'bill of lading', 'incoterms'],
+        'paths': ['export', 'import', 'shipping', 'customs'],
+        'extensions': []
+    },
+    'personal': {
+        'keywords': ['personal', 'family', 'photo', 'note', 'diary', 'journal',
+                    'password', 'credential', 'license', 'passport'],
+        'paths': ['personal', 'family', 'documents'],
+        'extensions': ['.txt', '.md', '.jpg', '.png']
+    },
+    'correspondence': {
+        'keywords': ['email', 'letter', 'memo', 'message', 'communication'],
+        'paths': ['email', 'letters', 'correspondence'],
+        'extensions': ['.eml', '.msg', '.txt']
+    }
+}
+
+def _trie_pattern(node: dict) -> str:
+    """Regex for a character trie; optional tails are greedy, so the longest term wins."""
+    alts = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not alts:
+        return ''
+    body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+    return '(?:' + body + ')?' if '' in node else body
+
+
+class KeywordMatcher:
+    """All category keywords/path patterns compiled into one trie-shaped regex.
+
+    A lookahead over the trie reports the longest term starting at each position in one
+    pass over the string; the terms that are prefixes of a match are added from a
+    precomputed table, so the result is exactly the set of terms `t in text` finds.
+    """
+
+    def __init__(self, terms):
+        terms = sorted(set(terms))
+        trie = {}
+        for term in terms:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self.regex = re.compile('(?=(' + _trie_pattern(trie) + '))')
+        self.prefixes = {t: [p for p in terms if t.startswith(p)] for t in terms}
+
+    def terms_in(self, text: str) -> set:
+        found = set()
+        for longest in set(self.regex.findall(text)):
+            found.update(self.prefixes[longest])
+        return found
+
+
+class CategoryScorer:
+    """Per-path category scores with the weights of the original rule loop
+    (keyword in path +3, keyword in filename +2, path pattern +5, extension +1).
+
+    No term contains '/', so a term is in the path iff it is in one of its components;
+    component terms and per-directory totals are computed once and reused.
+    """
+
+    def __init__(self, category_rules: dict):
+        self.names = list(category_rules)
+        path_weights = defaultdict(Counter)
+        name_weights = defaultdict(Counter)
+        ext_weights = defaultdict(Counter)
+        self.keyword_categories = defaultdict(set)
+        for i, rules in enumerate(category_rules.values()):
+            for keyword in rules['keywords']:
+                path_weights[keyword][i] += 3
+                name_weights[keyword][i] += 2
+                self.keyword_categories[keyword].add(i)
+            for pattern in rules['paths']:
+                path_weights[pattern][i] += 5
+            for ext in rules['extensions']:
+                ext_weights[ext][i] += 1
+        # term -> ((category index, weight), ...)
+        self.path_weights = {t: tuple(c.items()) for t, c in path_weights.items()}
+        self.name_weights = {t: tuple(c.items()) for t, c in name_weights.items()}
+        self.ext_weights = {e: tuple(c.items()) for e, c in ext_weights.items()}
+        self.matcher = KeywordMatcher(self.path_weights)
+        self._parts = {}
+        self._dirs = {}
+
+    def _part_terms(self, part: str) -> frozenset:
+        terms = self._parts.get(part)
+        if terms is None:
+            terms = self._parts[part] = frozenset(self.matcher.terms_in(part))
+        return terms
+
+    def _dir_terms(self, dir_lower: str):
+        cached = self._dirs.get(dir_lower)
+        if cached is None:
+            terms = frozenset().union(*map(self._part_terms, dir_lower.split('/')))
+            totals = [0] * len(self.names)
+            for term in terms:
+                for i, w in self.path_weights[term]:
+                    totals[i] += w
+            cached = self._dirs[dir_lower] = (terms, totals)
+        return cached
+
+    def score(self, path_str: str) -> dict:
+        path_lower = path_str.lower()
+        dir_lower, _, filename = path_lower.rpartition('/')
+        dir_terms, dir_totals = self._dir_terms(dir_lower)
+        totals = list(dir_totals)
+        for term in self.matcher.terms_in(filename):
+            if term not in dir_terms:
+                for i, w in self.path_weights[term]:
+                    totals[i] += w
+            for i, w in self.name_weights.get(term, ()):
+                totals[i] += w
+        for i, w in self.ext_weights.get(os.path.splitext(filename)[1], ()):
+            totals[i] += w
+        # Ties go to the earlier category, as with max() over the insertion-ordered dict
+        scores = {self.names[i]: v for i, v in enumerate(totals) if v}
+        if scores:
+            best_category = max(scores, key=scores.get)
+            confidence = scores[best_category]
+        else:
+            best_category = 'uncategorized'
+            confidence = 0
+        return {
+            'path': path_str,
+            'name': path_str.rpartition('/')[2],
+            'category': best_category,
+            'confidence': confidence,
+            'all_scores': scores
+        }
+
+    def dir_categories(self, dir_name: str) -> set:
+        """Categories with a keyword in a directory name."""
+        return {
+            self.names[i]
+            for term in self._part_terms(dir_name.lower())
+            for i in self.keyword_categories.get(term, ())
+        }
+
+
+# Category -> Qdrant collection (the collections create_collections.py provisions)
+CATEGORY_COLLECTIONS = {
+    'finance': 'work-buddy-finance-tax',
+    'legal': 'work-buddy-legal-estate',
+    'estate': 'work-buddy-legal-estate',
+    'business': 'work-buddy-leather-business',
+    'import_export': 'work-buddy-import-export',
+    'correspondence': 'work-buddy-correspondence',
+    'medical': 'work-buddy-medical',
+    'personal': 'work-buddy-general',
+    'uncategorized': 'work-buddy-general',
+}
+
+
+def category_collection(category: str) -> str:
+    """Collection for a category; categories added after this table get their own."""
+    return CATEGORY_COLLECTIONS.get(category) or f"work-buddy-{category}"
+
+
+_default_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def default_scorer() -> CategoryScorer:
+    global _default_scorer
+    with _scorer_lock:
+        if _default_scorer is None:
+            _default_scorer = CategoryScorer(CATEGORY_RULES)
+        return _default_scorer
+
+
+class CollectionRouter:
+    """Which collection a file's chunks go to.
+
+    Files listed in a (reviewed) categorization_map.json keep the category they were given
+    there; anything else is scored inline with the same rules auto_categorizer.py uses.
+    """
+
+    def __init__(self, categories: dict[str, str] | None = None, scorer: CategoryScorer | None = None):
+        self.categories = categories or {}  # absolute path -> category
+        self.scorer = scorer or default_scorer()
+
+    @classmethod
+    def from_map_file(cls, path: str = settings.ROUTING_MAP_PATH) -> "CollectionRouter":
+        """Load auto_categorizer.py's export: {category: [{"path": ..., ...}, ...]}."""
+        with open(path) as f:
+            mapping = json.load(f)
+        categories = {
+            os.path.abspath(entry['path']): category
+            for category, entries in mapping.items()
+            for entry in entries
+        }
+        logger.info(f"Routing {len(categories)} mapped files from {path}")
+        return cls(categories)
+
+    def category_for(self, path) -> str:
+        key = os.path.abspath(str(path))
+        category = self.categories.get(key)
+        if category is None:
+            # Chunker threads may score the same file twice; the result is the same
+            category = self.categories[key] = self.scorer.score(key)['category']
+        return category
+
+    def collection_for(self, path) -> tuple[str, str]:
+        """(collection, category) for a file."""
+        category = self.category_for(path)
+        return category_collection(category), category
+
+
+def route_query(
+    query: str, scorer: CategoryScorer | None = None, available: set[str] | None = None
+) -> list[str] | None:
+    """Collections worth searching for a query, best keyword match first; None if no
+    category keyword occurs in it. The default collection is always included, since
+    uncategorized files land there. With `available`, targets outside it (not provisioned,
+    not requested) are left out, so the default collection stands in for them."""
+    scorer = scorer or default_scorer()
+    terms = scorer.matcher.terms_in(query.lower())
+    totals = Counter()
+    for term in terms:
+        for i, w in scorer.path_weights[term]:
+            totals[scorer.names[i]] += w
+    if not totals:
+        return None
+    collections = list(dict.fromkeys(category_collection(c) for c, _ in totals.most_common()))
+    if settings.ROUTING_DEFAULT_COLLECTION not in collections:
+        collections.append(settings.ROUTING_DEFAULT_COLLECTION)
+    if available is not None:
+        # Missing targets drop out; the default collection at the end stays as the fallback
+        collections = [c for c in collections if c in available]
+    return collections or None
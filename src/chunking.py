@@ -0,0 +1,142 @@
+# src/chunking.py
+"""Streaming, token-aware text chunker shared by the worker and the ingest scripts.
+
+Plain text, logs and registry summaries don't need unstructured's element model:
+lines are pulled from the stream with a bounded readline(), packed into chunks up to
+max_tokens and the tail of each chunk is carried over as overlap. Memory stays at
+roughly one chunk regardless of file size.
+
+Used as src.chunking by the forensic worker, the staged pipeline in
+src/ingest_pipeline.py (ingest.py and its gpu_ingest.py / ingest_work_buddy.py presets)
+and the scripts.
+"""
+import codecs
+import io
+import mmap
+import os
+from collections import deque
+from itertools import islice
+from typing import Callable, Iterable, Iterator, TextIO
+
+# Same heuristic as EmbeddingClient._approx_truncate: ~4 chars per token for English
+CHARS_PER_TOKEN = 4
+
+# Read buffer for streamed files; with max_tokens chunks this is the per-file text ceiling
+READ_BUFFER_BYTES = 1 << 20
+
+# Extensions handled as plain text (skip partition() + chunk_by_title)
+PLAIN_TEXT_EXTS = {".txt", ".log", ".md", ".csv", ".tsv", ".ini", ".cfg", ".jsonl", ".ndjson"}
+
+
+def approx_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _iter_units(source: TextIO | Iterable[str], max_unit_chars: int) -> Iterator[str]:
+    """Yield lines, hard-splitting any longer than max_unit_chars (minified logs, dumps).
+
+    source is a text stream or an iterable of text blocks (e.g. PDF pages). The end of a
+    block is a line break, so its last word never runs into the next block's first one.
+    """
+    streams = [source] if hasattr(source, "readline") else (io.StringIO(block) for block in source)
+    for stream in streams:
+        line = stream.readline(max_unit_chars)
+        while line:
+            following = stream.readline(max_unit_chars)
+            if not following and not line.endswith("\n"):
+                line += "\n"
+            yield line
+            line = following
+
+
+def iter_chunks(
+    source: TextIO | str | Iterable[str],
+    max_tokens: int = 375,
+    overlap_tokens: int = 50,
+    count_tokens: Callable[[str], int] = approx_tokens,
+) -> Iterator[str]:
+    """Yield chunks of at most ~max_tokens from a text stream, string or block iterable, with overlap.
+
+    Chunks prefer to end on a blank line (paragraph break) once they are 3/4 full.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    if isinstance(source, str):
+        source = [source]
+    # A single unit must fit next to the overlap carry-over
+    max_unit_chars = max(1, (max_tokens - overlap_tokens) * CHARS_PER_TOKEN)
+    soft_limit = max_tokens * 3 // 4
+
+    pieces: deque[tuple[str, int]] = deque()
+    total = 0
+    fresh = False  # anything beyond the carried-over overlap since the last emit?
+
+    def emit() -> str:
+        nonlocal total, fresh
+        chunk = "".join(p for p, _ in pieces).strip()
+        fresh = False
+        while pieces and total > overlap_tokens:
+            total -= pieces.popleft()[1]
+        return chunk
+
+    for unit in _iter_units(source, max_unit_chars):
+        n = count_tokens(unit)
+        if pieces and total + n > max_tokens:
+            if fresh:
+                chunk = emit()
+                if chunk:
+                    yield chunk
+            while pieces and total + n > max_tokens:
+                total -= pieces.popleft()[1]
+        pieces.append((unit, n))
+        total += n
+        fresh = True
+        if total >= soft_limit and not unit.strip():
+            chunk = emit()
+            if chunk:
+                yield chunk
+
+    if fresh:
+        chunk = "".join(p for p, _ in pieces).strip()
+        if chunk:
+            yield chunk
+
+
+def chunk_text(text: str, max_tokens: int = 375, overlap_tokens: int = 50) -> list[str]:
+    return list(iter_chunks(text, max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+
+
+def iter_file_chunks(
+    file_path: str,
+    max_tokens: int = 375,
+    overlap_tokens: int = 50,
+    encoding: str = "utf-8",
+) -> Iterator[str]:
+    """iter_chunks over a file opened for streaming; never holds more than one read buffer."""
+    with open(file_path, "r", encoding=encoding, errors="ignore", buffering=READ_BUFFER_BYTES) as f:
+        yield from iter_chunks(f, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def iter_decoded_blocks(file_path: str, block_bytes: int = READ_BUFFER_BYTES, encoding: str = "utf-8") -> Iterator[str]:
+    """Decode a (possibly multi-GB, possibly binary) file block by block through mmap.
+
+    Multi-byte sequences split across blocks are handled by the incremental decoder.
+    """
+    if os.path.getsize(file_path) == 0:
+        return
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offset in range(0, len(mm), block_bytes):
+            text = decoder.decode(mm[offset:offset + block_bytes])
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+def batched(iterable: Iterable, n: int) -> Iterator[list]:
+    """itertools.batched for Python < 3.12."""
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
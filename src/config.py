@@ -7,24 +7,108 @@ class Settings:
     TOGETHER_EMBEDDING_MODEL = os.getenv("TOGETHER_EMBEDDING_MODEL", "BAAI/bge-base-en-v1.5-vllm")
 
     # Backends & knobs
-    EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "together")  # or "local"
+    EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "together")  # or "local" / "onnx"
     EMBEDDINGS_L2_NORMALIZE = os.getenv("EMBEDDINGS_L2_NORMALIZE", "false").lower() == "true"
     EMBEDDINGS_MAX_BATCH = int(os.getenv("EMBEDDINGS_MAX_BATCH", "32"))
 
+    # Failover (src/embeddings/providers.py): Together first, then a local provider serving
+    # the same model: "tei" (LOCAL_EMBED_URL, see `make tei`), "local", "onnx" or "none"
+    EMBEDDINGS_FAILOVER = os.getenv("EMBEDDINGS_FAILOVER", "true").lower() == "true"
+    EMBEDDINGS_FALLBACK = os.getenv("EMBEDDINGS_FALLBACK", "tei")
+    LOCAL_EMBED_URL = os.getenv("LOCAL_EMBED_URL", "http://localhost:8085")
+    EMBEDDINGS_BREAKER_FAILURES = int(os.getenv("EMBEDDINGS_BREAKER_FAILURES", "3"))
+    EMBEDDINGS_BREAKER_RESET_S = float(os.getenv("EMBEDDINGS_BREAKER_RESET_S", "30"))
+    EMBEDDINGS_PING_INTERVAL_S = float(os.getenv("EMBEDDINGS_PING_INTERVAL_S", "15"))
+    # Breaker state in Redis, shared by every process using a provider (RQ forks a fresh
+    # work-horse per job, so an in-process breaker would start closed for every file)
+    EMBEDDINGS_BREAKER_SHARED = os.getenv("EMBEDDINGS_BREAKER_SHARED", "true").lower() == "true"
+
+    # /embed endpoint: comma-separated models loaded at API startup (first is the default)
+    EMBED_API_MODELS = [
+        m.strip() for m in os.getenv("EMBED_API_MODELS", TOGETHER_EMBEDDING_MODEL).split(",") if m.strip()
+    ]
+    EMBED_API_MAX_WAIT_MS = float(os.getenv("EMBED_API_MAX_WAIT_MS", "5"))
+    EMBED_API_MAX_TEXTS = int(os.getenv("EMBED_API_MAX_TEXTS", "2048"))
+    # /search: query vectors kept in an in-process LRU
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "4096"))
+
     # Qdrant
     QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
     QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+    # Collection profile for new forensic collections (src/qdrant_provisioning.py PROFILES)
+    QDRANT_PROFILE = os.getenv("QDRANT_PROFILE", "forensic")
 
     # Safe defaults (env overrides take precedence)
     QDRANT_COLLECTION = os.getenv("COLLECTION", "mas_embeddings")
+    # Routed ingestion (src/categorization.py): auto_categorizer.py's reviewed map, and the
+    # collection uncategorized files land in (always searched by /search route=true)
+    ROUTING_MAP_PATH = os.getenv("ROUTING_MAP_PATH", "categorization_map.json")
+    ROUTING_DEFAULT_COLLECTION = os.getenv("ROUTING_DEFAULT_COLLECTION", "work-buddy-general")
     REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
     WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
     OCR_STRATEGY = os.getenv("OCR_STRATEGY", "hi_res")
+    # Per-page PDF decision: pages with >= this many text-layer chars skip OCR
+    OCR_ADAPTIVE = os.getenv("OCR_ADAPTIVE", "true").lower() == "true"
+    OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "50"))
     ENRICHMENT_LLM_MODEL = os.getenv(
         "ENRICHMENT_LLM_MODEL", "meta-llama-3-70b-instruct"
     )
 
+    # Streaming chunker (src/chunking.py) for plain-text inputs; 375 tokens ~ 1500 chars
+    CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "375"))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+    # Chunks (or DB rows) embedded + upserted per round trip; bounds per-file memory
+    STREAM_UPSERT_BATCH = int(os.getenv("STREAM_UPSERT_BATCH", "256"))
+
+    # Large PDFs fan out into page-range sub-jobs, reassembled before chunking
+    PDF_SPLIT_MIN_PAGES = int(os.getenv("PDF_SPLIT_MIN_PAGES", "300"))
+    PDF_SPLIT_MIN_BYTES = int(os.getenv("PDF_SPLIT_MIN_BYTES", str(2 * 1024**2)))
+    PDF_PAGES_PER_RANGE = int(os.getenv("PDF_PAGES_PER_RANGE", "50"))
+    PAGE_RANGE_DIR = os.path.abspath(os.getenv("PAGE_RANGE_DIR", "./data/page_ranges"))
+
+    # Bulk-load sessions (src/bulk_load.py): segment size while indexing is off, and how long
+    # finish_bulk_load waits for the rebuilt index before reporting a timeout
+    BULK_LOAD_MAX_SEGMENT_KB = int(os.getenv("BULK_LOAD_MAX_SEGMENT_KB", str(2 * 1024**2)))
+    BULK_LOAD_INDEX_TIMEOUT_S = int(os.getenv("BULK_LOAD_INDEX_TIMEOUT_S", "7200"))
+
+    # Pre-enqueue triage (skip binaries / pick OCR strategy)
+    TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "true").lower() == "true"
+    TRIAGE_MIN_BYTES = int(os.getenv("TRIAGE_MIN_BYTES", "64"))
+    TRIAGE_MAX_BYTES = int(os.getenv("TRIAGE_MAX_BYTES", str(4 * 1024**3)))
+    TRIAGE_ENTROPY_SKIP = float(os.getenv("TRIAGE_ENTROPY_SKIP", "7.5"))
+    TRIAGE_REPORT_DIR = os.path.abspath(os.getenv("TRIAGE_REPORT_DIR", "./data/triage"))
+
+    # Enrichment (Pipeline B): PENDING scan page size and batch input shard caps
+    # (Together batch files: <= 50k requests, 100 MB; leave headroom on the byte cap)
+    ENRICHMENT_SCROLL_PAGE = int(os.getenv("ENRICHMENT_SCROLL_PAGE", "1000"))
+    ENRICHMENT_SHARD_MAX_REQUESTS = int(os.getenv("ENRICHMENT_SHARD_MAX_REQUESTS", "50000"))
+    ENRICHMENT_SHARD_MAX_BYTES = int(os.getenv("ENRICHMENT_SHARD_MAX_BYTES", str(95 * 1000**2)))
+    # Summary write-back: points per batch_update_points request, concurrent requests
+    ENRICHMENT_WRITE_BATCH = int(os.getenv("ENRICHMENT_WRITE_BATCH", "500"))
+    ENRICHMENT_WRITERS = int(os.getenv("ENRICHMENT_WRITERS", "4"))
+    ENRICHMENT_METRICS_PORT = int(os.getenv("ENRICHMENT_METRICS_PORT", "9102"))
+    # Batch jobs: "together" or "mock" (offline, src/mock_batch_api.py); concurrency and polling
+    ENRICHMENT_BATCH_BACKEND = os.getenv("ENRICHMENT_BATCH_BACKEND", "together")
+    ENRICHMENT_MAX_INFLIGHT = int(os.getenv("ENRICHMENT_MAX_INFLIGHT", "8"))
+    ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "3"))
+    ENRICHMENT_POLL_MIN_S = float(os.getenv("ENRICHMENT_POLL_MIN_S", "30"))
+    ENRICHMENT_POLL_MAX_S = float(os.getenv("ENRICHMENT_POLL_MAX_S", "900"))
+    ENRICHMENT_SCAN_INTERVAL_S = float(os.getenv("ENRICHMENT_SCAN_INTERVAL_S", "300"))
+    # DONE jobs older than this move from the job store to its .archive.jsonl (0 = keep all)
+    ENRICHMENT_DONE_RETENTION_S = float(os.getenv("ENRICHMENT_DONE_RETENTION_S", str(7 * 86400)))
+    # Scheduler (src/enrichment_scheduler.py): prompt truncation and max_tokens per request,
+    # tokens per shard and per-UTC-day submission budgets (0 = unlimited)
+    ENRICHMENT_MAX_PROMPT_TOKENS = int(os.getenv("ENRICHMENT_MAX_PROMPT_TOKENS", "7500"))
+    ENRICHMENT_MAX_OUTPUT_TOKENS = int(os.getenv("ENRICHMENT_MAX_OUTPUT_TOKENS", "512"))
+    ENRICHMENT_SHARD_MAX_TOKENS = int(os.getenv("ENRICHMENT_SHARD_MAX_TOKENS", "0"))
+    ENRICHMENT_DAILY_TOKEN_BUDGET = int(os.getenv("ENRICHMENT_DAILY_TOKEN_BUDGET", "0"))
+    ENRICHMENT_DAILY_USD_BUDGET = float(os.getenv("ENRICHMENT_DAILY_USD_BUDGET", "0"))
+    # "chunk": one summary per chunk; "hierarchical": chunks summarized in groups of up to
+    # ENRICHMENT_GROUP_TOKENS, then the group summaries reduced into one summary point per file
+    ENRICHMENT_MODE = os.getenv("ENRICHMENT_MODE", "chunk")
+    ENRICHMENT_GROUP_TOKENS = int(os.getenv("ENRICHMENT_GROUP_TOKENS", "6000"))
+
     # Deprecated batch dir (left here so old paths don't explode)
     BATCH_PROCESSING_DIR = os.path.abspath("./data/batch_processing")
 
@@ -0,0 +1,8 @@
+from typing import List
+
+
+def get_embeddings(texts: List[str]) -> dict:
+    """Embed with the shared failover client; returns provider, vectors and latency_ms."""
+    from . import providers  # looked up per call so a reloaded providers module is honoured
+
+    return providers.default_client().embed(texts)
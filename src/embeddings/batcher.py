@@ -0,0 +1,117 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class DynamicBatcher:
+    """In-process dynamic batching in front of an EmbeddingClient.
+
+    Producers submit() any number of texts and get a Future back. A single consumer
+    thread coalesces pending requests until max_batch texts are queued or max_wait_s has
+    passed since the first one, sorts the texts by length (so each encode() call pads to
+    similar lengths), embeds in max_batch slices and resolves every future in order.
+    """
+
+    def __init__(self, client, max_batch: int = 64, max_wait_s: float = 0.01, max_queue: int = 1024):
+        self.client = client
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self._q: queue.Queue = queue.Queue(maxsize=max_queue)  # submit() blocks when full
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self.batches = 0
+        self.texts = 0
+        self.busy_s = 0.0
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        req = _Request(list(texts))
+        if not req.texts:
+            req.future.set_result([])
+        else:
+            self._q.put(req)
+        return req.future
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(texts).result()
+
+    def close(self, timeout: float | None = None):
+        self._q.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        elapsed = max(time.time() - self._started, 1e-9)
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "texts": self.texts,
+                "avg_batch": round(self.texts / max(self.batches, 1), 1),
+                "texts_per_sec": round(self.texts / elapsed, 1),
+                "utilization": round(self.busy_s / elapsed, 2),
+            }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._q.get()
+            if first is _STOP:
+                break
+            pending = [first]
+            n = len(first.texts)
+            deadline = time.monotonic() + self.max_wait_s
+            while n < self.max_batch:
+                try:
+                    req = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if req is _STOP:
+                    stopping = True
+                    break
+                pending.append(req)
+                n += len(req.texts)
+            self._process(pending)
+
+    def _process(self, pending: List[_Request]):
+        texts = [t for req in pending for t in req.texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out: list = [None] * len(texts)
+        t0 = time.perf_counter()
+        try:
+            for s in range(0, len(order), self.max_batch):
+                idx = order[s:s + self.max_batch]
+                vectors, _ = self.client.embed_texts([texts[i] for i in idx])
+                for i, v in zip(idx, vectors):
+                    out[i] = v
+        except Exception as e:
+            logger.error(f"Batch of {len(texts)} texts failed: {e}")
+            for req in pending:
+                req.future.set_exception(e)
+            return
+        finally:
+            with self._lock:
+                self.busy_s += time.perf_counter() - t0
+
+        with self._lock:
+            self.batches += -(-len(texts) // self.max_batch)
+            self.texts += len(texts)
+        pos = 0
+        for req in pending:
+            req.future.set_result(out[pos:pos + len(req.texts)])
+            pos += len(req.texts)
@@ -27,8 +27,9 @@ class EmbeddingClient:
         self.timeout_s = timeout_s
         self.max_retries = max_retries
         self._local_model = None
-        if backend not in ("together","local"):
-            raise NotImplementedError("backend must be 'together' or 'local'")
+        self._onnx = None
+        if backend not in ("together","local","onnx"):
+            raise NotImplementedError("backend must be 'together', 'local' or 'onnx'")
         if backend == "together" and not self.api_key:
             raise RuntimeError("TOGETHER_API_KEY is empty.")
         if backend == "local":
@@ -41,6 +42,18 @@ class EmbeddingClient:
                 self._local_model = SentenceTransformer(hf_name)
             except Exception as e:
                 raise RuntimeError(f"Failed to init local embeddings: {e}")
+        if backend == "onnx":
+            # Same HF models as "local", run through ONNX Runtime on CPU (int8 unless ONNX_QUANTIZE=false)
+            try:
+                from .onnx_backend import OnnxEncoder
+                hf_name = LOCAL_SUPPORTED.get(self.model)
+                if not hf_name:
+                    raise RuntimeError(f"ONNX backend does not support model {self.model}")
+                threads = int(os.getenv("ONNX_THREADS", "0")) or None
+                quantize = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+                self._onnx = OnnxEncoder(hf_name, max_tokens=self.meta.max_tokens, quantize=quantize, threads=threads)
+            except Exception as e:
+                raise RuntimeError(f"Failed to init ONNX embeddings: {e}")
 
     def _approx_truncate(self, text: str) -> str:
         # Rough heuristic: 1 token ~ 4 chars average for English
@@ -86,6 +99,10 @@ class EmbeddingClient:
             vectors = arr.tolist()
             return vectors, 0
 
+        if self.backend == "onnx":
+            arr = self._onnx.encode(texts, batch_size=self.max_batch, normalize=self.l2_normalize)
+            return arr.tolist(), 0
+
         for batch in self._chunks(texts, self.max_batch):
             payload = {"model": self.model, "input": batch}
             t0 = time.time()
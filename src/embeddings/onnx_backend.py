@@ -0,0 +1,167 @@
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_CACHE_DIR = os.path.expanduser(os.getenv("ONNX_CACHE_DIR", "~/.cache/mas-onnx"))
+
+
+def default_threads() -> int:
+    """Cores this process may run on (respects taskset / cgroup cpusets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _st_pooling(hf_name: str) -> tuple[str, bool]:
+    """(pooling, normalize) as declared by the sentence-transformers config of hf_name.
+
+    Mirrors what SentenceTransformer(hf_name).encode() does so vectors stay comparable.
+    """
+    from huggingface_hub import hf_hub_download
+
+    pooling, normalize = "cls", False
+    try:
+        with open(hf_hub_download(hf_name, "modules.json")) as f:
+            modules = json.load(f)
+        normalize = any(m.get("type", "").endswith("Normalize") for m in modules)
+        pool_dir = next(m["path"] for m in modules if m.get("type", "").endswith("Pooling"))
+        with open(hf_hub_download(hf_name, f"{pool_dir}/config.json")) as f:
+            cfg = json.load(f)
+        if cfg.get("pooling_mode_mean_tokens"):
+            pooling = "mean"
+    except Exception as e:
+        logger.warning(f"No sentence-transformers pooling config for {hf_name} ({e}); using CLS pooling")
+    return pooling, normalize
+
+
+@contextmanager
+def _export_lock(model_dir: str):
+    """Serialize export/quantization of one model across processes on this host."""
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, ".export.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _atomic_path(path: str):
+    """A temp path next to `path`, moved into place only if the block succeeds."""
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.tmp-{os.getpid()}{ext}"
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _export(hf_name: str, out_path: str):
+    """Export the transformer body (last_hidden_state) to ONNX with dynamic batch/sequence axes."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(hf_name)
+    model = AutoModel.from_pretrained(hf_name).eval()
+    sample = dict(tokenizer(["onnx export sample"], return_tensors="pt"))
+    names = list(sample)
+    dynamic_axes = {n: {0: "batch", 1: "seq"} for n in names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with torch.no_grad(), _atomic_path(out_path) as tmp_path:
+        torch.onnx.export(
+            model,
+            (sample,),
+            tmp_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+    logger.info(f"Exported {hf_name} to {out_path}")
+
+
+def _quantize(fp32_path: str, int8_path: str):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    with _atomic_path(int8_path) as tmp_path:
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    logger.info(f"Dynamic int8 quantization written to {int8_path}")
+
+
+class OnnxEncoder:
+    """CPU inference for the LOCAL_SUPPORTED models through ONNX Runtime.
+
+    The model is exported once (and, by default, dynamically quantized to int8) into
+    ONNX_CACHE_DIR; later processes just load the cached file. Exports run under a file
+    lock and are renamed into place when complete, so concurrent or crashed workers never
+    leave a partial model behind.
+    """
+
+    def __init__(self, hf_name: str, max_tokens: int = 512, quantize: bool = True, threads: int | None = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.hf_name = hf_name
+        self.max_tokens = max_tokens
+        model_dir = os.path.join(ONNX_CACHE_DIR, hf_name.replace("/", "__"))
+        fp32_path = os.path.join(model_dir, "model.onnx")
+        path = os.path.join(model_dir, "model.int8.onnx") if quantize else fp32_path
+        if not os.path.exists(path):
+            with _export_lock(model_dir):
+                # Another worker may have finished the export while this one waited
+                if not os.path.exists(fp32_path):
+                    _export(hf_name, fp32_path)
+                if quantize and not os.path.exists(path):
+                    _quantize(fp32_path, path)
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads or default_threads()
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(hf_name)
+        self.pooling, self.normalize = _st_pooling(hf_name)
+        logger.info(
+            f"ONNX encoder ready: {hf_name} ({'int8' if quantize else 'fp32'}, "
+            f"{opts.intra_op_num_threads} threads, {self.pooling} pooling)"
+        )
+
+    def encode(self, texts: List[str], batch_size: int = 32, normalize: bool = False) -> np.ndarray:
+        # Length-sorted batches pad less; results are put back in input order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = [None] * len(texts)
+        for s in range(0, len(order), batch_size):
+            idx = order[s:s + batch_size]
+            enc = self.tokenizer(
+                [texts[i] for i in idx],
+                padding=True,
+                truncation=True,
+                max_length=self.max_tokens,
+                return_tensors="np",
+            )
+            feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self.input_names}
+            hidden = self.session.run(["last_hidden_state"], feeds)[0]
+            if self.pooling == "mean":
+                mask = enc["attention_mask"][..., None].astype(np.float32)
+                vecs = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            else:
+                vecs = hidden[:, 0]
+            for i, v in zip(idx, vecs):
+                out[i] = v
+        arr = np.asarray(out, dtype=np.float32)
+        if normalize or self.normalize:
+            arr /= np.linalg.norm(arr, axis=1, keepdims=True) + 1e-12
+        return arr
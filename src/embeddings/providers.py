@@ -0,0 +1,333 @@
+"""Embedding provider failover: Together primary, local secondary.
+
+Each provider sits behind a circuit breaker. After `failure_threshold` consecutive
+failures the breaker opens and calls go straight to the next provider instead of
+burning retries; a background pinger probes open providers and closes the breaker
+once they answer again, so traffic moves back to the primary on its own. With
+EMBEDDINGS_BREAKER_SHARED the breaker state lives in Redis, so RQ work-horses (one fork
+per job) inherit an open breaker instead of rediscovering the outage file by file, and
+the worker parent's pinger closes it for all of them.
+
+Both providers serve the same model (LOCAL_SUPPORTED maps the Together name to its HF
+checkpoint) and every response is checked against the catalog dimension, so vectors
+from either side land in the same collection.
+"""
+import logging
+import os
+import threading
+import time
+from typing import List, Tuple
+
+from src.config import settings
+
+from .client import LOCAL_SUPPORTED, EmbeddingClient
+from .models import get_model_meta
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_timeout_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = CLOSED
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout_s:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Closed: yes. Open past reset_timeout_s (half-open): one trial call. Open: no."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout_s:
+                # Re-arm the timer so concurrent callers don't all pile onto the trial
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self._state != CLOSED:
+                self._state, self.opened_at = OPEN, time.monotonic()
+
+
+class RedisCircuitBreaker:
+    """CircuitBreaker with its state (state, opened_at, failures) in a Redis hash.
+
+    Times are wall-clock so every process agrees on them; the half-open trial is a
+    SET NX key, so only one process per reset window probes a recovering provider.
+    If Redis is unreachable the breaker behaves as closed.
+    """
+
+    def __init__(self, key: str, failure_threshold: int = 3, reset_timeout_s: float = 30.0, conn=None):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        if conn is None:
+            import redis
+
+            conn = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+        self.r = conn
+        self._warned = False
+
+    def _redis_error(self, e: Exception):
+        if not self._warned:
+            logger.warning(f"Breaker {self.key}: Redis unavailable ({e}); treating provider as healthy")
+            self._warned = True
+
+    def _load(self) -> tuple[str, float, int]:
+        try:
+            h = self.r.hgetall(self.key)
+        except Exception as e:
+            self._redis_error(e)
+            return CLOSED, 0.0, 0
+        return h.get("state", CLOSED), float(h.get("opened_at") or 0), int(h.get("failures") or 0)
+
+    @property
+    def state(self) -> str:
+        state, opened_at, _ = self._load()
+        if state == OPEN and time.time() - opened_at >= self.reset_timeout_s:
+            return HALF_OPEN
+        return state
+
+    @property
+    def failures(self) -> int:
+        return self._load()[2]
+
+    def allow(self) -> bool:
+        state, opened_at, _ = self._load()
+        if state == CLOSED:
+            return True
+        if time.time() - opened_at >= self.reset_timeout_s:
+            try:
+                return bool(self.r.set(f"{self.key}:trial", 1, nx=True, ex=max(1, int(self.reset_timeout_s))))
+            except Exception as e:
+                self._redis_error(e)
+                return True
+        return False
+
+    def record_success(self):
+        try:
+            self.r.hset(self.key, mapping={"state": CLOSED, "failures": 0})
+            self.r.delete(f"{self.key}:trial")
+        except Exception as e:
+            self._redis_error(e)
+
+    def record_failure(self):
+        try:
+            failures = self.r.hincrby(self.key, "failures", 1)
+            if failures >= self.failure_threshold or self.r.hget(self.key, "state") not in (None, CLOSED):
+                self.r.hset(self.key, mapping={"state": OPEN, "opened_at": time.time()})
+        except Exception as e:
+            self._redis_error(e)
+
+
+class Provider:
+    def __init__(self, name: str, client: EmbeddingClient, breaker: CircuitBreaker):
+        self.name = name
+        self.client = client
+        self.breaker = breaker
+        self.last_error: str | None = None
+        self.last_latency_ms: float | None = None
+
+    def embed(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        t0 = time.perf_counter()
+        vectors, tokens = self.client.embed_texts(texts)
+        self.last_latency_ms = round((time.perf_counter() - t0) * 1000, 1)
+        dim = self.client.meta.dim
+        if len(vectors) != len(texts) or any(len(v) != dim for v in vectors):
+            raise RuntimeError(f"{self.name} returned {len(vectors)} vectors, expected {len(texts)} x {dim}")
+        return vectors, tokens
+
+    def status(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "last_error": self.last_error,
+            "last_latency_ms": self.last_latency_ms,
+        }
+
+
+def _secondary_client(model: str, kind: str, max_batch: int) -> EmbeddingClient:
+    """Local provider for `model`: the TEI container (make tei), or in-process local/onnx."""
+    if LOCAL_SUPPORTED.get(model) is None:
+        raise RuntimeError(f"No local checkpoint for {model}; failover would change the vector space")
+    if kind == "tei":
+        # TEI serves the OpenAI-compatible /embeddings route and ignores the auth header
+        return EmbeddingClient(
+            api_key="local",
+            base_url=settings.LOCAL_EMBED_URL,
+            model=model,
+            l2_normalize=settings.EMBEDDINGS_L2_NORMALIZE,
+            max_batch=max_batch,
+            timeout_s=30,
+            max_retries=1,
+        )
+    return EmbeddingClient(
+        api_key="",
+        base_url=settings.TOGETHER_BASE_URL,
+        model=model,
+        backend=kind,
+        l2_normalize=settings.EMBEDDINGS_L2_NORMALIZE,
+        max_batch=max_batch,
+    )
+
+
+class FallbackEmbeddingClient:
+    """Drop-in for EmbeddingClient.embed_texts() that fails over between providers.
+
+    embed() returns {"provider", "vectors", "tokens", "latency_ms", "model", "dim"};
+    embed_texts() keeps the EmbeddingClient (vectors, tokens) contract for existing callers.
+    """
+
+    def __init__(
+        self,
+        model: str | None = None,
+        secondary: str | None = None,
+        max_batch: int | None = None,
+        failure_threshold: int | None = None,
+        reset_timeout_s: float | None = None,
+        ping_interval_s: float | None = None,
+        shared_breaker: bool | None = None,
+    ):
+        self.meta = get_model_meta(model or settings.TOGETHER_EMBEDDING_MODEL)
+        self.model = self.meta.name
+        max_batch = max_batch or settings.EMBEDDINGS_MAX_BATCH
+        failure_threshold = failure_threshold or settings.EMBEDDINGS_BREAKER_FAILURES
+        reset_timeout_s = reset_timeout_s or settings.EMBEDDINGS_BREAKER_RESET_S
+        self.ping_interval_s = ping_interval_s or settings.EMBEDDINGS_PING_INTERVAL_S
+        shared = settings.EMBEDDINGS_BREAKER_SHARED if shared_breaker is None else shared_breaker
+
+        def breaker(name: str):
+            if shared:
+                return RedisCircuitBreaker(f"embed_breaker:{self.model}:{name}", failure_threshold, reset_timeout_s)
+            return CircuitBreaker(failure_threshold, reset_timeout_s)
+
+        self.providers: List[Provider] = []
+        # Read the key at construction time so a changed env takes effect on a new client
+        api_key = os.getenv("TOGETHER_API_KEY", settings.TOGETHER_API_KEY)
+        if api_key:
+            primary = EmbeddingClient(
+                api_key=api_key,
+                base_url=settings.TOGETHER_BASE_URL,
+                model=self.model,
+                l2_normalize=settings.EMBEDDINGS_L2_NORMALIZE,
+                max_batch=max_batch,
+                max_retries=2,  # the breaker, not the retry loop, handles outages
+            )
+            self.providers.append(Provider("together", primary, breaker("together")))
+        kind = secondary or settings.EMBEDDINGS_FALLBACK
+        if kind != "none":
+            try:
+                client = _secondary_client(self.model, kind, max_batch)
+                self.providers.append(Provider(kind, client, breaker(kind)))
+            except Exception as e:
+                logger.warning(f"Secondary embeddings provider '{kind}' unavailable: {e}")
+        if not self.providers:
+            raise RuntimeError("No embedding providers configured")
+
+        self._stop = threading.Event()
+        self._pinger = threading.Thread(target=self._ping_loop, name="embed-health", daemon=True)
+        self._pinger.start()
+
+    def embed(self, texts: List[str]) -> dict:
+        errors = []
+        candidates = [p for p in self.providers if p.breaker.allow()]
+        # Everything open: still try in priority order rather than failing outright
+        for p in candidates or self.providers:
+            t0 = time.perf_counter()
+            try:
+                vectors, tokens = p.embed(texts)
+            except Exception as e:
+                p.breaker.record_failure()
+                p.last_error = str(e)[:300]
+                errors.append(f"{p.name}: {p.last_error}")
+                logger.warning(f"Embedding provider {p.name} failed ({p.breaker.state}): {p.last_error}")
+                continue
+            p.breaker.record_success()
+            return {
+                "provider": p.name,
+                "vectors": vectors,
+                "tokens": tokens,
+                "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "model": self.model,
+                "dim": self.meta.dim,
+            }
+        raise RuntimeError("All embedding providers failed: " + "; ".join(errors))
+
+    def embed_texts(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        if not texts:
+            return [], 0
+        result = self.embed(texts)
+        return result["vectors"], result["tokens"]
+
+    def status(self) -> dict:
+        return {p.name: p.status() for p in self.providers}
+
+    def close(self):
+        self._stop.set()
+
+    def _ping_loop(self):
+        while not self._stop.wait(self.ping_interval_s):
+            for p in self.providers:
+                if p.breaker.state == CLOSED:
+                    continue
+                try:
+                    p.embed(["health check"])
+                except Exception as e:
+                    p.last_error = str(e)[:300]
+                    p.breaker.record_failure()
+                    continue
+                p.breaker.record_success()
+                logger.info(f"Embedding provider {p.name} recovered ({p.last_latency_ms}ms)")
+
+
+def build_client(model: str | None = None):
+    """Embedding client for the configured backend; Together gets failover when enabled.
+
+    Failover clients are shared per model (see shared_client), so callers must not close them.
+    """
+    model = model or settings.TOGETHER_EMBEDDING_MODEL
+    if settings.EMBEDDINGS_BACKEND == "together" and settings.EMBEDDINGS_FAILOVER:
+        return shared_client(model)
+    return EmbeddingClient(
+        api_key=settings.TOGETHER_API_KEY,
+        base_url=settings.TOGETHER_BASE_URL,
+        model=model,
+        backend=settings.EMBEDDINGS_BACKEND,
+        l2_normalize=settings.EMBEDDINGS_L2_NORMALIZE,
+        max_batch=settings.EMBEDDINGS_MAX_BATCH,
+    )
+
+
+_shared: dict[str, FallbackEmbeddingClient] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_client(model: str | None = None) -> FallbackEmbeddingClient:
+    """One FallbackEmbeddingClient, and so one health pinger thread, per model and process."""
+    name = get_model_meta(model or settings.TOGETHER_EMBEDDING_MODEL).name
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = FallbackEmbeddingClient(name)
+        return _shared[name]
+
+
+def default_client() -> FallbackEmbeddingClient:
+    return shared_client()
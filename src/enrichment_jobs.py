@@ -0,0 +1,110 @@
+# src/enrichment_jobs.py
+"""Persisted state of enrichment batch jobs (Pipeline B).
+
+One job per input shard:  PENDING (shard written) -> SUBMITTED (job_id) -> DONE | FAILED.
+A job whose batch fails/expires goes back to PENDING and is resubmitted until
+ENRICHMENT_MAX_ATTEMPTS. PENDING jobs are submitted by priority tier. In hierarchical
+mode a finished map/reduce job adds the next reduce job for its files.
+
+The store is a small JSON file rewritten atomically on every transition, so the
+orchestrator can be restarted at any point and pick up its in-flight jobs instead of
+waiting on them in a blocking loop. compact() moves old DONE jobs to an append-only
+archive next to it so the rewrite stays proportional to the live jobs.
+"""
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+
+PENDING, SUBMITTED, DONE, FAILED = "PENDING", "SUBMITTED", "DONE", "FAILED"
+
+# Together batch statuses that end a job without output
+BATCH_FAILURES = {"FAILED", "EXPIRED", "CANCELLED"}
+
+
+@dataclass
+class EnrichmentJob:
+    shard: str
+    count: int
+    collection: str
+    # "chunk" (per-chunk summaries), "map" (chunk groups) or "reduce" (group summaries -> file)
+    stage: str = "chunk"
+    priority: int = 2
+    est_tokens: int = 0
+    est_usd: float = 0.0
+    status: str = PENDING
+    job_id: str | None = None
+    attempts: int = 0
+    submitted_at: float | None = None
+    next_poll_at: float = 0.0
+    poll_interval_s: float = 0.0
+    progress: float | None = None
+    output_file: str | None = None
+    error: str | None = None
+    # Daily budget booking (src/enrichment_scheduler.py): estimate on submit, actual when done
+    budget_day: str | None = None
+    charged_tokens: int = 0
+    charged_usd: float = 0.0
+    updated_at: float = field(default_factory=time.time)
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.jobs: dict[str, EnrichmentJob] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.jobs = {k: EnrichmentJob(**v) for k, v in json.load(f).items()}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({k: asdict(v) for k, v in self.jobs.items()}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def add(self, job: EnrichmentJob):
+        self.jobs[job.shard] = job
+        self.save()
+
+    def transition(self, job: EnrichmentJob, status: str, **changes):
+        job.status = status
+        for k, v in changes.items():
+            setattr(job, k, v)
+        job.updated_at = time.time()
+        self.save()
+
+    def compact(self, retention_s: float, keep=None) -> int:
+        """Archive DONE jobs not updated for retention_s, except those keep(job) holds on to."""
+        cutoff = time.time() - retention_s
+        old = [
+            j for j in self.jobs.values()
+            if j.status == DONE and j.updated_at < cutoff and not (keep and keep(j))
+        ]
+        if not old:
+            return 0
+        with open(self.path + ".archive.jsonl", "a") as f:
+            for j in old:
+                f.write(json.dumps(asdict(j)) + "\n")
+        for j in old:
+            del self.jobs[j.shard]
+        self.save()
+        return len(old)
+
+    def by_status(self, *statuses: str) -> list[EnrichmentJob]:
+        return [j for j in self.jobs.values() if j.status in statuses]
+
+    def summary(self) -> dict:
+        out = {s: 0 for s in (PENDING, SUBMITTED, DONE, FAILED)}
+        for j in self.jobs.values():
+            out[j.status] += 1
+        return out
+
+
+def next_poll_delay(prev_delay: float, elapsed: float, progress: float | None, min_s: float, max_s: float) -> float:
+    """Poll about twice per remaining ETA when progress is known; otherwise back off 1.5x."""
+    if progress and 0 < progress < 100:
+        eta = elapsed * (100 - progress) / progress
+        delay = eta / 2
+    else:
+        delay = prev_delay * 1.5 if prev_delay else min_s
+    return max(min_s, min(max_s, delay))
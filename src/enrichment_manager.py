@@ -1,14 +1,37 @@
 # src/enrichment_manager.py
+import hashlib
 import json
 import logging
 import os
 import time
+from uuid import NAMESPACE_URL, uuid5
 
+from prometheus_client import Counter, Gauge, start_http_server
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import FieldCondition, Filter, MatchValue
+from qdrant_client.http.models import FieldCondition, Filter, MatchValue, PointStruct
+from src.chunking import CHARS_PER_TOKEN, approx_tokens, batched
 from src.config import settings
-from src.embeddings.client import EmbeddingClient
 from src.embeddings.models import get_model_meta
+from src.embeddings.providers import build_client
+from src.enrichment_jobs import (
+    BATCH_FAILURES,
+    DONE,
+    FAILED,
+    PENDING,
+    SUBMITTED,
+    EnrichmentJob,
+    JobStore,
+    next_poll_delay,
+)
+from src.enrichment_scheduler import (
+    DailyBudget,
+    estimate_cost,
+    estimate_request_tokens,
+    priority_tier,
+    shard_token_cap,
+)
+from src.pricing import LLM_PRICE_PER_MILLION
+from src.payload_writer import BatchedPayloadWriter, retry_failed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("EnrichmentManager")
@@ -16,11 +39,23 @@ logger = logging.getLogger("EnrichmentManager")
 # Initialize Clients
 qdrant_client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
 
-embed_client = EmbeddingClient(
-    api_key=settings.TOGETHER_API_KEY,
-    base_url=settings.TOGETHER_BASE_URL,
-    model=settings.TOGETHER_EMBEDDING_MODEL,
-)
+# Same backend, normalization and failover as the ingest workers, so document summary
+# points land in the vector space of the chunks they summarize
+embed_client = build_client()
+
+
+def get_batch_client():
+    """Together batch API client, or the offline mock (ENRICHMENT_BATCH_BACKEND=mock)."""
+    if settings.ENRICHMENT_BATCH_BACKEND == "mock":
+        from src.mock_batch_api import MockBatchClient
+
+        return MockBatchClient(settings.BATCH_PROCESSING_DIR)
+    from together import Together
+
+    return Together(api_key=settings.TOGETHER_API_KEY)
+
+
+together_client = get_batch_client()
 
 
 SUMMARY_PROMPT_TEMPLATE = """You are a forensic analyst. Summarize the extracted text accurately. 
@@ -30,53 +65,650 @@ Text: {text}
 
 Forensic Summary:"""
 
+REDUCE_PROMPT_TEMPLATE = """You are a forensic analyst. Below are summaries of consecutive sections of one file
+({source_path}). Combine them into a single forensic summary of the whole file.
+Focus on key events, entities (people, IPs, locations), and critical artifacts.
+
+Section summaries:
+{text}
 
-def prepare_batch_input(collection_name: str, limit=45000):
-    """Extracts PENDING records and creates a JSONL input file."""
+Forensic Summary:"""
+
+# Chunk payload fields copied onto the per-file summary point
+DOC_META_FIELDS = ("case", "modality", "mime", "ts_month", "batch_id", "file_type")
+
+MAX_PROMPT_CHARS = settings.ENRICHMENT_MAX_PROMPT_TOKENS * CHARS_PER_TOKEN  # Truncate for context limits
+
+DEDUP_REQUESTS_SAVED = Counter(
+    "enrichment_dedup_requests_saved_total", "Enrichment requests avoided by text-hash dedup"
+)
+DEDUP_TOKENS_SAVED = Counter(
+    "enrichment_dedup_prompt_tokens_saved_total", "Approx. prompt tokens avoided by text-hash dedup"
+)
+BUDGET_SPENT = Gauge("enrichment_budget_spent", "Enrichment tokens / USD booked today", ["unit"])
+
+
+def iter_pending_records(collection_name: str, offset=None, page_size: int | None = None):
+    """Yield (page, next_offset) for PENDING records, one scroll page at a time.
+
+    Only the fields needed for the request and its priority are fetched; next_offset is
+    None on the last page.
+    """
     filter_ = Filter(
         must=[FieldCondition(key="forensic_summary", match=MatchValue(value="PENDING"))]
     )
+    page_size = page_size or settings.ENRICHMENT_SCROLL_PAGE
+    while True:
+        records, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            scroll_filter=filter_,
+            limit=page_size,
+            offset=offset,
+            with_payload=["text", "source_path", "modality"],
+            with_vectors=False,
+        )
+        if records:
+            yield records, offset
+        if offset is None:
+            return
+
 
-    # Use Qdrant's scroll API to fetch records
-    records, _ = qdrant_client.scroll(
-        collection_name=collection_name,
-        scroll_filter=filter_,
-        limit=limit,
-        with_payload=True,
-        with_vectors=False,
+def build_batch_request(custom_id: str, text: str, template: str = SUMMARY_PROMPT_TEMPLATE, **fields) -> dict:
+    # Format according to Together.AI Batch API schema
+    return {
+        "custom_id": custom_id,
+        "body": {
+            "model": settings.ENRICHMENT_LLM_MODEL,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": template.format(text=text[:MAX_PROMPT_CHARS], **fields),
+                }
+            ],
+            "max_tokens": settings.ENRICHMENT_MAX_OUTPUT_TOKENS,
+        },
+    }
+
+
+class ShardWriter:
+    """Rolling JSONL batch input files capped by request count and bytes (Together limits)
+    and, optionally, by estimated tokens so a shard fits a daily budget."""
+
+    def __init__(
+        self,
+        prefix: str,
+        max_requests: int,
+        max_bytes: int,
+        max_tokens: int = 0,
+        path: str | None = None,
+        count: int = 0,
+        size: int = 0,
+        tokens: int = 0,
+    ):
+        self.prefix = prefix
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.completed: list[tuple[str, int, int]] = []
+        self.path, self.count, self.size, self.tokens = path, count, size, tokens
+        self._f = None
+        if path:
+            # Resume: drop anything written after the last checkpoint
+            self._f = open(path, "ab")
+            self._f.truncate(size)
+
+    def write(self, request: dict, tokens: int = 0, rotate: bool = True):
+        line = (json.dumps(request) + "\n").encode()
+        if rotate and self._f and (
+            self.count >= self.max_requests
+            or self.size + len(line) > self.max_bytes
+            or (self.max_tokens and self.tokens + tokens > self.max_tokens)
+        ):
+            self.rotate()
+        if self._f is None:
+            self.path = f"{self.prefix}_{len(self.completed):04d}_input.jsonl"
+            self._f = open(self.path, "wb")
+            self.count = self.size = self.tokens = 0
+        self._f.write(line)
+        self.count += 1
+        self.size += len(line)
+        self.tokens += tokens
+
+    def reserve(self, count: int, size: int, tokens: int = 0):
+        """Start a new shard unless the current one can take `count` more requests whole
+        (keeps all requests of one file in one shard)."""
+        if self._f and self.count and (
+            self.count + count > self.max_requests
+            or self.size + size > self.max_bytes
+            or (self.max_tokens and self.tokens + tokens > self.max_tokens)
+        ):
+            self.rotate()
+
+    def flush(self):
+        if self._f:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+
+    def rotate(self):
+        if self._f:
+            self._f.close()
+            self._f = None
+            if self.count:
+                self.completed.append((self.path, self.count, self.tokens))
+
+    def state(self) -> dict:
+        return {
+            "shard": self.path if self._f else None,
+            "shard_count": self.count,
+            "shard_bytes": self.size,
+            "shard_tokens": self.tokens,
+            "completed": self.completed,
+        }
+
+    def close(self) -> list[tuple[str, int, int]]:
+        self.rotate()
+        return self.completed
+
+
+def _checkpoint_path(collection_name: str) -> str:
+    return os.path.join(settings.BATCH_PROCESSING_DIR, f"scan_{collection_name}.checkpoint.json")
+
+
+def _save_checkpoint(path: str, state: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def text_hash(text: str) -> str:
+    """custom_id for a request: hash of the whitespace/case-normalized (truncated) text."""
+    normalized = " ".join(text[:MAX_PROMPT_CHARS].split()).lower()
+    return "h" + hashlib.sha1(normalized.encode("utf-8", "ignore")).hexdigest()
+
+
+def sidecar_path(shard: str, kind: str) -> str:
+    return shard.replace("_input.jsonl", f"_{kind}.jsonl")
+
+
+def members_path(shard: str) -> str:
+    return sidecar_path(shard, "members")
+
+
+def load_members(shard: str) -> dict | None:
+    """custom_id -> [point ids] for a deduplicated shard; None for per-point shards."""
+    path = members_path(shard)
+    if not os.path.exists(path):
+        return None
+    members: dict[str, list] = {}
+    with open(path) as f:
+        for line in f:
+            m = json.loads(line)
+            members.setdefault(m["h"], []).append(m["id"])
+    return members
+
+
+class Sidecars:
+    """Append-only JSONL files next to each shard (`members`: hash -> point id; `docs`: per
+    file map/reduce state). Lines can go to any shard, e.g. a duplicate found after the
+    shard carrying its request rotated; sizes are checkpointed like the shards'."""
+
+    def __init__(self, kind: str, sizes: dict | None = None):
+        self.kind = kind
+        self.sizes: dict[str, int] = {}
+        self._files: dict = {}
+        for shard, size in (sizes or {}).items():
+            self._open(shard).truncate(size)
+            self.sizes[shard] = size
+
+    def _open(self, shard: str):
+        if shard not in self._files:
+            self._files[shard] = open(sidecar_path(shard, self.kind), "ab")
+        return self._files[shard]
+
+    def add(self, shard: str, record: dict):
+        line = (json.dumps(record) + "\n").encode()
+        self._open(shard).write(line)
+        self.sizes[shard] = self.sizes.get(shard, 0) + len(line)
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+def prepare_batch_input(collection_name: str):
+    """Streams PENDING records into rolling JSONL shards; returns one job spec per shard
+    ({"shard", "count", "priority", "est_tokens", "est_usd"}), highest priority first.
+
+    Each record's priority tier (enrichment_scheduler.priority_tier) picks the shard series
+    it goes to, so high-value artifacts are never queued behind browser caches. Records are
+    grouped by text_hash(): only the first record with a given text produces a request
+    (custom_id = the hash) and every point id is listed in the shard's members sidecar, so
+    the one summary is fanned out to all of them on write-back.
+
+    Memory holds one scroll page plus the set of hashes seen in this pass. The scroll
+    offset and file sizes are checkpointed after every page, so a restart resumes the same
+    pass without re-reading (and re-submitting) what is already in a shard.
+    """
+    ckpt_path = _checkpoint_path(collection_name)
+    state = {}
+    if os.path.exists(ckpt_path):
+        with open(ckpt_path) as f:
+            state = json.load(f)
+        logger.info(f"Resuming PENDING scan of {collection_name} at offset {state.get('offset')}")
+    prefix = state.get("prefix") or os.path.join(
+        settings.BATCH_PROCESSING_DIR, f"batch_{int(time.time())}"
     )
+    token_cap = shard_token_cap()
+    writers: dict[int, ShardWriter] = {}
+
+    def writer_for(tier: int) -> ShardWriter:
+        if tier not in writers:
+            ws = state.get("writers", {}).get(str(tier), {})
+            writers[tier] = ShardWriter(
+                f"{prefix}_p{tier}",
+                settings.ENRICHMENT_SHARD_MAX_REQUESTS,
+                settings.ENRICHMENT_SHARD_MAX_BYTES,
+                max_tokens=token_cap,
+                path=ws.get("shard"),
+                count=ws.get("shard_count", 0),
+                size=ws.get("shard_bytes", 0),
+                tokens=ws.get("shard_tokens", 0),
+            )
+            writers[tier].completed = [tuple(c) for c in ws.get("completed", [])]
+        return writers[tier]
+
+    for tier in state.get("writers", {}):
+        writer_for(int(tier))
+    members = Sidecars("members", state.get("members_bytes"))
+    stats = state.get("dedup") or {"records": 0, "requests": 0, "prompt_tokens_saved": 0, "tiers": {}}
+
+    # hash -> shard carrying its request; rebuilt from the shards on resume
+    owner: dict[str, str] = {}
+    for w in writers.values():
+        for shard in [c[0] for c in w.completed] + ([w.path] if w.path else []):
+            with open(shard) as f:
+                for line in f:
+                    owner[json.loads(line)["custom_id"]] = shard
+
+    for records, next_offset in iter_pending_records(collection_name, offset=state.get("offset")):
+        for record in records:
+            payload = record.payload or {}
+            text = payload.get("text", "")
+            h = text_hash(text)
+            stats["records"] += 1
+            if h not in owner:
+                tier, tier_name = priority_tier(payload)
+                request = build_batch_request(h, text)
+                prompt_tokens, completion_tokens = estimate_request_tokens(request["body"]["messages"][-1]["content"])
+                writer = writer_for(tier)
+                writer.write(request, tokens=prompt_tokens + completion_tokens)
+                owner[h] = writer.path
+                stats["requests"] += 1
+                stats["tiers"][tier_name] = stats["tiers"].get(tier_name, 0) + 1
+            else:
+                stats["prompt_tokens_saved"] += approx_tokens(SUMMARY_PROMPT_TEMPLATE) + approx_tokens(
+                    text[:MAX_PROMPT_CHARS]
+                )
+            members.add(owner[h], {"h": h, "id": record.id})
+        for writer in writers.values():
+            writer.flush()
+        members.flush()
+        _save_checkpoint(
+            ckpt_path,
+            {
+                "prefix": prefix,
+                "offset": next_offset,
+                "writers": {str(tier): w.state() for tier, w in writers.items()},
+                "members_bytes": members.sizes,
+                "dedup": stats,
+            },
+        )
+
+    jobs = _job_specs(writers)
+    members.close()
+    if stats["records"]:
+        report_dedup_savings(prefix, stats)
+    # Pass finished: the next call starts a fresh scan
+    if os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
+    return jobs
 
-    if not records:
-        return None, 0
 
-    timestamp = int(time.time())
-    input_filename = os.path.join(
-        settings.BATCH_PROCESSING_DIR, f"batch_{timestamp}_input.jsonl"
+def _job_specs(writers: dict[int, "ShardWriter"], stage: str = "chunk") -> list[dict]:
+    """Close {tier: writer} and describe each shard as EnrichmentJob fields."""
+    jobs = []
+    for tier, writer in sorted(writers.items()):
+        for shard, count, tokens in writer.close():
+            completion = count * settings.ENRICHMENT_MAX_OUTPUT_TOKENS
+            jobs.append(
+                {
+                    "shard": shard,
+                    "count": count,
+                    "stage": stage,
+                    "priority": tier,
+                    "est_tokens": tokens,
+                    "est_usd": estimate_cost(tokens - completion, completion),
+                }
+            )
+    return jobs
+
+
+def report_dedup_savings(prefix: str, stats: dict):
+    saved = stats["records"] - stats["requests"]
+    DEDUP_REQUESTS_SAVED.inc(saved)
+    DEDUP_TOKENS_SAVED.inc(stats["prompt_tokens_saved"])
+    report = {
+        **stats,
+        "requests_saved": saved,
+        "requests_saved_pct": round(100 * saved / stats["records"], 1),
+    }
+    with open(f"{prefix}_dedup.json", "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(
+        f"Dedup: {stats['records']} PENDING records -> {stats['requests']} requests "
+        f"({saved} saved, {report['requests_saved_pct']}%; ~{stats['prompt_tokens_saved']:,} prompt tokens); "
+        f"by tier: {stats['tiers']}"
     )
 
-    with open(input_filename, "w") as f:
+
+# --- Hierarchical (map-reduce) enrichment ---
+
+
+def doc_key(collection_name: str, source_path: str) -> str:
+    return "d" + hashlib.sha1(f"{collection_name}:{source_path}".encode("utf-8", "ignore")).hexdigest()
+
+
+def pack_texts(texts: list[str], max_tokens: int) -> list[list[str]]:
+    """Consecutive runs of texts whose approx. tokens stay under max_tokens (each run has at
+    least one text; an oversized text is truncated later by build_batch_request)."""
+    groups, current, used = [], [], 0
+    for text in texts:
+        n = approx_tokens(text)
+        if current and used + n > max_tokens:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += n
+    if current:
+        groups.append(current)
+    return groups
+
+
+def iter_pending_files(collection_name: str) -> dict[str, int]:
+    """source_path -> priority tier of every file with PENDING chunks (no text is read)."""
+    files: dict[str, int] = {}
+    filter_ = Filter(must=[FieldCondition(key="forensic_summary", match=MatchValue(value="PENDING"))])
+    offset = None
+    while True:
+        records, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            scroll_filter=filter_,
+            limit=settings.ENRICHMENT_SCROLL_PAGE,
+            offset=offset,
+            with_payload=["source_path", "modality"],
+            with_vectors=False,
+        )
         for record in records:
-            # Use Qdrant Point ID as the custom_id for tracking
-            custom_id = str(record.id)
-            text = record.payload.get("text", "")[:30000]  # Truncate for context limits
-
-            # Format according to Together.AI Batch API schema
-            batch_request = {
-                "custom_id": custom_id,
-                "body": {
-                    "model": settings.ENRICHMENT_LLM_MODEL,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": SUMMARY_PROMPT_TEMPLATE.format(text=text),
-                        }
-                    ],
-                    "max_tokens": 512,
-                },
-            }
-            f.write(json.dumps(batch_request) + "\n")
+            payload = record.payload or {}
+            if payload.get("source_path") and payload["source_path"] not in files:
+                files[payload["source_path"]] = priority_tier(payload)[0]
+        if offset is None:
+            return files
+
+
+# forensic_summary values that are a status, not a summary
+SUMMARY_STATES = {"PENDING", "SUBMITTED", "ENRICHMENT_FAILED"}
+
+
+def file_chunks(collection_name: str, source_path: str) -> list:
+    """All chunks of one file (not its document point) in chunk_index order (point id order
+    for older points)."""
+    filter_ = Filter(
+        must=[FieldCondition(key="source_path", match=MatchValue(value=source_path))],
+        must_not=[FieldCondition(key="summary_level", match=MatchValue(value="document"))],
+    )
+    chunks, offset = [], None
+    while True:
+        records, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            scroll_filter=filter_,
+            limit=settings.ENRICHMENT_SCROLL_PAGE,
+            offset=offset,
+            with_payload=["text", "chunk_index", "forensic_summary", *DOC_META_FIELDS],
+            with_vectors=False,
+        )
+        chunks.extend(records)
+        if offset is None:
+            break
+    return sorted(chunks, key=lambda r: ((r.payload or {}).get("chunk_index", 0), str(r.id)))
+
+
+def _write_file_requests(writer: "ShardWriter", docs: Sidecars, doc: dict, requests: list[tuple]):
+    """requests: [(custom_id, text, template, fields)]; all land in one shard with `doc`."""
+    built = [build_batch_request(cid, text, template, **fields) for cid, text, template, fields in requests]
+    tokens = [sum(estimate_request_tokens(r["body"]["messages"][-1]["content"])) for r in built]
+    size = sum(len(json.dumps(r)) + 1 for r in built)
+    writer.reserve(len(built), size, sum(tokens))
+    if len(built) > writer.max_requests or size > writer.max_bytes or (writer.max_tokens and sum(tokens) > writer.max_tokens):
+        logger.warning(f"{doc['source_path']}: {len(built)} requests exceed the shard caps; keeping them in one shard")
+    for i, (request, n) in enumerate(zip(built, tokens)):
+        writer.write(request, tokens=n, rotate=i == 0)
+    docs.add(writer.path, doc)
+    return writer.path
+
+
+def prepare_hierarchical_input(collection_name: str):
+    """Map stage: one request per group of consecutive chunks (<= ENRICHMENT_GROUP_TOKENS)
+    instead of one per chunk; returns job specs like prepare_batch_input.
+
+    Each file's groups go to one shard (highest priority tiers first). The `members`
+    sidecar fans each group summary out to its chunks; the `docs` sidecar records the
+    groups of every file so the reduce stage can combine their summaries. Summaries that
+    earlier runs left on the file's other chunks join the reduce as they are, so the
+    document summary still covers the whole file when it gains chunks.
+    """
+    ckpt_path = _checkpoint_path(collection_name)
+    state = {}
+    if os.path.exists(ckpt_path):
+        with open(ckpt_path) as f:
+            state = json.load(f)
+    if state.get("mode") != "hierarchical":
+        state = {}  # a chunk-mode checkpoint can't be resumed here
+    prefix = state.get("prefix") or os.path.join(settings.BATCH_PROCESSING_DIR, f"batch_{int(time.time())}")
+    files_path = f"{prefix}_files.json"
+    if state:
+        with open(files_path) as f:
+            files = json.load(f)
+        logger.info(f"Resuming hierarchical scan of {collection_name} at file {state['file_index']}/{len(files)}")
+    else:
+        files = sorted(iter_pending_files(collection_name).items(), key=lambda kv: (kv[1], kv[0]))
+        with open(files_path, "w") as f:
+            json.dump(files, f)
 
-    return input_filename, len(records)
+    token_cap = shard_token_cap()
+    writers: dict[int, ShardWriter] = {}
+    for tier, ws in state.get("writers", {}).items():
+        writers[int(tier)] = ShardWriter(
+            f"{prefix}_p{tier}", settings.ENRICHMENT_SHARD_MAX_REQUESTS, settings.ENRICHMENT_SHARD_MAX_BYTES,
+            max_tokens=token_cap, path=ws.get("shard"), count=ws.get("shard_count", 0),
+            size=ws.get("shard_bytes", 0), tokens=ws.get("shard_tokens", 0),
+        )
+        writers[int(tier)].completed = [tuple(c) for c in ws.get("completed", [])]
+    members = Sidecars("members", state.get("members_bytes"))
+    docs = Sidecars("docs", state.get("docs_bytes"))
+    stats = state.get("stats") or {"files": 0, "chunks": 0, "requests": 0}
+    since_checkpoint = 0
+
+    def checkpoint(file_index: int):
+        for w in writers.values():
+            w.flush()
+        members.flush()
+        docs.flush()
+        _save_checkpoint(
+            ckpt_path,
+            {
+                "mode": "hierarchical",
+                "prefix": prefix,
+                "file_index": file_index,
+                "writers": {str(t): w.state() for t, w in writers.items()},
+                "members_bytes": members.sizes,
+                "docs_bytes": docs.sizes,
+                "stats": stats,
+            },
+        )
+
+    for i in range(state.get("file_index", 0), len(files)):
+        source_path, tier = files[i]
+        all_chunks = file_chunks(collection_name, source_path)
+        chunks = [c for c in all_chunks if (c.payload or {}).get("forensic_summary") == "PENDING"]
+        if not chunks:
+            continue
+        # Earlier summaries of the file in chunk order (one per group or per chunk)
+        previous = [(c.payload or {}).get("forensic_summary") for c in all_chunks]
+        carried = list(dict.fromkeys(t for t in previous if t and t not in SUMMARY_STATES))
+        key = doc_key(collection_name, source_path)
+        groups, start = [], 0
+        for texts in pack_texts([(c.payload or {}).get("text", "") for c in chunks], settings.ENRICHMENT_GROUP_TOKENS):
+            groups.append((f"{key}.g{len(groups)}", chunks[start : start + len(texts)], "\n\n".join(texts)))
+            start += len(texts)
+        if tier not in writers:
+            writers[tier] = ShardWriter(
+                f"{prefix}_p{tier}", settings.ENRICHMENT_SHARD_MAX_REQUESTS, settings.ENRICHMENT_SHARD_MAX_BYTES,
+                max_tokens=token_cap,
+            )
+        meta = {k: chunks[0].payload[k] for k in DOC_META_FIELDS if k in (chunks[0].payload or {})}
+        doc = {
+            "doc": key, "collection": collection_name, "source_path": source_path, "chunks": len(all_chunks),
+            "meta": meta, "groups": [gid for gid, _, _ in groups], "round": 0, "requests": len(groups),
+            "carried": carried,
+        }
+        shard = _write_file_requests(
+            writers[tier], docs, doc, [(gid, text, SUMMARY_PROMPT_TEMPLATE, {}) for gid, _, text in groups]
+        )
+        for gid, group_chunks, _ in groups:
+            for c in group_chunks:
+                members.add(shard, {"h": gid, "id": c.id})
+        stats["files"] += 1
+        stats["chunks"] += len(chunks)
+        stats["requests"] += len(groups)
+        since_checkpoint += len(chunks)
+        if since_checkpoint >= settings.ENRICHMENT_SCROLL_PAGE:
+            checkpoint(i + 1)
+            since_checkpoint = 0
+
+    jobs = _job_specs(writers, stage="map")
+    members.close()
+    docs.close()
+    if stats["files"]:
+        with open(f"{prefix}_hierarchy.json", "w") as f:
+            json.dump(stats, f, indent=2)
+        logger.info(
+            f"Hierarchical map: {stats['chunks']} PENDING chunks in {stats['files']} files -> "
+            f"{stats['requests']} requests ({stats['chunks'] / stats['requests']:.1f} chunks per request)"
+        )
+    for path in (ckpt_path, files_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return jobs
+
+
+def load_docs(shard: str) -> list[dict]:
+    path = sidecar_path(shard, "docs")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def load_summaries(output_filename: str) -> dict[str, str]:
+    """custom_id -> summary for the successful lines of a batch output file."""
+    return {
+        cid: payload["forensic_summary"]
+        for cid, payload in iter_summary_updates(output_filename)
+        if payload["forensic_summary"] != "ENRICHMENT_FAILED"
+    }
+
+
+def advance_documents(store: JobStore, job: EnrichmentJob, summaries: dict[str, str]):
+    """After a map/reduce job: files with a single summary become document points, the
+    others get a reduce request (or several, one round deeper, if their summaries don't fit
+    one prompt) in a new job.
+
+    Groups whose request failed are left out and counted in `missing_groups`, which ends up
+    as summary_partial / summary_missing_groups on the document point."""
+    final, pending = [], []
+    for doc in load_docs(job.shard):
+        parts = doc.get("carried", []) + [summaries[g] for g in doc["groups"] if g in summaries]
+        missing = sum(1 for g in doc["groups"] if g not in summaries)
+        if missing:
+            logger.warning(f"{doc['source_path']}: {missing}/{len(doc['groups'])} summaries failed in round {doc['round']}")
+        doc = {**doc, "carried": [], "missing_groups": doc.get("missing_groups", 0) + missing}
+        if not parts:
+            logger.warning(f"No summaries for {doc['source_path']}; no document summary written")
+        elif len(parts) == 1:
+            final.append((doc, parts[0]))
+        else:
+            pending.append((doc, parts))
+    if final:
+        write_document_points(job.collection, final)
+    if not pending:
+        return
+    prefix = job.shard.replace("_input.jsonl", "") + "_r"
+    writer = ShardWriter(
+        prefix, settings.ENRICHMENT_SHARD_MAX_REQUESTS, settings.ENRICHMENT_SHARD_MAX_BYTES, max_tokens=shard_token_cap()
+    )
+    docs = Sidecars("docs")
+    for doc, parts in pending:
+        level = doc["round"] + 1
+        labelled = [f"[Part {i + 1}] {p}" for i, p in enumerate(parts)]
+        packed = pack_texts(labelled, settings.ENRICHMENT_GROUP_TOKENS)
+        ids = [doc["doc"]] if len(packed) == 1 else [f"{doc['doc']}.r{level}.{i}" for i in range(len(packed))]
+        _write_file_requests(
+            writer,
+            docs,
+            {**doc, "groups": ids, "round": level, "requests": doc["requests"] + len(ids)},
+            [
+                (cid, "\n\n".join(texts), REDUCE_PROMPT_TEMPLATE, {"source_path": doc["source_path"]})
+                for cid, texts in zip(ids, packed)
+            ],
+        )
+    docs.close()
+    for spec in _job_specs({job.priority: writer}, stage="reduce"):
+        store.add(EnrichmentJob(collection=job.collection, **spec))
+        logger.info(f"Queued reduce job {spec['shard']} ({spec['count']} requests)")
+
+
+def write_document_points(collection_name: str, final: list[tuple[dict, str]]):
+    """Upsert one embedded summary point per file (id derived from the path, so re-runs
+    replace it)."""
+    for batch in batched(final, settings.STREAM_UPSERT_BATCH):
+        vectors, _ = embed_client.embed_texts([summary for _, summary in batch])
+        points = [
+            PointStruct(
+                id=str(uuid5(NAMESPACE_URL, f"{collection_name}:{doc['source_path']}#summary")),
+                vector=vector,
+                payload={
+                    **doc["meta"],
+                    "source_path": doc["source_path"],
+                    "text": summary,
+                    "forensic_summary": summary,
+                    "summary_level": "document",
+                    "chunk_count": doc["chunks"],
+                    "summary_requests": doc["requests"],
+                    "summary_partial": bool(doc.get("missing_groups")),
+                    "summary_missing_groups": doc.get("missing_groups", 0),
+                },
+            )
+            for (doc, summary), vector in zip(batch, vectors)
+        ]
+        qdrant_client.upsert(collection_name=collection_name, points=points, wait=True)
+    logger.info(f"Wrote {len(final)} document summary point(s) to {collection_name}")
 
 
 def submit_batch_job(input_filename: str):
@@ -98,9 +730,8 @@ def submit_batch_job(input_filename: str):
         return None
 
 
-def update_qdrant_with_summaries(output_filename: str, collection_name: str):
-    """Reads the output JSONL and updates Qdrant."""
-    updated_count = 0
+def iter_summary_updates(output_filename: str):
+    """(point_id, payload) for each line of a batch output file."""
     with open(output_filename, "r") as f:
         for line in f:
             result = json.loads(line)
@@ -108,78 +739,341 @@ def update_qdrant_with_summaries(output_filename: str, collection_name: str):
             try:
                 # Extract summary from the Chat Completion response
                 summary = result["response"]["body"]["choices"][0]["message"]["content"]
-                # Update the record in Qdrant
-                qdrant_client.set_payload(
-                    collection_name=collection_name,
-                    payload={"forensic_summary": summary},
-                    points=[qdrant_point_id],
-                )
-                updated_count += 1
+                yield qdrant_point_id, {"forensic_summary": summary}
             except (KeyError, TypeError, IndexError):
                 logger.warning(
                     f"Could not extract summary for ID {qdrant_point_id}. Check error file if available."
                 )
                 # Update status if extraction fails
-                qdrant_client.set_payload(
-                    collection_name=collection_name,
-                    payload={"forensic_summary": "ENRICHMENT_FAILED"},
-                    points=[qdrant_point_id],
-                )
-    logger.info(f"Successfully updated {updated_count} records.")
+                yield qdrant_point_id, {"forensic_summary": "ENRICHMENT_FAILED"}
 
 
-def monitor_and_process_job(job_id: str, collection_name: str):
-    """Monitors the job, downloads results, and updates Qdrant."""
-    while True:
-        batch_stat = together_client.batches.get_batch(job_id)
-        # Handle potential AttributeError if progress isn't immediately available
-        progress = getattr(batch_stat, "progress", "N/A")
-        logger.info(f"Job {job_id} Status: {batch_stat.status} (Progress: {progress}%)")
-
-        if batch_stat.status == "COMPLETED":
-            timestamp = int(time.time())
-            output_filename = os.path.join(
-                settings.BATCH_PROCESSING_DIR, f"batch_{timestamp}_output.jsonl"
-            )
-            logger.info("Downloading results...")
-            together_client.files.retrieve_content(
-                id=batch_stat.output_file_id, output=output_filename
-            )
-            update_qdrant_with_summaries(output_filename, collection_name)
-            break
-        elif batch_stat.status in ["FAILED", "EXPIRED", "CANCELLED"]:
-            logger.error(f"Batch job terminated: {batch_stat.status}")
-            # Implement logic here to handle failed batches (e.g., retry or mark records as failed)
+def output_usage(output_filename: str) -> tuple[int, int]:
+    """Billed (prompt, completion) tokens of a batch output file."""
+    prompt = completion = 0
+    with open(output_filename) as f:
+        for line in f:
+            usage = ((json.loads(line).get("response") or {}).get("body") or {}).get("usage") or {}
+            prompt += usage.get("prompt_tokens", 0)
+            completion += usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+def _rebook(budget: DailyBudget | None, job: EnrichmentJob, tokens: int, usd: float) -> dict:
+    """Replace what the job has booked on its budget day with (tokens, usd)."""
+    if budget is None or job.budget_day is None:
+        return {}
+    budget.charge(tokens - job.charged_tokens, usd - job.charged_usd, day=job.budget_day)
+    _export_budget(budget)
+    return {"charged_tokens": tokens, "charged_usd": usd}
+
+
+def _export_budget(budget: DailyBudget):
+    spent = budget.spent()
+    BUDGET_SPENT.labels("tokens").set(spent["tokens"])
+    BUDGET_SPENT.labels("usd").set(spent["usd"])
+
+
+def _track_ids(updates, seen: set):
+    for point_id, payload in updates:
+        seen.add(point_id)
+        yield point_id, payload
+
+
+def failed_updates_path(output_filename: str) -> str:
+    return output_filename.replace(".jsonl", "") + ".failed_updates.jsonl"
+
+
+def replay_failed_updates(store: JobStore):
+    """Retry the write-backs that still failed after a DONE job's own retries.
+
+    Runs every orchestrator scan until each job's failed-updates file is gone.
+    """
+    for job in store.by_status(DONE):
+        if not job.output_file or job.stage == "reduce":
+            continue
+        failed_path = failed_updates_path(job.output_file)
+        if not os.path.exists(failed_path):
+            continue
+        stats = retry_failed(
+            qdrant_client,
+            job.collection,
+            failed_path,
+            batch_size=settings.ENRICHMENT_WRITE_BATCH,
+            writers=settings.ENRICHMENT_WRITERS,
+        )
+        if stats["failed"]:
+            logger.warning(f"{stats['failed']} updates for {job.shard} still failing; kept in {failed_path}")
+        else:
+            logger.info(f"Replayed {stats['written']} failed updates for {job.shard}")
+
+
+def compact_jobs(store: JobStore):
+    if settings.ENRICHMENT_DONE_RETENTION_S <= 0:
+        return
+    archived = store.compact(
+        settings.ENRICHMENT_DONE_RETENTION_S,
+        # Jobs with write-backs still to replay stay in the store
+        keep=lambda j: bool(j.output_file) and os.path.exists(failed_updates_path(j.output_file)),
+    )
+    if archived:
+        logger.info(f"Archived {archived} DONE job(s) older than {settings.ENRICHMENT_DONE_RETENTION_S:.0f}s")
+
+
+def update_qdrant_with_summaries(
+    output_filename: str, collection_name: str, seen: set | None = None, members: dict | None = None
+):
+    """Reads the output JSONL and updates Qdrant in batched, concurrent requests.
+
+    With `members` (deduplicated shards) each custom_id's summary goes to all of its point
+    ids. If `seen` is given, every custom_id found in the output is added to it.
+    """
+    if members is not None:
+        # Each output line fans out to all of its member points
+        expected = sum(len(ids) for ids in members.values())
+    else:
+        with open(output_filename, "rb") as f:
+            expected = sum(1 for _ in f)
+    failed_path = failed_updates_path(output_filename)
+    if os.path.exists(failed_path):
+        # Leftovers from an earlier run go first so they aren't overwritten by this one
+        retry_failed(
+            qdrant_client,
+            collection_name,
+            failed_path,
+            batch_size=settings.ENRICHMENT_WRITE_BATCH,
+            writers=settings.ENRICHMENT_WRITERS,
+        )
+    writer = BatchedPayloadWriter(
+        qdrant_client,
+        collection_name,
+        batch_size=settings.ENRICHMENT_WRITE_BATCH,
+        writers=settings.ENRICHMENT_WRITERS,
+        failed_path=failed_path,
+        expected=expected,
+    )
+    updates = iter_summary_updates(output_filename)
+    if seen is not None:
+        updates = _track_ids(updates, seen)
+    if members is not None:
+        updates = ((pid, payload) for h, payload in updates for pid in members.get(h, ()))
+    writer.set_many(updates)
+    stats = writer.close()
+    if stats["failed"]:
+        logger.error(f"{stats['failed']} updates failed after retries; saved to {failed_path}")
+    logger.info(f"Successfully updated {stats['written']} records ({stats['updates_per_sec']:,.0f}/s).")
+    return stats
+
+
+def shard_ids(shard: str):
+    """Point ids covered by a shard (its members for deduplicated shards)."""
+    members = load_members(shard)
+    if members is not None:
+        for ids in members.values():
+            yield from ids
+        return
+    with open(shard) as f:
+        for line in f:
+            yield json.loads(line)["custom_id"]
+
+
+def mark_records(ids, collection_name: str, payload: dict, expected: int | None = None):
+    writer = BatchedPayloadWriter(
+        qdrant_client,
+        collection_name,
+        batch_size=settings.ENRICHMENT_WRITE_BATCH,
+        writers=settings.ENRICHMENT_WRITERS,
+        expected=expected,
+    )
+    writer.set_many((pid, payload) for pid in ids)
+    return writer.close()
+
+
+_budget_waiting = 0
+
+
+def submit_pending_jobs(store: JobStore, budget: DailyBudget | None = None):
+    """PENDING -> SUBMITTED, by priority tier, for as many shards as the in-flight limit and
+    today's budget allow. A shard that doesn't fit the rest of the budget lets smaller,
+    lower-priority shards fill it; it goes first again tomorrow."""
+    waiting = 0
+    for job in sorted(store.by_status(PENDING), key=lambda j: (j.priority, j.shard)):
+        if len(store.by_status(SUBMITTED)) >= settings.ENRICHMENT_MAX_INFLIGHT:
             break
+        if budget is not None and not budget.fits(job.est_tokens, job.est_usd):
+            waiting += 1
+            continue
+        job_id = submit_batch_job(job.shard)
+        if not job_id:
+            job.attempts += 1
+            if job.attempts >= settings.ENRICHMENT_MAX_ATTEMPTS:
+                fail_job(store, job, "submission failed")
+            else:
+                store.save()
+            continue
+        now = time.time()
+        booking = {}
+        if budget is not None:
+            booking = {
+                "budget_day": budget.charge(job.est_tokens, job.est_usd),
+                "charged_tokens": job.est_tokens,
+                "charged_usd": job.est_usd,
+            }
+            _export_budget(budget)
+        store.transition(
+            job,
+            SUBMITTED,
+            **booking,
+            job_id=job_id,
+            attempts=job.attempts + 1,
+            submitted_at=now,
+            poll_interval_s=settings.ENRICHMENT_POLL_MIN_S,
+            next_poll_at=now + settings.ENRICHMENT_POLL_MIN_S,
+            progress=None,
+            error=None,
+        )
+        # Saved before marking: a crash here leaves records PENDING (resubmitted), never lost
+        if job.stage != "reduce":  # reduce requests summarize summaries, not points
+            mark_records(
+                shard_ids(job.shard), job.collection, {"forensic_summary": "SUBMITTED", "enrichment_job_id": job_id}
+            )
+        logger.info(
+            f"Submitted {job.shard} (priority {job.priority}, {job.count} requests, "
+            f"~{job.est_tokens:,} tokens, ~${job.est_usd:.2f}) as {job_id}"
+        )
+    global _budget_waiting
+    if waiting and waiting != _budget_waiting:
+        logger.info(f"{waiting} shard(s) wait for the daily enrichment budget; remaining {budget.remaining()}")
+    _budget_waiting = waiting
+
+
+def fail_job(store: JobStore, job: EnrichmentJob, error: str, **changes):
+    logger.error(f"Enrichment job for {job.shard} failed permanently: {error}")
+    if job.stage != "reduce":
+        mark_records(shard_ids(job.shard), job.collection, {"forensic_summary": "ENRICHMENT_FAILED"})
+    store.transition(job, FAILED, error=error, **changes)
 
-        time.sleep(300)  # Poll every 5 minutes
+
+def poll_job(store: JobStore, job: EnrichmentJob, budget: DailyBudget | None = None):
+    """One non-blocking status check; SUBMITTED -> DONE / PENDING (retry) / FAILED.
+
+    Completed jobs are rebooked at their billed usage; failed batches are refunded.
+    """
+    batch_stat = together_client.batches.get_batch(job.job_id)
+    status = str(getattr(batch_stat.status, "value", batch_stat.status)).upper()
+    now = time.time()
+
+    if status == "COMPLETED":
+        output_filename = job.shard.replace("_input.jsonl", "_output.jsonl")
+        logger.info(f"Job {job.job_id} completed; downloading results...")
+        together_client.files.retrieve_content(id=batch_stat.output_file_id, output=output_filename)
+        if job.stage == "reduce":
+            missing = []
+            stats = {"written": sum(1 for _ in iter_summary_updates(output_filename))}
+        else:
+            seen: set = set()
+            members = load_members(job.shard)
+            stats = update_qdrant_with_summaries(output_filename, job.collection, seen=seen, members=members)
+            # Requests missing from the output (rejected by the batch) would stay SUBMITTED forever
+            if members is not None:
+                missing = [pid for h, ids in members.items() if h not in seen for pid in ids]
+            else:
+                missing = [pid for pid in shard_ids(job.shard) if pid not in seen]
+            if missing:
+                mark_records(missing, job.collection, {"forensic_summary": "ENRICHMENT_FAILED"})
+        if job.stage in ("map", "reduce"):
+            advance_documents(store, job, load_summaries(output_filename))
+        prompt_tokens, completion_tokens = output_usage(output_filename)
+        booking = _rebook(
+            budget, job, prompt_tokens + completion_tokens, estimate_cost(prompt_tokens, completion_tokens)
+        )
+        store.transition(
+            job, DONE, output_file=output_filename, progress=100.0,
+            error=f"{len(missing)} requests without output" if missing else None,
+            **booking,
+        )
+        logger.info(f"Job {job.job_id} done: {stats['written']} summaries, {len(missing)} missing")
+    elif status in BATCH_FAILURES:
+        refund = _rebook(budget, job, 0, 0.0)  # failed batches aren't billed
+        if job.attempts >= settings.ENRICHMENT_MAX_ATTEMPTS:
+            fail_job(store, job, f"batch {status}", **refund)
+        else:
+            logger.warning(f"Job {job.job_id} ended {status}; resubmitting {job.shard}")
+            store.transition(job, PENDING, job_id=None, error=f"batch {status}", **refund)
+    else:
+        progress = getattr(batch_stat, "progress", None)
+        delay = next_poll_delay(
+            job.poll_interval_s, now - (job.submitted_at or now), progress,
+            settings.ENRICHMENT_POLL_MIN_S, settings.ENRICHMENT_POLL_MAX_S,
+        )
+        job.progress, job.poll_interval_s, job.next_poll_at = progress, delay, now + delay
+        store.save()
+        logger.info(f"Job {job.job_id} Status: {status} (Progress: {progress}%); next check in {delay:.0f}s")
 
 
 def run_orchestrator():
-    """Main loop for the Enrichment Manager (Pipeline B)."""
+    """Main loop for the Enrichment Manager (Pipeline B).
+
+    Never blocks on a single job: each pass polls the SUBMITTED jobs that are due, submits
+    PENDING shards up to ENRICHMENT_MAX_INFLIGHT, replays write-backs that failed for DONE
+    jobs and scans Qdrant for new PENDING records once every shard has been handed off.
+    """
     COLLECTION = settings.QDRANT_COLLECTION
     logger.info("Enrichment Manager Started. Monitoring Qdrant for PENDING records...")
 
     # Ensure the batch processing directory exists
     os.makedirs(settings.BATCH_PROCESSING_DIR, exist_ok=True)
+    # Write-back progress / throughput for Prometheus
+    start_http_server(settings.ENRICHMENT_METRICS_PORT)
+
+    store = JobStore(os.path.join(settings.BATCH_PROCESSING_DIR, "enrichment_jobs.json"))
+    logger.info(f"Job store: {store.summary()}")
+    if settings.ENRICHMENT_DAILY_USD_BUDGET and settings.ENRICHMENT_LLM_MODEL not in LLM_PRICE_PER_MILLION:
+        raise ValueError(
+            f"ENRICHMENT_DAILY_USD_BUDGET is set but {settings.ENRICHMENT_LLM_MODEL} has no price in src/pricing.py"
+        )
+    budget = DailyBudget(
+        os.path.join(settings.BATCH_PROCESSING_DIR, "enrichment_budget.json"),
+        max_tokens=settings.ENRICHMENT_DAILY_TOKEN_BUDGET,
+        max_usd=settings.ENRICHMENT_DAILY_USD_BUDGET,
+    )
+    logger.info(f"Daily budget remaining: {budget.remaining()}")
+    next_scan_at = next_replay_at = 0.0
 
     while True:
         try:
-            # 1. Prepare Input
-            input_file, count = prepare_batch_input(COLLECTION)
-            if input_file:
-                logger.info(f"Found {count} records. Preparing Batch Job...")
-                # 2. Submit Job
-                job_id = submit_batch_job(input_file)
-                if job_id:
+            now = time.time()
+            for job in store.by_status(SUBMITTED):
+                if job.next_poll_at <= now:
+                    poll_job(store, job, budget)
+
+            submit_pending_jobs(store, budget)
+
+            if time.time() >= next_replay_at:
+                replay_failed_updates(store)
+                compact_jobs(store)
+                next_replay_at = time.time() + settings.ENRICHMENT_SCAN_INTERVAL_S
+
+            # Records in unsubmitted shards are still PENDING in Qdrant; don't scan them again
+            if not store.by_status(PENDING) and time.time() >= next_scan_at:
+                if settings.ENRICHMENT_MODE == "hierarchical":
+                    shards = prepare_hierarchical_input(COLLECTION)
+                else:
+                    shards = prepare_batch_input(COLLECTION)
+                for spec in shards:
+                    store.add(EnrichmentJob(collection=COLLECTION, **spec))
+                if shards:
                     logger.info(
-                        f"Submitted Together.AI Batch Job ID: {job_id}. Waiting for results (may take hours)..."
+                        f"Queued {sum(s['count'] for s in shards)} requests in {len(shards)} shard(s), "
+                        f"~{sum(s['est_tokens'] for s in shards):,} tokens / ~${sum(s['est_usd'] for s in shards):.2f}."
                     )
-                    # 3. Process Results (Blocking call until this specific job finishes)
-                    monitor_and_process_job(job_id, COLLECTION)
-            else:
-                logger.info("No PENDING records found. Sleeping for 15 minutes...")
-                time.sleep(900)
+                    submit_pending_jobs(store, budget)
+                else:
+                    logger.info(f"No PENDING records found. Jobs: {store.summary()}")
+                next_scan_at = time.time() + settings.ENRICHMENT_SCAN_INTERVAL_S
+
+            wake = [j.next_poll_at for j in store.by_status(SUBMITTED)] + [next_scan_at, next_replay_at]
+            time.sleep(max(1.0, min(60.0, min(wake) - time.time())))
         except Exception as e:
             logger.error(f"Error in orchestration loop: {e}", exc_info=True)
             time.sleep(60)
@@ -0,0 +1,109 @@
+# src/enrichment_scheduler.py
+"""What Pipeline B summarizes first, and how much of it per day.
+
+Every PENDING record gets a priority tier from its source_path / modality (mail stores,
+Outlook temp and unsaved Office files first, browser caches last) and an estimated token
+count. The scan writes one shard series per tier, so jobs are submitted in tier order, and
+DailyBudget caps what is submitted per UTC day in tokens and/or USD (estimates are
+reserved on submission and replaced by the real usage when the output comes back).
+"""
+import json
+import os
+import re
+import time
+
+from src.chunking import approx_tokens
+from src.config import settings
+from src.pricing import BATCH_DISCOUNT, LLM_PRICE_PER_MILLION, llm_cost
+
+# (tier, name, source_path pattern, modalities); first match wins, lower tiers go first
+TIERS = [
+    (0, "mail", r"\.(pst|ost|olm|msg|eml)$|content\.outlook|/olk[^/]*/|/secure(temp)?/", {"mail_store"}),
+    (0, "unsaved_office", r"unsavedfiles|autorecover|/~\$|\.(asd|wbk)$|officefilecache", set()),
+    # Browser-specific cache dirs only: Office/OneNote keep their own caches under .../cache/
+    (3, "browser_cache", r"inetcache|temporary internet files|/cache_data/|/code cache/|/gpucache/|/cache2/|webcache", set()),
+    (1, "documents", r"\.(docx?|xlsx?|pptx?|pdf|rtf|odt)$", {"document"}),
+    (2, "ms_artifact", None, {"ms_artifact"}),
+]
+DEFAULT_TIER = (2, "other")
+_COMPILED = [(tier, name, pattern and re.compile(pattern), modalities) for tier, name, pattern, modalities in TIERS]
+
+
+def priority_tier(payload: dict) -> tuple[int, str]:
+    path = (payload.get("source_path") or "").replace("\\", "/").lower()
+    modality = payload.get("modality")
+    for tier, name, pattern, modalities in _COMPILED:
+        if modality in modalities or (pattern and pattern.search(path)):
+            return tier, name
+    return DEFAULT_TIER
+
+
+def estimate_request_tokens(prompt: str) -> tuple[int, int]:
+    """(prompt, completion) tokens for one request; completion is the max_tokens ceiling."""
+    return approx_tokens(prompt), settings.ENRICHMENT_MAX_OUTPUT_TOKENS
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    return llm_cost(settings.ENRICHMENT_LLM_MODEL, prompt_tokens, completion_tokens) or 0.0
+
+
+def shard_token_cap() -> int:
+    """Largest shard (prompt + completion tokens) that can fit a whole day's budget; 0 = none."""
+    caps = [c for c in (settings.ENRICHMENT_SHARD_MAX_TOKENS, settings.ENRICHMENT_DAILY_TOKEN_BUDGET) if c]
+    price = LLM_PRICE_PER_MILLION.get(settings.ENRICHMENT_LLM_MODEL)
+    if settings.ENRICHMENT_DAILY_USD_BUDGET and price:
+        cost_per_token = max(price) * BATCH_DISCOUNT / 1_000_000
+        caps.append(int(settings.ENRICHMENT_DAILY_USD_BUDGET / cost_per_token))
+    return min(caps) if caps else 0
+
+
+class DailyBudget:
+    """Tokens / USD submitted per UTC day, persisted as {day: {"tokens": n, "usd": x}}."""
+
+    def __init__(self, path: str, max_tokens: int = 0, max_usd: float = 0.0, keep_days: int = 30):
+        self.path = path
+        self.max_tokens = max_tokens
+        self.max_usd = max_usd
+        self.keep_days = keep_days
+        self.days: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.days = json.load(f)
+
+    @staticmethod
+    def today() -> str:
+        return time.strftime("%Y-%m-%d", time.gmtime())
+
+    def spent(self, day: str | None = None) -> dict:
+        return self.days.get(day or self.today(), {"tokens": 0, "usd": 0.0})
+
+    def fits(self, tokens: int, usd: float) -> bool:
+        spent = self.spent()
+        if self.max_tokens and spent["tokens"] + tokens > self.max_tokens:
+            return False
+        if self.max_usd and spent["usd"] + usd > self.max_usd:
+            return False
+        return True
+
+    def charge(self, tokens: int, usd: float, day: str | None = None) -> str:
+        """Add (or, with negative amounts, refund) usage; returns the day it was booked on."""
+        day = day or self.today()
+        spent = dict(self.spent(day))
+        spent["tokens"] = max(0, spent["tokens"] + tokens)
+        spent["usd"] = round(max(0.0, spent["usd"] + usd), 6)
+        self.days[day] = spent
+        for old in sorted(self.days)[: -self.keep_days]:
+            del self.days[old]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.days, f, indent=1)
+        os.replace(tmp, self.path)
+        return day
+
+    def remaining(self) -> dict:
+        spent = self.spent()
+        return {
+            "day": self.today(),
+            "tokens": self.max_tokens - spent["tokens"] if self.max_tokens else None,
+            "usd": round(self.max_usd - spent["usd"], 4) if self.max_usd else None,
+        }
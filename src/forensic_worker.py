@@ -1,5 +1,8 @@
+import json
 import logging
 import os
+import resource
+import shutil
 from uuid import uuid4
 
 import pandas as pd
@@ -7,16 +10,27 @@ import redis
 import sqlalchemy
 import torch
 import whisper
+from prometheus_client import Counter
 from qdrant_client import QdrantClient
 from .payload_router import route_payload
 from qdrant_client.http.models import PointStruct
 from rq import Worker
-from src.embeddings.client import EmbeddingClient
+from src.embeddings.providers import build_client
 from src.embeddings.models import get_model_meta
+from src import bulk_load
 from src.config import settings
+from src.chunking import PLAIN_TEXT_EXTS, batched, iter_file_chunks
+from src.qdrant_provisioning import ensure_collection
+from src.pdf_pages import (
+    partition_page_range,
+    partition_pdf_adaptive,
+    range_result_path,
+    range_work_dir,
+)
 from tenacity import retry, stop_after_attempt, wait_exponential
 from unstructured.chunking.title import chunk_by_title
 from unstructured.partition.auto import partition
+from unstructured.staging.base import elements_from_json, elements_to_json
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,33 +40,26 @@ logger = logging.getLogger(__name__)
 # Initialize Qdrant Client
 qdrant_client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
 
-# Embedding client (Together/OpenAI-compatible)
-embed_client = EmbeddingClient(
-    api_key=settings.TOGETHER_API_KEY,
-    base_url=settings.TOGETHER_BASE_URL,
-    model=settings.TOGETHER_EMBEDDING_MODEL,
-    backend=settings.EMBEDDINGS_BACKEND,
-    l2_normalize=settings.EMBEDDINGS_L2_NORMALIZE,
-    max_batch=settings.EMBEDDINGS_MAX_BATCH,
-)
+# Embedding client (Together/OpenAI-compatible); with failover on, a Together outage
+# trips a circuit breaker and work continues on the local provider. Built in the RQ
+# parent: each job's forked work-horse reads the breaker state from Redis
+# (EMBEDDINGS_BREAKER_SHARED) and the parent's pinger thread closes it on recovery.
+embed_client = build_client()
+
+_ensured_collections: set[str] = set()
+
 
 def ensure_qdrant_collection(collection_name: str, dim: int):
-    from qdrant_client.http.models import Distance, VectorParams
-    try:
-        info = qdrant_client.get_collection(collection_name)
-        existing_dim = info.config.params.vectors.size  # type: ignore
-        if existing_dim != dim:
-            raise RuntimeError(
-                f"Qdrant collection '{collection_name}' has dim={existing_dim}, "
-                f"but embedding model requires dim={dim}. Create a new collection or re-embed."
-            )
-    except Exception:
-        qdrant_client.recreate_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
-        )
-        logger.info(f"Created Qdrant collection '{collection_name}' with size={dim} (COSINE).")
+    """Provision once per worker process; raises ValueError on a dimension mismatch."""
+    if collection_name in _ensured_collections:
+        return
+    ensure_collection(qdrant_client, collection_name, dim, settings.QDRANT_PROFILE)
+    _ensured_collections.add(collection_name)
+
 
+PDF_PAGES = Counter(
+    "ingestion_pdf_pages_total", "PDF pages processed, by extraction method", ["method"]
+)
 
 # Initialize Whisper Model (Local GPU)
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
@@ -81,18 +88,44 @@ def generate_embeddings(texts: list[str]):
 # --- Processing Strategies ---
 
 
-def process_standard(file_path):
-    """Handles documents, images, emails using Unstructured/PaddleOCR."""
-    logger.info(
-        f"Using Unstructured (Strategy: {settings.OCR_STRATEGY}) for {file_path}"
-    )
+def process_standard(file_path, strategy=None):
+    """Handles documents, images, emails using Unstructured/PaddleOCR.
+
+    Returns (elements, page_stats); page_stats is empty for non-PDF inputs.
+    """
+    strategy = strategy or settings.OCR_STRATEGY
+    if (
+        settings.OCR_ADAPTIVE
+        and strategy == "hi_res"
+        and os.path.splitext(file_path)[1].lower() == ".pdf"
+    ):
+        try:
+            elements, page_stats = partition_pdf_adaptive(file_path)
+            PDF_PAGES.labels("text_layer").inc(page_stats["pages_text_layer"])
+            PDF_PAGES.labels("ocr").inc(page_stats["pages_ocr"])
+            return elements, page_stats
+        except Exception as e:
+            # Encrypted / malformed PDFs: fall back to whole-document partitioning
+            logger.warning(f"Adaptive PDF extraction failed for {file_path}: {e}")
+
+    logger.info(f"Using Unstructured (Strategy: {strategy}) for {file_path}")
     # Unstructured will automatically leverage PaddleOCR if installed and strategy is hi_res
     elements = partition(
         filename=file_path,
-        strategy=settings.OCR_STRATEGY,
+        strategy=strategy,
         pdf_infer_table_structure=True,
     )
-    return elements
+    return elements, {}
+
+
+def process_plain_text(file_path):
+    """Plain text, logs, registry summaries: a lazy chunk stream, no element objects."""
+    logger.info(f"Streaming plain-text chunker for {file_path}")
+    return iter_file_chunks(
+        file_path,
+        max_tokens=settings.CHUNK_MAX_TOKENS,
+        overlap_tokens=settings.CHUNK_OVERLAP_TOKENS,
+    )
 
 
 def process_media(file_path):
@@ -122,25 +155,29 @@ def process_database(file_path, collection, batch_id):
         with engine.connect() as connection:
             for table in table_names:
                 try:
-                    df = pd.read_sql_table(table, connection)
-                    texts = []
-                    for index, row in df.iterrows():
-                        # Create structured text representation of the row
-                        row_text = f"DB: {os.path.basename(file_path)} | Table: {table} | Row: {index}\n"
-                        row_text += "\n".join(
-                            [f"  {col}: {str(val)}" for col, val in row.items()]
-                        )
-                        texts.append(row_text)
-
-                    if texts:
-                        # Upload database rows directly (Bypass standard chunking/enrichment)
-                        upload_to_qdrant(
-                            texts,
-                            f"{file_path}#table={table}",
-                            collection,
-                            batch_id,
-                        )
-                        total_rows += len(texts)
+                    row_offset = 0
+                    # Read in row batches so a multi-GB history DB never sits in one DataFrame
+                    for df in pd.read_sql_table(table, connection, chunksize=settings.STREAM_UPSERT_BATCH):
+                        texts = []
+                        for index, (_, row) in enumerate(df.iterrows(), start=row_offset):
+                            # Create structured text representation of the row
+                            row_text = f"DB: {os.path.basename(file_path)} | Table: {table} | Row: {index}\n"
+                            row_text += "\n".join(
+                                [f"  {col}: {str(val)}" for col, val in row.items()]
+                            )
+                            texts.append(row_text)
+                        row_offset += len(df)
+
+                        if texts:
+                            # Upload database rows directly (Bypass standard chunking/enrichment)
+                            upload_to_qdrant(
+                                texts,
+                                f"{file_path}#table={table}",
+                                collection,
+                                batch_id,
+                                first_index=row_offset - len(df),
+                            )
+                            total_rows += len(texts)
                 except Exception as e:
                     logger.error(f"Error processing table {table}: {e}")
         return {"status": "completed", "extracted_chunks": total_rows}
@@ -152,7 +189,7 @@ def process_database(file_path, collection, batch_id):
 # --- Upload Function (Updated for Pipeline A) ---
 
 
-def upload_to_qdrant(texts, source_path, collection, batch_id):
+def upload_to_qdrant(texts, source_path, collection, batch_id, first_index=0):
     ensure_qdrant_collection(collection, get_model_meta(settings.TOGETHER_EMBEDDING_MODEL).dim)
     # Note: 'enrichment' parameter is removed
     vectors, _ = embed_client.embed_texts(texts)
@@ -163,76 +200,207 @@ def upload_to_qdrant(texts, source_path, collection, batch_id):
             "text": text,
             "batch_id": batch_id,
             "file_type": os.path.splitext(source_path)[1].lower(),
+            # Position in the file; hierarchical enrichment summarizes chunks in this order
+            "chunk_index": first_index + i,
             # Set summary to PENDING. Pipeline B will update it.
             "forensic_summary": "PENDING",
         }
         
-        payload = route_payload(source_path, payload, chunk_text)# CRITICAL: We use UUID4 here. Pipeline B uses this ID as custom_id.
+        payload = route_payload(source_path, payload, text)
+        # CRITICAL: We use UUID4 here. Pipeline B uses this ID as custom_id.
         points.append(PointStruct(id=str(uuid4()), vector=vectors[i], payload=payload))
 
     if points:
-        # Ensure collection exists with BGE-M3 dimensions (1024)
-        try:
-            qdrant_client.get_collection(collection)
-        except:
-            # Create collection if it doesn't exist
-            from qdrant_client.http.models import Distance, VectorParams
-
-            qdrant_client.create_collection(
-                collection_name=collection,
-                vectors_config=VectorParams(
-                    size=get_model_meta(settings.TOGETHER_EMBEDDING_MODEL).dim, distance=Distance.COSINE  # BGE-M3 embedding size
-                ),
-            )
-            logger.info(
-                f"Created Qdrant collection: {collection} with BGE-M3 dimensions (1024)"
-            )
-
         qdrant_client.upsert(collection_name=collection, wait=True, points=points)
         logger.info(f"Uploaded {len(points)} points to Qdrant collection: {collection}")
 
 
+def upload_stream(texts, source_path, collection, batch_id):
+    """Embed + upsert an iterable of chunks STREAM_UPSERT_BATCH at a time (bounded memory)."""
+    total = 0
+    for batch in batched(texts, settings.STREAM_UPSERT_BATCH):
+        upload_to_qdrant(batch, source_path, collection, batch_id, first_index=total)
+        total += len(batch)
+    return total
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+
+
+def peak_rss_growth_mb(baseline_mb: float) -> float:
+    """How far the RSS high-water mark rose above `baseline_mb`, the RSS at job start.
+
+    ru_maxrss alone includes the Whisper/torch pages the RQ work-horse inherits from the
+    worker, so only the growth says what processing the file cost. A fork starts its
+    high-water mark at the inherited RSS; in a non-forking worker an earlier, higher peak
+    shows up here too.
+    """
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return round(max(0.0, peak_mb - baseline_mb), 1)
+
+
 # --- Main Worker Function (Executed by RQ) ---
 
 
-def process_forensic_file(file_path: str, collection: str, batch_id: str):
+def process_forensic_file(file_path: str, collection: str, batch_id: str, strategy: str = None):
+    """strategy comes from the API-side triage (fast / hi_res); None means settings.OCR_STRATEGY."""
     logger.info(f"Starting processing: {file_path}")
+    baseline_mb = rss_mb()
     try:
-        ext = os.path.splitext(file_path)[1].lower()
-        # Define comprehensive extensions for triage
-        DB_EXTS = [
-            ".db",
-            ".sqlite",
-            ".sqlite3",
-            ".edb",
-        ]  # Added EDB for Windows Search Index
-        MEDIA_EXTS = [".mp3", ".wav", ".m4a", ".mp4", ".mov", ".avi", ".wmv", ".wma"]
-
-        if ext in DB_EXTS:
-            return process_database(file_path, collection, batch_id)
-        elif ext in MEDIA_EXTS:
-            content = process_media(file_path)
-        else:
-            # Handles Docs, PDFs, Images, Emails, Cache files, etc.
-            content = process_standard(file_path)
-
-        if not content:
-            return {"status": "completed", "extracted_chunks": 0}
-
-        # DECOUPLED: Enrichment (AI Summarization) is removed from this real-time worker.
-
-        # Advanced Chunking
-        chunks = chunk_by_title(content, max_characters=1500)
-        texts = [chunk.text for chunk in chunks]
-
-        # Upload
-        upload_to_qdrant(texts, file_path, collection, batch_id)
-        return {"status": "completed", "extracted_chunks": len(texts)}
-
+        result = _process_file(file_path, collection, batch_id, strategy)
     except Exception as e:
         logger.error(f"Critical error processing {file_path}: {e}", exc_info=True)
         # In a production system, implement Dead Letter Queue (DLQ) logic here
-        return {"status": "failed", "error": str(e)}
+        result = {"status": "failed", "error": str(e)}
+    if result.get("status") == "failed":
+        _record_failure(batch_id, file_path, result.get("error", ""))
+    _bulk_job_done(batch_id)
+    result["peak_rss_growth_mb"] = peak_rss_growth_mb(baseline_mb)
+    return result
+
+
+def _record_failure(batch_id: str, file_path: str, error: str):
+    try:
+        bulk_load.record_failure(batch_id, file_path, error)
+    except Exception as e:
+        logger.error(f"Could not record failure of {file_path} in {batch_id}: {e}")
+
+
+def _bulk_job_done(batch_id: str):
+    try:
+        bulk_load.job_done(batch_id)
+    except Exception as e:
+        logger.error(f"Bulk-load bookkeeping failed for {batch_id}: {e}")
+
+
+def _process_file(file_path: str, collection: str, batch_id: str, strategy: str = None):
+    ext = os.path.splitext(file_path)[1].lower()
+    # Define comprehensive extensions for triage
+    DB_EXTS = [
+        ".db",
+        ".sqlite",
+        ".sqlite3",
+        ".edb",
+    ]  # Added EDB for Windows Search Index
+    MEDIA_EXTS = [".mp3", ".wav", ".m4a", ".mp4", ".mov", ".avi", ".wmv", ".wma"]
+
+    page_stats = {}
+    if ext in DB_EXTS:
+        return process_database(file_path, collection, batch_id)
+    elif ext in PLAIN_TEXT_EXTS:
+        # read -> chunk -> embed -> upsert, one batch in flight
+        n_chunks = upload_stream(process_plain_text(file_path), file_path, collection, batch_id)
+        return {"status": "completed", "extracted_chunks": n_chunks}
+    elif ext in MEDIA_EXTS:
+        content = process_media(file_path)
+    else:
+        # Handles Docs, PDFs, Images, Emails, Cache files, etc.
+        content, page_stats = process_standard(file_path, strategy)
+
+    if not content:
+        return {"status": "completed", "extracted_chunks": 0, **page_stats}
+
+    # DECOUPLED: Enrichment (AI Summarization) is removed from this real-time worker.
+
+    # Advanced Chunking
+    chunks = chunk_by_title(content, max_characters=1500)
+    texts = [chunk.text for chunk in chunks]
+
+    # Upload
+    upload_stream(texts, file_path, collection, batch_id)
+    return {"status": "completed", "extracted_chunks": len(texts), **page_stats}
+
+
+# --- Page-range jobs for large PDFs (enqueued by api_v2.enqueue_split_pdf) ---
+
+
+def process_pdf_page_range(file_path: str, start: int, end: int, batch_id: str, strategy: str = None):
+    """Partition pages [start, end) and persist the elements for finalize_split_pdf.
+
+    Raises on failure so RQ can retry this range on its own.
+    """
+    strategy = strategy or settings.OCR_STRATEGY
+    logger.info(f"Partitioning {file_path} pages {start + 1}-{end} ({strategy})")
+    if settings.OCR_ADAPTIVE and strategy == "hi_res":
+        elements, page_stats = partition_pdf_adaptive(file_path, start, end)
+    else:
+        elements = partition_page_range(file_path, start, end, strategy)
+        page_stats = {}
+    PDF_PAGES.labels("text_layer").inc(page_stats.get("pages_text_layer", 0))
+    PDF_PAGES.labels("ocr").inc(page_stats.get("pages_ocr", 0))
+
+    out_path = range_result_path(batch_id, file_path, start)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {"start": start, "end": end, "stats": page_stats, "elements": elements_to_json(elements)},
+            f,
+        )
+    os.replace(tmp_path, out_path)  # a retried range never leaves a half-written file behind
+    return {"status": "completed", "pages": end - start, "elements": len(elements), **page_stats}
+
+
+def finalize_split_pdf(file_path: str, collection: str, batch_id: str, ranges: list):
+    """Reassemble page ranges in page order, chunk across range boundaries and upload.
+
+    Runs even when page-range jobs failed for good (allow_failure dependency); a document
+    with missing ranges is not uploaded and is recorded as failed for the batch.
+    """
+    try:
+        try:
+            result = _finalize_split_pdf(file_path, collection, batch_id, ranges)
+        except Exception as e:
+            logger.error(f"Finalizing {file_path} failed: {e}", exc_info=True)
+            result = {"status": "failed", "error": str(e)}
+        if result["status"] == "failed":
+            _record_failure(batch_id, file_path, result["error"])
+        return result
+    finally:
+        _bulk_job_done(batch_id)
+
+
+def _iter_range_chunks(file_path: str, batch_id: str, ranges: list, totals: dict):
+    """Chunk texts range by range; the last section of each range is held back and joined
+    with the next one, so sections spanning a range boundary still chunk as one."""
+    carry = []
+    for start, end in sorted(ranges):
+        with open(range_result_path(batch_id, file_path, start)) as f:
+            part = json.load(f)
+        for key in totals:
+            totals[key] += part["stats"].get(key, 0)
+        elements = carry + elements_from_json(text=part["elements"])
+        del part
+        titles = [i for i, el in enumerate(elements) if el.category == "Title"]
+        # A range without titles continues the carried section, so it's released whole
+        cut = titles[-1] if titles else len(elements)
+        carry = elements[cut:]
+        for chunk in chunk_by_title(elements[:cut], max_characters=1500):
+            yield chunk.text
+    for chunk in chunk_by_title(carry, max_characters=1500):
+        yield chunk.text
+
+
+def _finalize_split_pdf(file_path: str, collection: str, batch_id: str, ranges: list):
+    missing = [
+        f"p{start + 1}-{end}"
+        for start, end in sorted(ranges)
+        if not os.path.exists(range_result_path(batch_id, file_path, start))
+    ]
+    if missing:
+        shutil.rmtree(range_work_dir(batch_id, file_path), ignore_errors=True)
+        logger.error(f"{file_path}: page ranges {', '.join(missing)} failed; document not ingested")
+        return {"status": "failed", "error": f"missing page ranges: {', '.join(missing)}", "page_ranges": len(ranges)}
+
+    totals = {"pages_text_layer": 0, "pages_ocr": 0}
+    # Range by range, STREAM_UPSERT_BATCH chunks per upsert: memory stays bounded by one range
+    n_chunks = upload_stream(_iter_range_chunks(file_path, batch_id, ranges, totals), file_path, collection, batch_id)
+    shutil.rmtree(range_work_dir(batch_id, file_path), ignore_errors=True)
+    logger.info(f"Reassembled {len(ranges)} page ranges of {file_path} into {n_chunks} chunks")
+    return {"status": "completed", "extracted_chunks": n_chunks, "page_ranges": len(ranges), **totals}
 
 
 if __name__ == "__main__":
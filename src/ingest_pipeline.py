@@ -0,0 +1,396 @@
+# src/ingest_pipeline.py
+"""Staged concurrent ingestion: read -> chunk -> embed -> upsert over bounded queues.
+
+Every stage runs in its own threads so the embedding backend (local GPU or Together)
+never sits idle while files are read or Qdrant is written. The slowest stage sets the
+pace; the bounded queues between stages provide back-pressure and cap memory.
+
+With a CollectionRouter each file's chunks go to its category's collection; writers
+buffer points per collection so mixed embedding batches still upsert in full batches.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from qdrant_client.models import PointStruct
+from src.chunking import READ_BUFFER_BYTES, batched, iter_chunks, iter_file_chunks
+from src.embeddings.batcher import DynamicBatcher
+from src.payload_router import route_payload
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+# Files up to this size are read fully by the reader stage; larger ones are streamed
+# by the chunker so a single multi-GB log can't blow the queue's memory budget.
+PRELOAD_MAX_BYTES = 8 * READ_BUFFER_BYTES
+
+# Preserved from the old gpu_ingest.py so Work Buddy filters keep working
+PATH_TAGS = {
+    "401K": ["retirement", "financial", "401k"],
+    "Estate": ["estate", "planning", "legal"],
+    "Malpractice": ["legal", "malpractice", "medical"],
+}
+
+
+@dataclass
+class Document:
+    path: Path
+    blocks: object  # list[str] (preloaded) or a lazy iterable of text blocks
+
+
+@dataclass
+class Chunk:
+    path: Path
+    index: int
+    text: str
+    point_id: str
+    total: int | None = None  # None when the file was too long to buffer; patched at the end
+    collection: str | None = None
+    category: str | None = None  # routing category, when a router picked the collection
+
+
+class StageStats:
+    def __init__(self, name: str, unit: str, workers: int):
+        self.name = name
+        self.unit = unit
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, n: int, seconds: float):
+        with self._lock:
+            self.items += n
+            self.busy += seconds
+
+    def summary(self, elapsed: float) -> dict:
+        return {
+            "items": self.items,
+            "per_sec": round(self.items / max(elapsed, 1e-9), 1),
+            "busy": round(self.busy / max(elapsed * self.workers, 1e-9), 2),
+        }
+
+    def line(self, elapsed: float) -> str:
+        s = self.summary(elapsed)
+        return f"{self.name} {s['per_sec']:,.1f} {self.unit}/s ({s['busy']:.0%} busy)"
+
+
+def iter_pdf_pages(path: Path):
+    """Yield PDF page texts one at a time."""
+    from pypdf import PdfReader
+
+    for page in PdfReader(str(path)).pages:
+        yield (page.extract_text() or "") + "\n"
+
+
+def build_payload(chunk: Chunk) -> dict:
+    path = chunk.path
+    payload = {
+        # content/full_content kept for both old Work Buddy schemas (chunks are <= ~1000 chars)
+        "content": chunk.text,
+        "full_content": chunk.text,
+        "source": str(path),
+        "fileName": path.name,
+        "category": path.parent.name,
+        "fileType": path.suffix,
+        "chunkIndex": chunk.index,
+        "charCount": len(chunk.text),
+        "ingested": datetime.now().isoformat(),
+    }
+    if chunk.total is not None:
+        payload["totalChunks"] = chunk.total
+    if chunk.category:
+        payload["collection_category"] = chunk.category
+    for part, tags in PATH_TAGS.items():
+        if part in path.parts:
+            payload["tags"] = tags
+            break
+    return route_payload(str(path), payload, chunk.text)
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        embed_client,
+        qdrant,
+        collection: str,
+        router=None,  # src.categorization.CollectionRouter; None = everything to `collection`
+        readers: int = 4,
+        chunkers: int = 2,
+        writers: int = 2,
+        embed_batch: int = 64,
+        upsert_batch: int = 256,  # points per upsert, per collection
+        max_wait_s: float = 0.05,
+        queue_size: int = 2048,  # chunks in flight between chunkers and writers
+        max_tokens: int = 250,
+        overlap_tokens: int = 50,
+        file_buffer_chunks: int = 256,
+        min_chars: int = 50,
+        stats_every_s: float = 10.0,
+    ):
+        self.embed_client = embed_client
+        self.qdrant = qdrant
+        self.collection = collection
+        self.router = router
+        self.readers = readers
+        self.chunkers = chunkers
+        self.writers = writers
+        self.embed_batch = embed_batch
+        self.upsert_batch = upsert_batch
+        self.max_wait_s = max_wait_s
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.file_buffer_chunks = file_buffer_chunks
+        self.min_chars = min_chars
+        self.stats_every_s = stats_every_s
+
+        self.files_q: queue.Queue = queue.Queue(maxsize=readers * 4)
+        self.docs_q: queue.Queue = queue.Queue(maxsize=readers * 2)
+        # (chunks, Future[vectors]) in submission order; the batcher's own queue bounds
+        # how many chunks wait for the embedder, this one bounds results waiting for writers
+        self.pending_q: queue.Queue = queue.Queue(maxsize=max(8, queue_size // embed_batch))
+        self.batcher: DynamicBatcher | None = None
+
+        self.stats = {
+            "read": StageStats("read", "files", readers),
+            "chunk": StageStats("chunk", "chunks", chunkers),
+            "upsert": StageStats("upsert", "points", writers),
+        }
+        self.failed: dict[str, str] = {}
+        self.skipped: list[str] = []
+        self._patch_totals: dict[str, tuple[str, list[str], int]] = {}
+        self._lost_ids: set[str] = set()  # points whose embed or upsert failed
+        self._buffers: dict[str, list[PointStruct]] = {}
+        self.collection_points: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._t0 = 0.0
+
+    # --- stages ---
+
+    def _fail(self, path, err):
+        with self._lock:
+            self.failed[str(path)] = str(err)
+        logger.warning(f"Failed {path}: {err}")
+
+    def _read_worker(self):
+        while (path := self.files_q.get()) is not _DONE:
+            t0 = time.perf_counter()
+            try:
+                if path.suffix.lower() == ".pdf":
+                    # Pages are extracted lazily by the chunker, one at a time
+                    blocks = iter_pdf_pages(path)
+                elif path.stat().st_size <= PRELOAD_MAX_BYTES:
+                    blocks = [path.read_text(encoding="utf-8", errors="ignore")]
+                else:
+                    blocks = None  # streamed by the chunker
+                self.stats["read"].record(1, time.perf_counter() - t0)
+                self.docs_q.put(Document(path, blocks))
+            except Exception as e:
+                self._fail(path, e)
+
+    def _chunk_worker(self):
+        while (doc := self.docs_q.get()) is not _DONE:
+            try:
+                self._chunk_document(doc)
+            except Exception as e:
+                self._fail(doc.path, e)
+
+    def _chunk_document(self, doc: Document):
+        if doc.blocks is None:
+            stream = iter_file_chunks(str(doc.path), self.max_tokens, self.overlap_tokens)
+        else:
+            stream = iter_chunks(doc.blocks, self.max_tokens, self.overlap_tokens)
+
+        if self.router is not None:
+            collection, category = self.router.collection_for(doc.path)
+        else:
+            collection, category = self.collection, None
+
+        # Buffer the head of the file: most files fit, so totalChunks is known up front
+        t0 = time.perf_counter()
+        buffered: list[Chunk] = []
+        for text in stream:
+            buffered.append(
+                Chunk(doc.path, len(buffered), text, str(uuid.uuid4()), collection=collection, category=category)
+            )
+            if len(buffered) >= self.file_buffer_chunks:
+                break
+        if not buffered or (len(buffered) == 1 and len(buffered[0].text) < self.min_chars):
+            with self._lock:
+                self.skipped.append(str(doc.path))
+            return
+
+        complete = len(buffered) < self.file_buffer_chunks
+        for c in buffered:
+            c.total = len(buffered) if complete else None
+        self.stats["chunk"].record(len(buffered), time.perf_counter() - t0)
+        for group in batched(buffered, self.embed_batch):
+            self._submit(group)
+        if complete:
+            return
+
+        ids = [c.point_id for c in buffered]
+        t0 = time.perf_counter()
+        for texts in batched(stream, self.embed_batch):
+            group = []
+            for text in texts:
+                group.append(
+                    Chunk(doc.path, len(ids), text, str(uuid.uuid4()), collection=collection, category=category)
+                )
+                ids.append(group[-1].point_id)
+            self.stats["chunk"].record(len(group), time.perf_counter() - t0)
+            self._submit(group)
+            t0 = time.perf_counter()
+        with self._lock:
+            self._patch_totals[str(doc.path)] = (collection, ids, len(ids))
+
+    def _submit(self, group: list[Chunk]):
+        """Hand chunks to the cross-file batcher; writers pick the result up in order."""
+        self.pending_q.put((group, self.batcher.submit([c.text for c in group])))
+
+    def _upsert_worker(self):
+        while (item := self.pending_q.get()) is not _DONE:
+            batch, future = item
+            try:
+                vectors = future.result()
+            except Exception as e:
+                for path in {c.path for c in batch}:
+                    self._fail(path, f"embed: {e}")
+                with self._lock:
+                    self._lost_ids.update(c.point_id for c in batch)
+                continue
+            by_collection: dict[str, list[PointStruct]] = {}
+            for c, v in zip(batch, vectors):
+                by_collection.setdefault(c.collection or self.collection, []).append(
+                    PointStruct(
+                        id=c.point_id,
+                        vector=v.tolist() if hasattr(v, "tolist") else v,
+                        payload=build_payload(c),
+                    )
+                )
+            for collection, points in by_collection.items():
+                if full := self._buffer(collection, points):
+                    self._upsert(collection, full)
+
+    def _buffer(self, collection: str, points: list[PointStruct]) -> list[PointStruct] | None:
+        """Add points to a collection's buffer; returns the buffer once it holds a full batch."""
+        with self._lock:
+            buf = self._buffers.setdefault(collection, [])
+            buf.extend(points)
+            if len(buf) < self.upsert_batch:
+                return None
+            self._buffers[collection] = []
+        return buf
+
+    def _upsert(self, collection: str, points: list[PointStruct]):
+        t0 = time.perf_counter()
+        try:
+            # Writers run concurrently, so waiting here doesn't stall the embed stage
+            self.qdrant.upsert(collection_name=collection, points=points, wait=True)
+        except Exception as e:
+            for path in {p.payload["source"] for p in points}:
+                self._fail(path, f"upsert: {e}")
+            with self._lock:
+                self._lost_ids.update(p.id for p in points)
+            return
+        self.stats["upsert"].record(len(points), time.perf_counter() - t0)
+        with self._lock:
+            self.collection_points[collection] = self.collection_points.get(collection, 0) + len(points)
+
+    # --- orchestration ---
+
+    def _report(self, stop: threading.Event):
+        while not stop.wait(self.stats_every_s):
+            print(self.progress_line(), flush=True)
+
+    def progress_line(self) -> str:
+        elapsed = time.time() - self._t0
+        read, chunk, upsert = (self.stats[k].line(elapsed) for k in ("read", "chunk", "upsert"))
+        emb = self.batcher.stats()
+        embed = (
+            f"embed {emb['texts_per_sec']:,.1f} chunks/s ({emb['utilization']:.0%} busy, "
+            f"avg batch {emb['avg_batch']})"
+        )
+        return (
+            f"[{elapsed:7.1f}s] {read} | {chunk} | {embed} | {upsert} | queues "
+            f"files={self.files_q.qsize()} docs={self.docs_q.qsize()} pending={self.pending_q.qsize()}"
+        )
+
+    def _start(self, target, n):
+        threads = [threading.Thread(target=target, daemon=True) for _ in range(n)]
+        for t in threads:
+            t.start()
+        return threads
+
+    @staticmethod
+    def _drain(q: queue.Queue, threads: list, n_sentinels: int):
+        for _ in range(n_sentinels):
+            q.put(_DONE)
+        for t in threads:
+            t.join()
+
+    def run(self, files) -> dict:
+        self._t0 = time.time()
+        stop = threading.Event()
+        reporter = threading.Thread(target=self._report, args=(stop,), daemon=True)
+        reporter.start()
+
+        self.batcher = DynamicBatcher(self.embed_client, self.embed_batch, self.max_wait_s)
+        readers = self._start(self._read_worker, self.readers)
+        chunkers = self._start(self._chunk_worker, self.chunkers)
+        writers = self._start(self._upsert_worker, self.writers)
+
+        n_files = 0
+        for path in files:
+            self.files_q.put(Path(path))
+            n_files += 1
+
+        # Shut stages down front to back so every queue drains completely
+        self._drain(self.files_q, readers, self.readers)
+        self._drain(self.docs_q, chunkers, self.chunkers)
+        self._drain(self.pending_q, writers, self.writers)
+        self.batcher.close()
+        for collection, points in self._buffers.items():
+            for part in batched(points, self.upsert_batch):
+                self._upsert(collection, part)
+        self._buffers.clear()
+
+        # Long files were streamed before their chunk count was known; patch the points written
+        for path, (collection, ids, total) in self._patch_totals.items():
+            ids = [i for i in ids if i not in self._lost_ids]
+            if not ids:
+                continue
+            try:
+                self.qdrant.set_payload(collection_name=collection, payload={"totalChunks": total}, points=ids)
+            except Exception as e:
+                self._fail(path, f"totalChunks: {e}")
+
+        stop.set()
+        elapsed = time.time() - self._t0
+        print(self.progress_line(), flush=True)
+        return {
+            "files": n_files,
+            "files_failed": len(self.failed),
+            "files_skipped": len(self.skipped),
+            "chunks": self.stats["upsert"].items,
+            "collections": dict(sorted(self.collection_points.items())),
+            "elapsed_sec": round(elapsed, 2),
+            "stages": {**{name: s.summary(elapsed) for name, s in self.stats.items()}, "embed": self.batcher.stats()},
+        }
+
+
+def scan_files(source_dir: str, extensions: list[str]) -> list[Path]:
+    exts = {e.lower() if e.startswith(".") else f".{e.lower()}" for e in extensions}
+    files = []
+    for dirpath, _, names in os.walk(source_dir):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in exts:
+                files.append(Path(dirpath) / name)
+    return files
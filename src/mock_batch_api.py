@@ -0,0 +1,121 @@
+# src/mock_batch_api.py
+"""Offline stand-in for the Together batch API used by enrichment_manager.
+
+Implements the calls Pipeline B makes (files.upload, batches.create_batch,
+batches.get_batch, files.retrieve_content). Jobs "run" for MOCK_BATCH_SECONDS with linear
+progress and then produce an output file in the Together format whose summaries are
+derived from the request text. State lives in a JSON file so orchestrator restarts can be
+tested too. Enable with ENRICHMENT_BATCH_BACKEND=mock.
+"""
+import json
+import os
+import random
+import shutil
+import time
+import uuid
+from types import SimpleNamespace
+
+
+class _Files:
+    def __init__(self, api: "MockBatchClient"):
+        self.api = api
+
+    def upload(self, file: str, purpose: str = "batch-api"):
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        shutil.copy(file, self.api._file_path(file_id))
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    def retrieve_content(self, id: str, output: str):
+        shutil.copy(self.api._file_path(id), output)
+
+
+class _Batches:
+    def __init__(self, api: "MockBatchClient"):
+        self.api = api
+
+    def create_batch(self, file_id: str, endpoint: str = "/v1/chat/completions"):
+        job_id = f"batch-{uuid.uuid4().hex[:12]}"
+        state = self.api._load()
+        state[job_id] = {"input_file_id": file_id, "created": time.time(), "status": "IN_PROGRESS"}
+        self.api._save(state)
+        return self.get_batch(job_id)
+
+    def get_batch(self, job_id: str):
+        state = self.api._load()
+        job = state[job_id]
+        if job["status"] == "IN_PROGRESS":
+            elapsed = time.time() - job["created"]
+            if elapsed >= self.api.duration_s:
+                if random.random() < self.api.fail_rate:
+                    job["status"] = "FAILED"
+                else:
+                    job["output_file_id"] = self.api._run(job["input_file_id"])
+                    job["status"] = "COMPLETED"
+                self.api._save(state)
+            else:
+                job["progress"] = round(100 * elapsed / self.api.duration_s, 1)
+        return SimpleNamespace(
+            id=job_id,
+            status=job["status"],
+            progress=100.0 if job["status"] == "COMPLETED" else job.get("progress", 0.0),
+            output_file_id=job.get("output_file_id"),
+            error_file_id=None,
+        )
+
+
+class MockBatchClient:
+    def __init__(self, root: str, duration_s: float | None = None, fail_rate: float | None = None):
+        self.root = os.path.join(root, "mock_batch_api")
+        os.makedirs(self.root, exist_ok=True)
+        self.duration_s = duration_s if duration_s is not None else float(os.getenv("MOCK_BATCH_SECONDS", "20"))
+        self.fail_rate = fail_rate if fail_rate is not None else float(os.getenv("MOCK_BATCH_FAIL_RATE", "0"))
+        self.files = _Files(self)
+        self.batches = _Batches(self)
+
+    def _file_path(self, file_id: str) -> str:
+        return os.path.join(self.root, f"{file_id}.jsonl")
+
+    def _state_path(self) -> str:
+        return os.path.join(self.root, "jobs.json")
+
+    def _load(self) -> dict:
+        if not os.path.exists(self._state_path()):
+            return {}
+        with open(self._state_path()) as f:
+            return json.load(f)
+
+    def _save(self, state: dict):
+        tmp = self._state_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self._state_path())
+
+    def _run(self, input_file_id: str) -> str:
+        """Answer every request of an input file; returns the output file id."""
+        output_id = f"file-{uuid.uuid4().hex[:12]}"
+        with open(self._file_path(input_file_id)) as src, open(self._file_path(output_id), "w") as out:
+            for line in src:
+                req = json.loads(line)
+                prompt = req["body"]["messages"][-1]["content"]
+                text = prompt.split("Text:", 1)[-1].rsplit("Forensic Summary:", 1)[0].strip()
+                summary = f"[mock] {' '.join(text.split()[:24])}"
+                out.write(
+                    json.dumps(
+                        {
+                            "id": uuid.uuid4().hex,
+                            "custom_id": req["custom_id"],
+                            "response": {
+                                "status_code": 200,
+                                "body": {
+                                    "choices": [{"message": {"role": "assistant", "content": summary}}],
+                                    "usage": {
+                                        "prompt_tokens": len(prompt) // 4,
+                                        "completion_tokens": len(summary) // 4,
+                                    },
+                                },
+                            },
+                        }
+                    )
+                    + "\n"
+                )
+        return output_id
@@ -0,0 +1,158 @@
+# src/payload_writer.py
+"""Batched, concurrent payload updates for Qdrant.
+
+Updates are buffered into batch_update_points requests of `batch_size` points. Points that
+receive an identical payload inside a batch share one SetPayload operation, so fanning a
+status or summary out to many points costs one op. A small pool of writers keeps several
+requests in flight; failed batches are retried with backoff and, if they still fail,
+appended to a JSONL file that retry_failed() can replay later.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from prometheus_client import Counter, Gauge
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import SetPayload, SetPayloadOperation
+
+logger = logging.getLogger(__name__)
+
+WRITEBACK_POINTS = Counter(
+    "enrichment_writeback_points_total", "Payload updates written back to Qdrant", ["result"]
+)
+WRITEBACK_PROGRESS = Gauge(
+    "enrichment_writeback_progress_ratio", "Fraction of the current write-back done", ["collection"]
+)
+
+
+class BatchedPayloadWriter:
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection: str,
+        batch_size: int = 500,
+        writers: int = 4,
+        max_retries: int = 3,
+        failed_path: str | None = None,
+        expected: int | None = None,
+        log_every_s: float = 10.0,
+    ):
+        self.client = client
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.failed_path = failed_path
+        self.expected = expected
+        self.log_every_s = log_every_s
+        self._pool = ThreadPoolExecutor(max_workers=writers, thread_name_prefix="payload-writer")
+        # Bound buffered batches so a fast reader can't queue the whole file in memory
+        self._slots = threading.BoundedSemaphore(writers * 2)
+        self._buf: list[tuple] = []
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self._t0 = time.time()
+        self._last_log = self._t0
+
+    def set(self, point_id, payload: dict):
+        self._buf.append((point_id, payload))
+        if len(self._buf) >= self.batch_size:
+            self._dispatch()
+
+    def set_many(self, updates: Iterable[tuple]):
+        for point_id, payload in updates:
+            self.set(point_id, payload)
+
+    def close(self) -> dict:
+        if self._buf:
+            self._dispatch()
+        self._pool.shutdown(wait=True)
+        elapsed = max(time.time() - self._t0, 1e-9)
+        stats = {
+            "written": self.written,
+            "failed": self.failed,
+            "seconds": round(elapsed, 2),
+            "updates_per_sec": round(self.written / elapsed, 1),
+        }
+        logger.info(f"Write-back to {self.collection}: {stats}")
+        return stats
+
+    def _dispatch(self):
+        batch, self._buf = self._buf, []
+        self._slots.acquire()
+        self._pool.submit(self._write, batch)
+
+    @staticmethod
+    def _operations(batch: list[tuple]) -> list:
+        groups: dict[str, tuple[dict, list]] = {}
+        for point_id, payload in batch:
+            key = json.dumps(payload, sort_keys=True)
+            groups.setdefault(key, (payload, []))[1].append(point_id)
+        return [
+            SetPayloadOperation(set_payload=SetPayload(payload=payload, points=ids))
+            for payload, ids in groups.values()
+        ]
+
+    def _write(self, batch: list[tuple]):
+        try:
+            ops = self._operations(batch)
+            delay = 1.0
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    self.client.batch_update_points(collection_name=self.collection, update_operations=ops, wait=True)
+                    self._record(len(batch), ok=True)
+                    return
+                except Exception as e:
+                    logger.warning(f"Write-back batch of {len(batch)} failed (attempt {attempt}/{self.max_retries}): {e}")
+                    if attempt < self.max_retries:
+                        time.sleep(delay)
+                        delay = min(delay * 2, 30)
+            self._record(len(batch), ok=False)
+            self._save_failed(batch)
+        finally:
+            self._slots.release()
+
+    def _record(self, n: int, ok: bool):
+        WRITEBACK_POINTS.labels("ok" if ok else "failed").inc(n)
+        with self._lock:
+            if ok:
+                self.written += n
+            else:
+                self.failed += n
+            done = self.written + self.failed
+            if self.expected:
+                WRITEBACK_PROGRESS.labels(self.collection).set(min(done / self.expected, 1.0))
+            now = time.time()
+            if now - self._last_log >= self.log_every_s:
+                self._last_log = now
+                total = f"/{self.expected}" if self.expected else ""
+                logger.info(
+                    f"Write-back {self.collection}: {done}{total} points "
+                    f"({self.written / (now - self._t0):,.0f}/s, {self.failed} failed)"
+                )
+
+    def _save_failed(self, batch: list[tuple]):
+        if not self.failed_path:
+            return
+        with self._lock, open(self.failed_path, "a") as f:
+            for point_id, payload in batch:
+                f.write(json.dumps({"id": point_id, "payload": payload}) + "\n")
+
+
+def retry_failed(client: QdrantClient, collection: str, failed_path: str, **kwargs) -> dict:
+    """Replay a failed-updates file; whatever still fails is written back to the same path."""
+    with open(failed_path) as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    retry_path = failed_path + ".retry"
+    writer = BatchedPayloadWriter(client, collection, failed_path=retry_path, expected=len(updates), **kwargs)
+    writer.set_many((u["id"], u["payload"]) for u in updates)
+    stats = writer.close()
+    if os.path.exists(retry_path):
+        os.replace(retry_path, failed_path)
+    else:
+        os.remove(failed_path)
+    return stats
@@ -0,0 +1,139 @@
+# src/pdf_pages.py
+"""Page-level PDF helpers: text-layer probing and adaptive (per-page) OCR."""
+import hashlib
+import logging
+import os
+import tempfile
+
+from pypdf import PdfReader, PdfWriter
+from src.config import settings
+from unstructured.partition.pdf import partition_pdf
+
+logger = logging.getLogger(__name__)
+
+TEXT_LAYER = "text_layer"
+OCR = "ocr"
+
+
+def page_count(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def probe_text_layer(file_path: str, first_page: int = 0, last_page: int | None = None) -> list[int]:
+    """Characters of embedded text per page in [first_page, last_page) (0-based)."""
+    reader = PdfReader(file_path)
+    last_page = len(reader.pages) if last_page is None else min(last_page, len(reader.pages))
+    counts = []
+    for i in range(first_page, last_page):
+        try:
+            text = reader.pages[i].extract_text() or ""
+        except Exception:
+            # Broken content streams: treat as image-only and let OCR have a go
+            text = ""
+        counts.append(len(text.strip()))
+    return counts
+
+
+def plan_page_runs(char_counts: list[int], min_chars: int, offset: int = 0) -> list[tuple[str, int, int]]:
+    """Group consecutive pages by method -> [(method, start, end)] with 0-based, end-exclusive pages."""
+    runs: list[tuple[str, int, int]] = []
+    for i, n in enumerate(char_counts):
+        method = TEXT_LAYER if n >= min_chars else OCR
+        page = offset + i
+        if runs and runs[-1][0] == method:
+            runs[-1] = (method, runs[-1][1], page + 1)
+        else:
+            runs.append((method, page, page + 1))
+    return runs
+
+
+def write_page_range(file_path: str, start: int, end: int, out_dir: str | None = None) -> str:
+    """Copy pages [start, end) into a standalone temporary PDF and return its path."""
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for i in range(start, min(end, len(reader.pages))):
+        writer.add_page(reader.pages[i])
+    fd, tmp_path = tempfile.mkstemp(suffix=f"_p{start + 1}-{end}.pdf", dir=out_dir)
+    with os.fdopen(fd, "wb") as f:
+        writer.write(f)
+    return tmp_path
+
+
+def partition_page_range(file_path: str, start: int, end: int, strategy: str):
+    """Partition pages [start, end) of a PDF with one strategy, keeping original page numbers."""
+    tmp_path = write_page_range(file_path, start, end)
+    try:
+        elements = partition_pdf(
+            filename=tmp_path,
+            strategy=strategy,
+            infer_table_structure=True,
+            starting_page_number=start + 1,
+        )
+    finally:
+        os.unlink(tmp_path)
+    for el in elements:
+        # Keep provenance pointing at the original file, not the temp slice
+        el.metadata.filename = os.path.basename(file_path)
+        el.metadata.file_directory = os.path.dirname(file_path)
+    return elements
+
+
+def _partition_run(file_path: str, method: str, start: int, end: int, whole_file: bool):
+    strategy = "fast" if method == TEXT_LAYER else "hi_res"
+    if whole_file:
+        return partition_pdf(filename=file_path, strategy=strategy, infer_table_structure=True)
+    return partition_page_range(file_path, start, end, strategy)
+
+
+def partition_pdf_adaptive(file_path: str, first_page: int = 0, last_page: int | None = None):
+    """Extract the text layer where it exists and OCR only the pages that lack one.
+
+    Returns (elements, {"pages_text_layer": n, "pages_ocr": m}).
+    """
+    total = page_count(file_path)
+    last_page = total if last_page is None else min(last_page, total)
+    counts = probe_text_layer(file_path, first_page, last_page)
+    runs = plan_page_runs(counts, settings.OCR_MIN_PAGE_CHARS, offset=first_page)
+    stats = {"pages_text_layer": 0, "pages_ocr": 0}
+    # A single-method PDF is partitioned in place, without slicing
+    whole_file = len(runs) == 1 and first_page == 0 and last_page == total
+
+    elements = []
+    for method, start, end in runs:
+        stats["pages_text_layer" if method == TEXT_LAYER else "pages_ocr"] += end - start
+        elements.extend(_partition_run(file_path, method, start, end, whole_file))
+
+    logger.info(
+        f"{file_path}: {stats['pages_text_layer']} pages from text layer, "
+        f"{stats['pages_ocr']} pages OCR'd ({len(runs)} runs)"
+    )
+    return elements, stats
+
+
+# --- Page-range splitting (large PDFs fan out into one RQ job per range) ---
+
+
+def plan_page_ranges(n_pages: int, pages_per_range: int) -> list[tuple[int, int]]:
+    """[(start, end)] 0-based, end-exclusive, covering all pages in order."""
+    return [(i, min(i + pages_per_range, n_pages)) for i in range(0, n_pages, pages_per_range)]
+
+
+def should_split(file_path: str) -> int:
+    """Page count if the PDF is large enough to fan out into page ranges, else 0."""
+    try:
+        if os.path.getsize(file_path) < settings.PDF_SPLIT_MIN_BYTES:
+            return 0
+        n_pages = page_count(file_path)
+    except Exception:
+        return 0
+    return n_pages if n_pages >= settings.PDF_SPLIT_MIN_PAGES else 0
+
+
+def range_work_dir(batch_id: str, file_path: str) -> str:
+    digest = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(settings.PAGE_RANGE_DIR, batch_id, digest)
+
+
+def range_result_path(batch_id: str, file_path: str, start: int) -> str:
+    # Zero-padded start page so a lexical sort is the page order
+    return os.path.join(range_work_dir(batch_id, file_path), f"{start:06d}.json")
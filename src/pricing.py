@@ -0,0 +1,33 @@
+# src/pricing.py
+"""Together.AI prices in USD per million tokens (shared by scripts/cost_estimator.py and
+the enrichment scheduler)."""
+
+# Embedding models: one price for input tokens
+PRICE_PER_MILLION = {
+    "BAAI/bge-base-en-v1.5-vllm": 0.008,
+    "togethercomputer/m2-bert-80M-32k-retrieval": 0.008,
+    "BAAI/bge-large-en-v1.5": 0.016,
+    "intfloat/multilingual-e5-large-instruct": 0.020,
+    "Alibaba-NLP/gte-modernbert-base": 0.080,
+}
+
+# Chat models used for enrichment: (input, output)
+LLM_PRICE_PER_MILLION = {
+    "meta-llama-3-70b-instruct": (0.88, 0.88),
+    "meta-llama/Llama-3-70b-chat-hf": (0.88, 0.88),
+    "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo": (0.88, 0.88),
+    "meta-llama/Llama-3.3-70B-Instruct-Turbo": (0.88, 0.88),
+    "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo": (0.18, 0.18),
+}
+
+# Batch API jobs are billed at half the serverless price
+BATCH_DISCOUNT = 0.5
+
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int, batch: bool = True) -> float | None:
+    """USD for one or more chat requests; None if the model has no configured price."""
+    price = LLM_PRICE_PER_MILLION.get(model)
+    if price is None:
+        return None
+    cost = (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
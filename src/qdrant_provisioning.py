@@ -0,0 +1,212 @@
+# src/qdrant_provisioning.py
+"""Single place where Qdrant collections are created.
+
+Every creator (API startup, forensic worker, ingest.py, create_collections.py) goes
+through ensure_collection() so collections get the same HNSW / optimizer / on-disk
+settings for their profile and keyword payload indexes on the fields we filter by
+(PENDING scroll, /search filters, per-batch lookups).
+"""
+import logging
+from dataclasses import dataclass
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    HnswConfigDiff,
+    OptimizersConfigDiff,
+    PayloadSchemaType,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+logger = logging.getLogger(__name__)
+
+# Fields written by upload_to_qdrant / route_payload that filters run against
+PAYLOAD_INDEXES = {
+    "case": PayloadSchemaType.KEYWORD,
+    "modality": PayloadSchemaType.KEYWORD,
+    "batch_id": PayloadSchemaType.KEYWORD,
+    "source_path": PayloadSchemaType.KEYWORD,
+    "forensic_summary": PayloadSchemaType.KEYWORD,
+    "ts_month": PayloadSchemaType.KEYWORD,
+    # "document" on the per-file summary points written by hierarchical enrichment
+    "summary_level": PayloadSchemaType.KEYWORD,
+}
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    full_scan_threshold: int = 10000
+    default_segment_number: int = 2
+    indexing_threshold: int = 20000
+    memmap_threshold: int | None = None  # KB per segment before vectors go to mmap
+    on_disk_vectors: bool = False
+    on_disk_payload: bool = False
+    on_disk_hnsw: bool = False
+    # "scalar" (int8, ~4x smaller) or "binary" (1 bit/dim, ~32x); quantized vectors stay in
+    # RAM, originals go on disk and are only read to rescore the oversampled candidates
+    quantization: str | None = None
+    quantile: float = 0.99
+    oversampling: float = 2.0
+
+
+PROFILES = {
+    # Forensic drives: millions of chunks with large text payloads; keep RAM for the graph.
+    # Unquantized, so the vectors stay in RAM too: on disk there'd be nothing left to search
+    # in memory. Originals only go on disk in the quantized profiles below.
+    "forensic": CollectionProfile(
+        hnsw_ef_construct=128,
+        default_segment_number=4,
+        memmap_threshold=200000,
+        on_disk_payload=True,
+    ),
+    "forensic-int8": CollectionProfile(
+        hnsw_ef_construct=128,
+        default_segment_number=4,
+        memmap_threshold=200000,
+        on_disk_vectors=True,
+        on_disk_payload=True,
+        quantization="scalar",
+    ),
+    # Binary quantization loses more; only worth it for 1024-d models and generous oversampling
+    "forensic-binary": CollectionProfile(
+        hnsw_ef_construct=128,
+        default_segment_number=4,
+        memmap_threshold=200000,
+        on_disk_vectors=True,
+        on_disk_payload=True,
+        quantization="binary",
+        oversampling=3.0,
+    ),
+    # Work Buddy RAG collections: tens of thousands of points, served from RAM
+    "work-buddy": CollectionProfile(hnsw_ef_construct=128),
+}
+
+
+def get_profile(name: str) -> CollectionProfile:
+    if name not in PROFILES:
+        raise KeyError(f"Unknown collection profile '{name}'. Valid: {list(PROFILES)}")
+    return PROFILES[name]
+
+
+def quantization_config(p: CollectionProfile):
+    if p.quantization is None:
+        return None
+    if p.quantization == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=p.quantile, always_ram=True)
+        )
+    if p.quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    raise ValueError(f"Unknown quantization '{p.quantization}' (scalar|binary)")
+
+
+def search_params(profile: str, hnsw_ef: int | None = None, rescore: bool = True, oversampling: float | None = None):
+    """SearchParams matching a profile: rescoring with oversampling when it is quantized."""
+    p = get_profile(profile)
+    quant = None
+    if p.quantization:
+        quant = QuantizationSearchParams(rescore=rescore, oversampling=oversampling or p.oversampling)
+    if hnsw_ef is None and quant is None:
+        return None
+    return SearchParams(hnsw_ef=hnsw_ef, quantization=quant)
+
+
+def apply_profile(client: QdrantClient, name: str, profile: str):
+    """Move an existing collection onto a profile's storage/quantization settings.
+
+    Qdrant quantizes and moves vectors in the background; the collection stays searchable.
+    """
+    p = get_profile(profile)
+    client.update_collection(
+        collection_name=name,
+        vectors_config={"": VectorParamsDiff(on_disk=p.on_disk_vectors)},
+        hnsw_config=HnswConfigDiff(m=p.hnsw_m, ef_construct=p.hnsw_ef_construct, on_disk=p.on_disk_hnsw),
+        optimizers_config=OptimizersConfigDiff(
+            indexing_threshold=p.indexing_threshold, memmap_threshold=p.memmap_threshold
+        ),
+        quantization_config=quantization_config(p),
+    )
+    logger.info(f"Applied profile '{profile}' to '{name}'")
+
+
+def collection_dim(client: QdrantClient, name: str) -> int | None:
+    """Vector size of an existing collection, or None if it doesn't exist."""
+    if not client.collection_exists(name):
+        return None
+    return client.get_collection(name).config.params.vectors.size  # type: ignore
+
+
+def ensure_payload_indexes(client: QdrantClient, name: str, fields: dict = PAYLOAD_INDEXES) -> list[str]:
+    """Create any missing payload indexes; returns the fields that were added."""
+    existing = client.get_collection(name).payload_schema or {}
+    added = []
+    for field, schema in fields.items():
+        if field in existing:
+            continue
+        client.create_payload_index(collection_name=name, field_name=field, field_schema=schema, wait=True)
+        added.append(field)
+    if added:
+        logger.info(f"Created payload indexes on '{name}': {', '.join(added)}")
+    return added
+
+
+def ensure_collection(
+    client: QdrantClient,
+    name: str,
+    dim: int,
+    profile: str = "forensic",
+    distance: Distance = Distance.COSINE,
+    indexes: dict = PAYLOAD_INDEXES,
+) -> bool:
+    """Create `name` with the profile's settings if missing, then make sure its payload
+    indexes exist. Returns True if the collection was created.
+
+    Raises ValueError if the collection exists with a different vector size; never
+    recreates (and so never wipes) an existing collection.
+    """
+    existing_dim = collection_dim(client, name)
+    created = False
+    if existing_dim is None:
+        p = get_profile(profile)
+        try:
+            client.create_collection(
+                collection_name=name,
+                vectors_config=VectorParams(size=dim, distance=distance, on_disk=p.on_disk_vectors),
+                hnsw_config=HnswConfigDiff(
+                    m=p.hnsw_m,
+                    ef_construct=p.hnsw_ef_construct,
+                    full_scan_threshold=p.full_scan_threshold,
+                    on_disk=p.on_disk_hnsw,
+                ),
+                optimizers_config=OptimizersConfigDiff(
+                    default_segment_number=p.default_segment_number,
+                    indexing_threshold=p.indexing_threshold,
+                    memmap_threshold=p.memmap_threshold,
+                ),
+                on_disk_payload=p.on_disk_payload,
+                quantization_config=quantization_config(p),
+            )
+            created = True
+            logger.info(f"Created Qdrant collection '{name}' (dim={dim}, profile={profile})")
+        except Exception:
+            # Another worker may have created it between the check and the create
+            existing_dim = collection_dim(client, name)
+            if existing_dim is None:
+                raise
+    if existing_dim is not None and existing_dim != dim:
+        raise ValueError(
+            f"Qdrant collection '{name}' has dim={existing_dim}, but embedding model requires dim={dim}. "
+            f"Create a new collection or re-embed."
+        )
+    ensure_payload_indexes(client, name, indexes)
+    return created
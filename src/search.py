@@ -0,0 +1,152 @@
+# src/search.py
+"""Query side of the API: cached query embeddings, payload filters and multi-collection fan-out."""
+import asyncio
+import fnmatch
+import logging
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Union
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    FieldCondition,
+    Filter,
+    MatchAny,
+    MatchValue,
+    QuantizationSearchParams,
+    SearchParams,
+)
+from src.qdrant_provisioning import search_params
+
+logger = logging.getLogger(__name__)
+
+# Payload fields written by route_payload / upload_to_qdrant that /search can filter on
+FILTER_FIELDS = ("case", "modality", "ts_month", "batch_id", "summary_level")
+
+
+class QueryEmbeddingCache:
+    """LRU of query vectors keyed by (model, normalized query)."""
+
+    def __init__(self, max_items: int = 4096):
+        self.max_items = max_items
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, query: str) -> tuple:
+        return model, " ".join(query.split()).lower()
+
+    def get(self, model: str, query: str):
+        k = self.key(model, query)
+        with self._lock:
+            vec = self._items.get(k)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(k)
+            self.hits += 1
+            return vec
+
+    def put(self, model: str, query: str, vector):
+        with self._lock:
+            self._items[self.key(model, query)] = vector
+            self._items.move_to_end(self.key(model, query))
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    async def get_or_embed(self, model: str, query: str, embed: Callable[[str], Awaitable[list]]) -> tuple[list, bool]:
+        """(vector, cache_hit); `embed` is only awaited on a miss."""
+        vec = self.get(model, query)
+        if vec is not None:
+            return vec, True
+        vec = await embed(query)
+        self.put(model, query, vec)
+        return vec, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "items": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+            }
+
+
+def build_filter(**fields: Optional[Union[str, List[str]]]) -> Optional[Filter]:
+    """AND of exact matches; a list value matches any of its entries."""
+    must = []
+    for name, value in fields.items():
+        if value is None or value == []:
+            continue
+        match = MatchAny(any=list(value)) if isinstance(value, list) else MatchValue(value=value)
+        must.append(FieldCondition(key=name, match=match))
+    return Filter(must=must) if must else None
+
+
+def resolve_collections(qdrant: QdrantClient, requested: List[str]) -> List[str]:
+    """Expand glob patterns such as 'work-buddy-*' against the live collection list."""
+    if not any(ch in name for name in requested for ch in "*?["):
+        return list(dict.fromkeys(requested))
+    existing = [c.name for c in qdrant.get_collections().collections]
+    out = []
+    for pattern in requested:
+        matches = fnmatch.filter(existing, pattern) if any(ch in pattern for ch in "*?[") else [pattern]
+        out.extend(sorted(matches))
+    return list(dict.fromkeys(out))
+
+
+async def search_collections(
+    qdrant: QdrantClient,
+    collections: List[str],
+    vector: list,
+    query_filter: Optional[Filter] = None,
+    limit: int = 10,
+    hnsw_ef: Optional[int] = None,
+    score_threshold: Optional[float] = None,
+    with_payload: Union[bool, List[str]] = True,
+    oversampling: Optional[float] = None,
+    rescore: Optional[bool] = None,
+    profile: Optional[str] = None,
+) -> tuple[list, dict]:
+    """Search every collection concurrently and merge hits by score.
+
+    Returns (hits, errors) where errors maps collection -> message for collections that
+    failed (missing, wrong dimension, ...) so one bad collection doesn't sink the query.
+    With a collection `profile` its oversampling is the default and rescoring is on.
+    """
+    if profile:
+        params = search_params(profile, hnsw_ef, rescore=True if rescore is None else rescore, oversampling=oversampling)
+    else:
+        quant = None
+        if oversampling is not None or rescore is not None:
+            # Only affects quantized collections; Qdrant ignores it elsewhere
+            quant = QuantizationSearchParams(oversampling=oversampling, rescore=rescore)
+        params = SearchParams(hnsw_ef=hnsw_ef, quantization=quant) if (hnsw_ef or quant) else None
+
+    def one(name: str):
+        return qdrant.query_points(
+            collection_name=name,
+            query=vector,
+            query_filter=query_filter,
+            limit=limit,
+            search_params=params,
+            score_threshold=score_threshold,
+            with_payload=with_payload,
+        ).points
+
+    results = await asyncio.gather(*(asyncio.to_thread(one, name) for name in collections), return_exceptions=True)
+    hits, errors = [], {}
+    for name, res in zip(collections, results):
+        if isinstance(res, Exception):
+            logger.warning(f"Search on '{name}' failed: {res}")
+            errors[name] = str(res)[:300]
+            continue
+        hits.extend(
+            {"collection": name, "id": p.id, "score": p.score, "payload": p.payload} for p in res
+        )
+    hits.sort(key=lambda h: h["score"], reverse=True)
+    return hits[:limit], errors
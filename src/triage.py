@@ -0,0 +1,211 @@
+# src/triage.py
+"""Cheap pre-OCR triage: decide fast / hi_res / skip before a file is enqueued."""
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from src.config import settings
+
+SKIP = "skip"
+FAST = "fast"
+HI_RES = "hi_res"
+
+# How much of the file head we look at. Enough for magic bytes and a stable entropy estimate.
+SNIFF_BYTES = 64 * 1024
+
+# Executables, fonts, traces, installers: nothing partition() can turn into useful text.
+DENY_EXTS = {
+    ".dll", ".exe", ".sys", ".drv", ".ocx", ".cpl", ".scr", ".mui", ".cat", ".manifest",
+    ".etl", ".pf", ".ttf", ".otf", ".ttc", ".fon", ".cab", ".msi", ".msp", ".msu",
+    ".pdb", ".lib", ".obj", ".o", ".so", ".pyc", ".pyd", ".jar", ".class", ".node",
+    ".iso", ".vhd", ".vhdx", ".wim", ".esd", ".swp", ".lock",
+}
+
+# Path fragments (lower-case, forward slashes) that only contain OS/package noise.
+DENY_PATH_PARTS = (
+    "/windows/winsxs/",
+    "/windows/installer/",
+    "/windows/servicing/",
+    "/windows/fonts/",
+    "/windows/assembly/",
+    "/windows/softwaredistribution/",
+    "/microsoft/fontcache/",
+    "/$recycle.bin/",
+    "/node_modules/",
+    "/__pycache__/",
+    "/.git/",
+)
+
+# Media and databases are handled by dedicated worker paths (Whisper / SQLite), never OCR.
+PASS_THROUGH_EXTS = {
+    ".db", ".sqlite", ".sqlite3", ".edb",
+    ".mp3", ".wav", ".m4a", ".mp4", ".mov", ".avi", ".wmv", ".wma",
+}
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif", ".webp", ".heic", ".heif"}
+
+# (prefix, kind) pairs checked against the file head.
+MAGIC = (
+    (b"MZ", "pe"),
+    (b"\x7fELF", "elf"),
+    (b"\xca\xfe\xba\xbe", "macho"),
+    (b"\xcf\xfa\xed\xfe", "macho"),
+    (b"OTTO", "font"),
+    (b"wOFF", "font"),
+    (b"wOF2", "font"),
+    (b"\x00\x01\x00\x00\x00", "font"),
+    (b"MSCF", "cab"),
+    (b"%PDF", "pdf"),
+    (b"\x89PNG", "image"),
+    (b"\xff\xd8\xff", "image"),
+    (b"GIF8", "image"),
+    (b"II*\x00", "image"),
+    (b"MM\x00*", "image"),
+    (b"PK\x03\x04", "zip"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "ole"),
+    (b"SQLite format 3\x00", "sqlite"),
+    (b"!BDN", "pst"),
+    (b"regf", "registry"),
+    (b"{\\rtf", "rtf"),
+    (b"\xef\xbb\xbf", "text"),
+    (b"\xff\xfe", "text"),
+    (b"\xfe\xff", "text"),
+)
+
+BINARY_KINDS = {"pe", "elf", "macho", "font", "cab"}
+
+
+@dataclass(frozen=True)
+class TriageDecision:
+    path: str
+    route: str  # one of SKIP / FAST / HI_RES
+    reason: str
+    size: int
+
+    @property
+    def strategy(self) -> str | None:
+        """OCR strategy to hand to the worker (None when the file is skipped)."""
+        return None if self.route == SKIP else self.route
+
+
+@dataclass
+class TriageReport:
+    files: Counter = field(default_factory=Counter)
+    bytes: Counter = field(default_factory=Counter)
+    reasons: Counter = field(default_factory=Counter)
+    started_at: float = field(default_factory=time.time)
+
+    def add(self, decision: TriageDecision):
+        self.files[decision.route] += 1
+        self.bytes[decision.route] += decision.size
+        self.reasons[f"{decision.route}:{decision.reason}"] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "files": dict(self.files),
+            "bytes": dict(self.bytes),
+            "reasons": dict(self.reasons.most_common()),
+            "files_skipped": self.files[SKIP],
+            "bytes_avoided": self.bytes[SKIP],
+            "elapsed_sec": round(time.time() - self.started_at, 2),
+        }
+
+    def write(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+def shannon_entropy(data: bytes) -> float:
+    """Bits per byte (0.0 - 8.0)."""
+    if not data:
+        return 0.0
+    n = len(data)
+    return -sum(c / n * math.log2(c / n) for c in Counter(data).values())
+
+
+def sniff_kind(head: bytes) -> str | None:
+    for prefix, kind in MAGIC:
+        if head.startswith(prefix):
+            return kind
+    return None
+
+
+def looks_like_text(head: bytes) -> bool:
+    if not head:
+        return False
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+        return True
+    except UnicodeDecodeError as e:
+        # A multi-byte sequence cut at the end of the sample is still text
+        return e.start >= len(head) - 4
+
+
+def triage_file(file_path: str) -> TriageDecision:
+    """Route one file to fast / hi_res / skip without parsing it."""
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        return TriageDecision(file_path, SKIP, "unreadable", 0)
+
+    norm = file_path.replace("\\", "/").lower()
+    ext = os.path.splitext(norm)[1]
+
+    if ext in DENY_EXTS:
+        return TriageDecision(file_path, SKIP, f"ext{ext}", size)
+    if any(part in norm for part in DENY_PATH_PARTS):
+        return TriageDecision(file_path, SKIP, "path_denylist", size)
+    if size < settings.TRIAGE_MIN_BYTES:
+        return TriageDecision(file_path, SKIP, "too_small", size)
+    if ext in PASS_THROUGH_EXTS:
+        return TriageDecision(file_path, FAST, "media_or_db", size)
+    if size > settings.TRIAGE_MAX_BYTES:
+        return TriageDecision(file_path, SKIP, "too_large", size)
+
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return TriageDecision(file_path, SKIP, "unreadable", size)
+
+    kind = sniff_kind(head)
+    if kind in BINARY_KINDS:
+        return TriageDecision(file_path, SKIP, f"magic_{kind}", size)
+    if kind == "image" or ext in IMAGE_EXTS:
+        return TriageDecision(file_path, HI_RES, "image", size)
+    if kind == "pdf":
+        # Per-page text-layer vs OCR is decided later by the worker
+        return TriageDecision(file_path, HI_RES, "pdf", size)
+    if kind is not None:
+        # Office/OLE/zip containers, mail stores, RTF, BOM-marked text: no OCR needed
+        return TriageDecision(file_path, FAST, kind, size)
+    if looks_like_text(head):
+        return TriageDecision(file_path, FAST, "text", size)
+    if shannon_entropy(head) >= settings.TRIAGE_ENTROPY_SKIP:
+        # Unknown, near-random bytes: encrypted or compressed blob
+        return TriageDecision(file_path, SKIP, "high_entropy", size)
+    return TriageDecision(file_path, FAST, "unknown_binary", size)
+
+
+def triage_report_path(batch_id: str) -> str:
+    return os.path.join(settings.TRIAGE_REPORT_DIR, f"{batch_id}_triage.json")
+
+
+if __name__ == "__main__":
+    # Dry run: python -m src.triage /path/to/folder [report.json]
+    root = sys.argv[1]
+    out = sys.argv[2] if len(sys.argv) > 2 else "triage_report.json"
+    report = TriageReport()
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            report.add(triage_file(os.path.join(dirpath, name)))
+    report.write(out)
+    print(json.dumps(report.to_dict(), indent=2))
@@ -0,0 +1,78 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("qdrant_client")
+pytest.importorskip("rq")
+fakeredis = pytest.importorskip("fakeredis")
+
+from src import bulk_load
+
+
+class FakeQdrant:
+    """get_collection() replays `statuses` (status, indexed_vectors_count), then stays on the last."""
+
+    def __init__(self, statuses=(("green", 10),), points=10):
+        self.statuses = list(statuses)
+        self.points = points
+        self.updates = []
+
+    def get_collection(self, name):
+        status, indexed = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return SimpleNamespace(
+            status=status,
+            points_count=self.points,
+            indexed_vectors_count=indexed,
+            config=SimpleNamespace(
+                optimizer_config=SimpleNamespace(indexing_threshold=20000, max_segment_size=None),
+                hnsw_config=SimpleNamespace(m=16),
+            ),
+        )
+
+    def update_collection(self, **kwargs):
+        self.updates.append(kwargs)
+
+
+@pytest.fixture
+def env(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(bulk_load, "_redis", r)
+    qdrant = FakeQdrant()
+    monkeypatch.setattr(bulk_load, "QdrantClient", lambda **kw: qdrant)
+    monkeypatch.setattr(bulk_load, "time", SimpleNamespace(time=time.time, sleep=lambda s: None))
+    return r, qdrant
+
+
+def start(qdrant, *batches):
+    for b in batches:
+        bulk_load.begin(qdrant, "c", b)
+        bulk_load.get_redis().hset(f"bulk_load:{b}", "loaded", bulk_load.time.time())
+
+
+def test_finish_is_idempotent_and_reports_waiting_batches(env):
+    r, qdrant = env
+    start(qdrant, "A", "B")
+    assert bulk_load.finish_bulk_load("A")["status"] == "loaded_pending_other_batch"
+    bulk_load.finish_bulk_load("A")  # forced finish / retry: must not release B's slot
+    assert r.get("bulk_load:collection:c:active") == "1"
+    assert bulk_load.finish_bulk_load("B")["status"] == "searchable"
+    assert len(qdrant.updates) == 2  # bulk mode on once, restored once
+    for b in ("A", "B"):
+        info = r.hgetall(f"bulk_load:{b}")
+        assert info["status"] == "searchable" and "time_to_searchable_seconds" in info
+    assert r.get("bulk_load:collection:c:active") == "0"
+    assert not r.smembers("bulk_load:collection:c:waiting")
+
+
+def test_green_before_indexing_is_not_searchable(env, monkeypatch):
+    r, qdrant = env
+    start(qdrant, "A")
+    qdrant.statuses = [("green", 0), ("green", 0), ("yellow", 3), ("green", 10)]
+    assert bulk_load.finish_bulk_load("A")["status"] == "searchable"
+    assert qdrant.statuses == [("green", 10)]  # went through the whole sequence
+
+    monkeypatch.setattr(bulk_load.settings, "BULK_LOAD_INDEX_TIMEOUT_S", 0)
+    start(qdrant, "B")
+    qdrant.statuses = [("green", 0)]
+    assert bulk_load.finish_bulk_load("B")["status"] == "timeout"
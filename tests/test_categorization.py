@@ -0,0 +1,73 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from scripts.bench_categorizer import legacy_analyze, synthetic_paths
+from src.categorization import (
+    CATEGORY_COLLECTIONS,
+    CATEGORY_RULES,
+    CategoryScorer,
+    CollectionRouter,
+    KeywordMatcher,
+    route_query,
+)
+from src.config import settings
+
+
+def test_matcher_finds_the_same_terms_as_substring_search():
+    terms = ["tax", "taxes", "401", "401k", "will", "power of attorney", "w-2", "w2", "lab"]
+    matcher = KeywordMatcher(terms)
+    rnd = random.Random(7)
+    for _ in range(500):
+        text = " ".join(rnd.choice(terms + ["x", "a", "_", "label", "willow"]) for _ in range(6))
+        assert matcher.terms_in(text) == {t for t in terms if t in text}
+
+
+def test_matcher_overlapping_terms():
+    matcher = KeywordMatcher(["401", "401k", "01k"])
+    assert matcher.terms_in("my401k.pdf") == {"401", "401k", "01k"}
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    return CategoryScorer(CATEGORY_RULES)
+
+
+def test_scorer_matches_the_original_rule_loop(scorer):
+    for path in synthetic_paths(CATEGORY_RULES, 3000, seed=11):
+        expected = legacy_analyze(CATEGORY_RULES, Path(path))
+        got = scorer.score(path)
+        assert got["all_scores"] == expected["all_scores"], path
+        assert (got["category"], got["confidence"]) == (expected["category"], expected["confidence"]), path
+
+
+def test_scorer_uncategorized(scorer):
+    assert scorer.score("/home/u/misc/IMG_0001.heic")["category"] == "uncategorized"
+
+
+def test_every_category_has_a_collection():
+    assert set(CATEGORY_RULES) <= set(CATEGORY_COLLECTIONS)
+
+
+def test_router_uses_map_then_scores(scorer, tmp_path):
+    router = CollectionRouter({str(tmp_path / "a.txt"): "legal"}, scorer=scorer)
+    assert router.collection_for(tmp_path / "a.txt") == ("work-buddy-legal-estate", "legal")
+    assert router.collection_for("/home/u/taxes/2023_w2.pdf") == ("work-buddy-finance-tax", "finance")
+    assert router.collection_for("/home/u/zzz/qqq.bin")[0] == settings.ROUTING_DEFAULT_COLLECTION
+
+
+def test_route_query_orders_by_score_and_adds_default(scorer):
+    routed = route_query("irs tax return and bank statement", scorer)
+    assert routed[0] == "work-buddy-finance-tax"
+    assert routed[-1] == settings.ROUTING_DEFAULT_COLLECTION
+    assert route_query("quarterly lunch menu", scorer) is None
+
+
+def test_route_query_falls_back_to_default_for_missing_collections(scorer):
+    available = {"work-buddy-finance-tax", settings.ROUTING_DEFAULT_COLLECTION}
+    assert route_query("hospital bill and tax", scorer, available=available) == [
+        "work-buddy-finance-tax", settings.ROUTING_DEFAULT_COLLECTION
+    ]
+    assert route_query("hospital", scorer, available=available) == [settings.ROUTING_DEFAULT_COLLECTION]
+    assert route_query("hospital", scorer, available={"work-buddy-finance-tax"}) is None
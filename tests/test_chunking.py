@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from src.chunking import _iter_units, approx_tokens, batched, chunk_text, iter_chunks
+
+
+def test_block_end_is_a_line_break():
+    assert "".join(_iter_units(["abc\ndef", "ghi"], 100)) == "abc\ndef\nghi\n"
+    assert "".join(_iter_units(["abc\n", "def\n"], 100)) == "abc\ndef\n"
+
+
+def test_stream_keeps_its_last_line():
+    assert list(_iter_units(io.StringIO("a\nb"), 100)) == ["a\n", "b\n"]
+
+
+def test_long_lines_are_hard_split():
+    units = list(_iter_units(io.StringIO("x" * 25 + "\n"), 10))
+    assert [len(u) for u in units] == [10, 10, 6]
+    assert "".join(units) == "x" * 25 + "\n"
+
+
+def test_pages_do_not_run_together():
+    chunks = list(iter_chunks(["end of page one", "start of page two"], max_tokens=100, overlap_tokens=10))
+    assert chunks == ["end of page one\nstart of page two"]
+
+
+def test_chunks_respect_max_tokens_and_overlap():
+    lines = [f"line {i:04d} of the log\n" for i in range(400)]
+    chunks = list(iter_chunks("".join(lines), max_tokens=60, overlap_tokens=12))
+    assert len(chunks) > 1
+    assert all(approx_tokens(c) <= 60 for c in chunks)
+    for prev, nxt in zip(chunks, chunks[1:]):
+        # The next chunk starts with the tail of the previous one
+        assert nxt.splitlines()[0] in prev
+    assert chunks[-1].endswith("line 0399 of the log")
+    assert "line 0000 of the log" in chunks[0]
+
+
+def test_chunks_prefer_paragraph_breaks():
+    para = "word " * 30 + "\n"
+    text = (para * 3 + "\n") * 4
+    chunks = chunk_text(text, max_tokens=140, overlap_tokens=0)
+    assert all(c.count(para.strip()) == 3 for c in chunks)
+
+
+def test_empty_and_whitespace_input():
+    assert list(iter_chunks("")) == []
+    assert list(iter_chunks(["\n\n", "   "])) == []
+
+
+def test_overlap_must_be_smaller_than_max():
+    with pytest.raises(ValueError):
+        list(iter_chunks("text", max_tokens=10, overlap_tokens=10))
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
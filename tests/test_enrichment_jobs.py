@@ -0,0 +1,38 @@
+import json
+
+from src.enrichment_jobs import DONE, FAILED, PENDING, SUBMITTED, EnrichmentJob, JobStore, next_poll_delay
+
+
+def make_store(tmp_path, statuses):
+    store = JobStore(str(tmp_path / "jobs.json"))
+    for i, status in enumerate(statuses):
+        store.add(EnrichmentJob(shard=f"s{i}", count=1, collection="c"))
+        store.transition(store.jobs[f"s{i}"], status)
+    return store
+
+
+def test_store_survives_restart(tmp_path):
+    store = make_store(tmp_path, [PENDING, SUBMITTED])
+    store.transition(store.jobs["s1"], SUBMITTED, job_id="b-1", attempts=1)
+    again = JobStore(store.path)
+    assert again.jobs["s1"].job_id == "b-1"
+    assert again.summary() == {PENDING: 1, SUBMITTED: 1, DONE: 0, FAILED: 0}
+
+
+def test_compact_archives_old_done_jobs(tmp_path):
+    store = make_store(tmp_path, [DONE, DONE, DONE, FAILED, PENDING])
+    for shard in ("s0", "s1", "s3", "s4"):
+        store.jobs[shard].updated_at = 0
+    assert store.compact(3600, keep=lambda j: j.shard == "s1") == 1
+    assert sorted(JobStore(store.path).jobs) == ["s1", "s2", "s3", "s4"]
+    with open(store.path + ".archive.jsonl") as f:
+        assert [json.loads(line)["shard"] for line in f] == ["s0"]
+    assert store.compact(3600, keep=lambda j: j.shard == "s1") == 0
+
+
+def test_next_poll_delay():
+    assert next_poll_delay(0, 0, None, 30, 900) == 30
+    assert next_poll_delay(100, 0, None, 30, 900) == 150
+    assert next_poll_delay(800, 0, None, 30, 900) == 900
+    # 25% done after 100s: ~300s left, poll in ~150s
+    assert next_poll_delay(30, 100, 25, 30, 900) == 150
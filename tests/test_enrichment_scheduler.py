@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from src import enrichment_scheduler
+from src.enrichment_scheduler import DEFAULT_TIER, DailyBudget, priority_tier
+
+
+@pytest.mark.parametrize(
+    "path, modality, expected",
+    [
+        (r"C:\Users\a\AppData\Local\Microsoft\Outlook\mail.ost", None, (0, "mail")),
+        ("/evidence/Content.Outlook/ABCD1234/invoice.pdf", "document", (0, "mail")),
+        ("/x/anything", "mail_store", (0, "mail")),
+        ("/u/AppData/Roaming/Microsoft/Word/AutoRecovery save of Doc1.asd", None, (0, "unsaved_office")),
+        ("/u/Documents/~$report.docx", None, (0, "unsaved_office")),
+        ("/u/Chrome/User Data/Default/Cache/Cache_Data/f_000123", None, (3, "browser_cache")),
+        ("/u/Firefox/Profiles/p/cache2/entries/0A1B", None, (3, "browser_cache")),
+        ("/u/AppData/Local/Microsoft/Windows/INetCache/IE/x.htm", None, (3, "browser_cache")),
+        ("/u/Documents/contract.PDF", None, (1, "documents")),
+        ("/u/scan.bin", "document", (1, "documents")),
+        ("/u/AppData/Local/Microsoft/OneNote/16.0/cache/00001.bin", "ms_artifact", (2, "ms_artifact")),
+        ("/u/AppData/Local/Microsoft/Office/16.0/cache/x.dat", "ms_artifact", (2, "ms_artifact")),
+        ("/u/misc/blob.bin", "text", DEFAULT_TIER),
+    ],
+)
+def test_priority_tier(path, modality, expected):
+    assert priority_tier({"source_path": path, "modality": modality}) == expected
+
+
+def test_priority_tier_without_path():
+    assert priority_tier({}) == DEFAULT_TIER
+
+
+def test_budget_fits_and_charges(tmp_path):
+    path = tmp_path / "budget.json"
+    b = DailyBudget(str(path), max_tokens=1000, max_usd=1.0)
+    assert b.fits(1000, 1.0)
+    day = b.charge(600, 0.25)
+    assert day == b.today()
+    assert not b.fits(500, 0.1)
+    assert b.fits(400, 0.75)
+    assert not b.fits(100, 0.8)
+    assert b.remaining() == {"day": day, "tokens": 400, "usd": 0.75}
+    # Persisted and reloaded
+    assert DailyBudget(str(path), max_tokens=1000).spent() == {"tokens": 600, "usd": 0.25}
+
+
+def test_budget_refund_and_rebook_on_booking_day(tmp_path):
+    b = DailyBudget(str(tmp_path / "budget.json"), max_tokens=1000)
+    b.charge(300, 0.3, day="2026-01-01")
+    b.charge(-500, -0.5, day="2026-01-01")  # never below zero
+    assert b.spent("2026-01-01") == {"tokens": 0, "usd": 0.0}
+    assert b.spent() == {"tokens": 0, "usd": 0.0}
+
+
+def test_budget_unlimited(tmp_path):
+    b = DailyBudget(str(tmp_path / "budget.json"))
+    b.charge(10**9, 10**6)
+    assert b.fits(10**9, 10**6)
+    assert b.remaining()["tokens"] is None and b.remaining()["usd"] is None
+
+
+def test_budget_keeps_recent_days(tmp_path):
+    path = tmp_path / "budget.json"
+    b = DailyBudget(str(path), keep_days=2)
+    for day in ("2026-01-01", "2026-01-02", "2026-01-03"):
+        b.charge(1, 0.0, day=day)
+    assert sorted(json.loads(path.read_text())) == ["2026-01-02", "2026-01-03"]
+
+
+def test_shard_token_cap(monkeypatch):
+    s = enrichment_scheduler.settings
+    monkeypatch.setattr(s, "ENRICHMENT_SHARD_MAX_TOKENS", 0)
+    monkeypatch.setattr(s, "ENRICHMENT_DAILY_TOKEN_BUDGET", 0)
+    monkeypatch.setattr(s, "ENRICHMENT_DAILY_USD_BUDGET", 0)
+    assert enrichment_scheduler.shard_token_cap() == 0
+    monkeypatch.setattr(s, "ENRICHMENT_SHARD_MAX_TOKENS", 5000)
+    monkeypatch.setattr(s, "ENRICHMENT_DAILY_TOKEN_BUDGET", 2000)
+    assert enrichment_scheduler.shard_token_cap() == 2000
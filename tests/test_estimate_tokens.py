@@ -0,0 +1,66 @@
+import json
+import math
+
+from scripts import estimate_tokens
+from scripts.estimate_tokens import interval, ratio_estimate
+
+FILES = [("a.txt", 100), ("b.txt", 300), ("c.txt", 600)]
+
+
+def test_ratio_estimate_two_samples_has_finite_variance():
+    est = ratio_estimate(FILES, [(100, 25.0), (300, 80.0)], None)
+    assert est["tokens"] == (105 / 400) * 1000
+    assert math.isfinite(est["var"]) and est["var"] > 0
+
+
+def test_ratio_estimate_census_has_no_variance():
+    est = ratio_estimate(FILES[:1], [(100, 25.0)], None)
+    assert est == {"tokens": 25.0, "var": 0.0, "tokens_per_byte": 0.25}
+
+
+def test_ratio_estimate_one_sample_without_pool_is_unbounded():
+    est = ratio_estimate(FILES, [(100, 25.0)], None)
+    assert est["tokens"] == 250.0
+    assert est["var"] == math.inf
+
+
+def test_ratio_estimate_one_sample_borrows_pooled_variance():
+    est = ratio_estimate(FILES, [(100, 25.0)], (0.3, 0.01))
+    assert est["tokens"] == 250.0
+    assert math.isfinite(est["var"]) and est["var"] > 0
+
+
+def test_ratio_estimate_no_samples():
+    assert ratio_estimate(FILES, [], None)["var"] == math.inf
+    pooled = ratio_estimate(FILES, [], (0.3, 0.01))
+    assert pooled["tokens"] == 300.0 and math.isfinite(pooled["var"])
+
+
+def test_interval_without_variance_is_null():
+    assert interval(250.0, math.inf, 1.96) == {"ci_low": None, "ci_high": None, "ci": "insufficient samples"}
+    assert interval(250.0, math.nan, 1.96)["ci_low"] is None
+    assert interval(250.0, 0.0, 1.96) == {"ci_low": 250, "ci_high": 250}
+
+
+def _run(tmp_path, contents, *args):
+    root = tmp_path / "corpus"
+    root.mkdir()
+    for i, text in enumerate(contents):
+        (root / f"f{i}.txt").write_text(text)
+    out = tmp_path / "est.json"
+    estimate_tokens.main([str(root), "--model", "approx", "--workers", "1", "--out", str(out), *args])
+    return json.loads(out.read_text())
+
+
+def test_main_one_sample_keeps_point_estimate(tmp_path):
+    est = _run(tmp_path, ["hello world foo\n", "bar baz qux quux\n"], "--sample", "1", "--min-per-stratum", "1")
+    assert est["tokens"] > 0
+    assert est["ci_low"] is None and est["ci"] == "insufficient samples"
+    assert est["strata"][0]["ci_low"] is None
+
+
+def test_main_unreadable_samples(tmp_path, monkeypatch):
+    monkeypatch.setattr(estimate_tokens, "capped_text", lambda *a: 1 / 0)
+    est = _run(tmp_path, ["x" * 40, "y" * 80], "--sample", "2")
+    assert est["sample_failed"] == 2
+    assert est["tokens"] == 0 and est["ci_low"] is None
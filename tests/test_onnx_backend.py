@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.embeddings import onnx_backend
+from src.embeddings.onnx_backend import _atomic_path
+
+
+def test_atomic_path_moves_into_place(tmp_path):
+    target = tmp_path / "model.int8.onnx"
+    with _atomic_path(str(target)) as tmp:
+        assert tmp != str(target) and tmp.endswith(".onnx")
+        with open(tmp, "w") as f:
+            f.write("model")
+    assert target.read_text() == "model"
+    assert os.listdir(tmp_path) == ["model.int8.onnx"]
+
+
+def test_atomic_path_leaves_nothing_on_failure(tmp_path):
+    target = tmp_path / "model.onnx"
+    with pytest.raises(RuntimeError):
+        with _atomic_path(str(target)) as tmp:
+            with open(tmp, "w") as f:
+                f.write("partial")
+            raise RuntimeError("export failed")
+    assert os.listdir(tmp_path) == []
+
+
+def test_int8_matches_fp32(tmp_path, monkeypatch):
+    """Same check as scripts/onnx_parity.py, on its sample texts."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("transformers")
+    st = pytest.importorskip("sentence_transformers")
+    import numpy as np
+    from scripts.onnx_parity import SAMPLES
+
+    hf_name = os.getenv("ONNX_PARITY_MODEL", "BAAI/bge-base-en-v1.5")
+    monkeypatch.setattr(onnx_backend, "ONNX_CACHE_DIR", str(tmp_path))
+    try:
+        model = st.SentenceTransformer(hf_name, device="cpu")
+    except OSError as e:  # not cached and no network
+        pytest.skip(f"{hf_name} unavailable: {e}")
+    reference = model.encode(SAMPLES, convert_to_numpy=True, normalize_embeddings=True)
+    quantized = onnx_backend.OnnxEncoder(hf_name).encode(SAMPLES, normalize=True)
+    assert quantized.shape == reference.shape
+    assert float(np.sum(reference * quantized, axis=1).min()) >= 0.98
@@ -0,0 +1,143 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("requests")  # src.embeddings.client
+
+from src.embeddings import providers
+from src.embeddings.providers import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, FallbackEmbeddingClient, Provider
+
+
+class Clock:
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(providers, "time", SimpleNamespace(monotonic=c, time=c, perf_counter=time.perf_counter))
+    return c
+
+
+def test_breaker_opens_after_threshold(clock):
+    b = CircuitBreaker(failure_threshold=3, reset_timeout_s=30)
+    b.record_failure()
+    b.record_failure()
+    assert b.state == CLOSED and b.allow()
+    b.record_failure()
+    assert b.state == OPEN and not b.allow()
+
+
+def test_breaker_half_open_allows_one_trial(clock):
+    b = CircuitBreaker(failure_threshold=1, reset_timeout_s=30)
+    b.record_failure()
+    clock.t += 31
+    assert b.state == HALF_OPEN
+    assert b.allow()
+    assert not b.allow()  # the trial re-armed the timer
+
+
+def test_breaker_failed_trial_reopens_success_closes(clock):
+    b = CircuitBreaker(failure_threshold=3, reset_timeout_s=30)
+    for _ in range(3):
+        b.record_failure()
+    clock.t += 31
+    assert b.allow()
+    b.record_failure()
+    assert b.state == OPEN
+    clock.t += 31
+    assert b.allow()
+    b.record_success()
+    assert b.state == CLOSED and b.failures == 0 and b.allow()
+
+
+def test_redis_breaker_state_is_shared(clock):
+    fakeredis = pytest.importorskip("fakeredis")
+    conn = fakeredis.FakeRedis(decode_responses=True)
+    a = providers.RedisCircuitBreaker("embed_breaker:m:together", 2, 30, conn=conn)
+    b = providers.RedisCircuitBreaker("embed_breaker:m:together", 2, 30, conn=conn)
+    a.record_failure()
+    b.record_failure()
+    assert a.state == b.state == OPEN
+    assert not b.allow()
+    clock.t += 31
+    assert b.state == HALF_OPEN
+    assert [a.allow(), b.allow()].count(True) == 1  # one trial across processes
+    a.record_success()
+    assert b.state == CLOSED and b.failures == 0 and b.allow()
+
+
+def test_redis_breaker_without_redis_is_closed():
+    class Down:
+        def __getattr__(self, name):
+            def fail(*a, **k):
+                raise ConnectionError("down")
+            return fail
+
+    b = providers.RedisCircuitBreaker("k", 1, 30, conn=Down())
+    b.record_failure()
+    assert b.state == CLOSED and b.allow()
+
+
+class FakeClient:
+    def __init__(self, fail=False, returns_dim=3):
+        self.fail = fail
+        self.returns_dim = returns_dim
+        self.meta = SimpleNamespace(dim=3)
+        self.calls = 0
+
+    def embed_texts(self, texts):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [[0.0] * self.returns_dim for _ in texts], len(texts)
+
+
+def fallback(*clients):
+    """FallbackEmbeddingClient over fake providers, without its pinger thread."""
+    fc = FallbackEmbeddingClient.__new__(FallbackEmbeddingClient)
+    fc.model, fc.meta = "m", SimpleNamespace(dim=3)
+    fc.providers = [Provider(f"p{i}", c, CircuitBreaker(2, 30)) for i, c in enumerate(clients)]
+    return fc
+
+
+def test_failover_to_secondary_and_skip_open_primary(clock):
+    primary, secondary = FakeClient(fail=True), FakeClient()
+    fc = fallback(primary, secondary)
+    assert fc.embed(["a"])["provider"] == "p1"
+    assert fc.embed(["a"])["provider"] == "p1"
+    assert fc.providers[0].breaker.state == OPEN
+    fc.embed(["a"])
+    assert primary.calls == 2  # open breaker: no more calls to the primary
+
+
+def test_wrong_dimension_counts_as_failure(clock):
+    fc = fallback(FakeClient(returns_dim=2), FakeClient())
+    assert fc.embed(["a", "b"])["provider"] == "p1"
+    assert fc.providers[0].breaker.failures == 1
+
+
+def test_all_providers_down_raises(clock):
+    fc = fallback(FakeClient(fail=True), FakeClient(fail=True))
+    with pytest.raises(RuntimeError, match="All embedding providers failed"):
+        fc.embed(["a"])
+
+
+def test_build_client_shares_failover_clients(monkeypatch):
+    made = []
+
+    class Fake:
+        def __init__(self, model):
+            made.append(model)
+
+    monkeypatch.setattr(providers, "FallbackEmbeddingClient", Fake)
+    monkeypatch.setattr(providers, "_shared", {})
+    monkeypatch.setattr(providers.settings, "EMBEDDINGS_BACKEND", "together")
+    monkeypatch.setattr(providers.settings, "EMBEDDINGS_FAILOVER", True)
+    assert providers.build_client() is providers.build_client() is providers.default_client()
+    assert len(made) == 1